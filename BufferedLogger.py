@@ -0,0 +1,228 @@
+import os
+import time
+import atexit
+import reprlib
+import threading
+from datetime import datetime as dt
+
+# Buffered entries of one job are sent as one B-Fabric "logthis" save once there are this
+# many of them, once they reach this many characters, or once the oldest is this old.
+MAX_BATCH_ENTRIES = 200
+MAX_BATCH_CHARS = 200_000
+FLUSH_INTERVAL = 2.0
+# Entries kept in memory per job while B-Fabric is unreachable (failed saves are retried with
+# the next batch); older ones are dropped.
+MAX_BUFFERED_ENTRIES = 5_000
+# Longest message (and parameter text) of a single entry.
+MAX_ENTRY_CHARS = 2_000
+
+# Short representations of large arguments and payloads (lists, dicts, long strings).
+_repr = reprlib.Repr()
+_repr.maxlist = _repr.maxtuple = _repr.maxset = 10
+_repr.maxdict = 10
+_repr.maxstring = 200
+_repr.maxother = 200
+_repr.maxlevel = 3
+
+
+# ---------------------------
+# Payload Summaries
+# ---------------------------
+def summarise(value):
+    """
+    Returns a short representation of `value` for the log, e.g. the first 10 items of a dict
+    with thousands of resource paths, preceded by its size.
+
+    Args:
+        value: Any object.
+
+    Returns:
+        str: Representation of at most a few hundred characters for containers.
+    """
+    if isinstance(value, (dict, list, tuple, set)) and len(value) > _repr.maxlist:
+        return f"{type(value).__name__} of {len(value)} items: {_repr.repr(value)}"
+    return _repr.repr(value) if not isinstance(value, str) else value
+
+
+def truncate(text, limit=MAX_ENTRY_CHARS):
+    """Shortens `text` to `limit` characters, noting how many were cut off."""
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]} ... [{len(text) - limit} more characters]"
+
+
+# ---------------------------
+# Background Log Sink
+# ---------------------------
+class LogSink:
+    """
+    Collects log entries in memory and sends them to B-Fabric from a background thread.
+
+    Entries are grouped per (environment, job) and saved as one "logthis" call per group when
+    a group is full (MAX_BATCH_ENTRIES / MAX_BATCH_CHARS) or its oldest entry is FLUSH_INTERVAL
+    seconds old. A batch whose save fails is put back in front of the job's newer entries and
+    sent again once it is due (up to MAX_BUFFERED_ENTRIES per job). What is still buffered
+    when the process exits is sent at exit. A request that logs therefore only appends to a
+    list, however many lines it writes and however slow B-Fabric is.
+
+    Args:
+        save (callable, optional): `save(environment, job_id, text)`; defaults to a
+                                   "logthis" save with the power user's wrapper.
+        interval (float): Seconds between checks for due batches.
+    """
+
+    def __init__(self, save=None, interval=FLUSH_INTERVAL):
+        self.save = save or save_to_bfabric
+        self.interval = interval
+        self.pending = {}
+        self.condition = threading.Condition()
+        self.deliver_lock = threading.Lock()
+        self.thread = None
+        self.dropped = 0
+
+    def submit(self, environment, job_id, entry):
+        with self.condition:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="bfabric-log-sink", daemon=True)
+                self.thread.start()
+                atexit.register(self.flush)
+            batch = self.pending.setdefault((environment, job_id), {"entries": [], "chars": 0, "since": time.monotonic()})
+            batch["entries"].append(entry)
+            batch["chars"] += len(entry) + 1
+            self.cap(batch)
+            if len(batch["entries"]) >= MAX_BATCH_ENTRIES or batch["chars"] >= MAX_BATCH_CHARS:
+                self.condition.notify()
+
+    def cap(self, batch):
+        """Drops the oldest entries of a batch beyond MAX_BUFFERED_ENTRIES. Called with `condition` held."""
+        excess = len(batch["entries"]) - MAX_BUFFERED_ENTRIES
+        if excess > 0:
+            batch["chars"] -= sum(len(entry) + 1 for entry in batch["entries"][:excess])
+            del batch["entries"][:excess]
+            self.dropped += excess
+
+    def requeue(self, key, entries):
+        """Puts entries whose save failed back in front of the job's buffered entries."""
+        with self.condition:
+            batch = self.pending.get(key)
+            newer = batch["entries"] if batch else []
+            batch = self.pending[key] = {"entries": entries + newer, "chars": 0, "since": time.monotonic()}
+            batch["chars"] = sum(len(entry) + 1 for entry in batch["entries"])
+            self.cap(batch)
+
+    def take(self, due_only=True):
+        """Removes and returns the batches that are due (or all of them)."""
+        now = time.monotonic()
+        with self.condition:
+            keys = [
+                key for key, batch in self.pending.items()
+                if not due_only
+                or now - batch["since"] >= self.interval
+                or len(batch["entries"]) >= MAX_BATCH_ENTRIES
+                or batch["chars"] >= MAX_BATCH_CHARS
+            ]
+            return [(key, self.pending.pop(key)["entries"]) for key in keys]
+
+    def deliver(self, batches):
+        with self.deliver_lock:
+            for (environment, job_id), entries in batches:
+                for start in range(0, len(entries), MAX_BATCH_ENTRIES):
+                    try:
+                        self.save(environment, job_id, "\n".join(entries[start:start + MAX_BATCH_ENTRIES]))
+                    except Exception as e:
+                        # Kept in order with the rest of the job's entries and retried on the next check.
+                        print(f"Failed to save log to B-Fabric ({len(entries) - start} entries kept for retry): {e}")
+                        self.requeue((environment, job_id), entries[start:])
+                        break
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait(self.interval)
+            self.deliver(self.take())
+
+    def flush(self):
+        """Sends everything that is buffered now, in the calling thread."""
+        self.deliver(self.take(due_only=False))
+
+
+_wrappers = {}
+_wrappers_lock = threading.Lock()
+
+
+def save_to_bfabric(environment, job_id, text):
+    """Appends `text` to the B-Fabric job's log, with one power-user wrapper per environment."""
+    with _wrappers_lock:
+        wrapper = _wrappers.get(environment)
+        if wrapper is None:
+            from bfabric import Bfabric
+            import bfabric_web_apps
+            wrapper = _wrappers[environment] = Bfabric.from_config(
+                config_path=os.path.expanduser(bfabric_web_apps.CONFIG_FILE_PATH),
+                config_env=environment.upper()
+            )
+    wrapper.save("job", {"id": job_id, "logthis": text})
+
+
+sink = LogSink()
+
+
+# ---------------------------
+# Logger
+# ---------------------------
+class BufferedLogger:
+    """
+    Drop-in replacement for `bfabric_web_apps.objects.Logger.Logger` that hands its entries
+    to the background `sink` instead of saving them to B-Fabric in the request.
+
+    Entries have the same format as the library logger's. Long messages and parameters are
+    truncated, and the arguments of logged API calls are summarised (see `summarise`).
+    `flush_logs=True` no longer blocks: the entry is sent with the next batch, at most
+    FLUSH_INTERVAL seconds later.
+
+    Args:
+        jobid (int): ID of the B-Fabric job the entries are logged to.
+        username (str): Name of the user performing the operations.
+        environment (str): B-Fabric environment (e.g., Production, Test).
+    """
+
+    def __init__(self, jobid, username, environment, log_sink=None):
+        self.jobid = jobid
+        self.username = username
+        self.environment = environment
+        self.sink = log_sink or sink
+
+    def log_operation(self, operation, message, params=None, flush_logs=True):
+        timestamp = dt.now().strftime('%Y-%m-%d %H:%M:%S')
+        log_entry = (
+            f"[{timestamp}] "
+            f"USER: {self.username} | "
+            f"OPERATION: {operation.upper()} | "
+            f"MESSAGE: {truncate(str(message))}"
+        )
+        if params is not None:
+            log_entry += f" | PARAMETERS: {truncate(summarise(params))}"
+        self.sink.submit(self.environment, self.jobid, log_entry)
+
+    def logthis(self, api_call, *args, params=None, flush_logs=True, **kwargs):
+        call_args = ', '.join(_repr.repr(arg) for arg in args)
+        call_kwargs = ', '.join(f"{key}={_repr.repr(value)}" for key, value in kwargs.items())
+        log_message = f"{api_call.__name__}({call_args}, {call_kwargs})"
+
+        result = api_call(*args, **kwargs)
+
+        self.log_operation(api_call.__name__, log_message, params, flush_logs=flush_logs)
+        return result
+
+    def flush_logs(self):
+        """Sends all buffered entries (of every job) now, in the calling thread."""
+        self.sink.flush()
+
+
+def get_logger(token_data):
+    """Returns a `BufferedLogger` for the token's job and user (see `bfabric_web_apps.get_logger`)."""
+    return BufferedLogger(
+        jobid=token_data.get('jobId', None),
+        username=token_data.get("user_data", "None"),
+        environment=token_data.get("environment", "None"),
+    )
@@ -0,0 +1,136 @@
+import os
+import csv
+import hashlib
+from itertools import zip_longest
+from concurrent.futures import ProcessPoolExecutor
+
+from Tracing import span
+
+# Bytes per read; large reads keep the per-call overhead negligible next to hashing.
+CHUNK_SIZE = 8 * 1024 ** 2
+# Hashing processes; one per core (hashing a FASTQ is CPU-bound once the file is cached or
+# the disks keep up).
+MAX_WORKERS = os.cpu_count() or 1
+# Columns of the manifest, a tab-separated file written next to the pipeline output.
+MANIFEST_COLUMNS = ["path", "size", "md5", "sha256", "mtime_ns"]
+
+
+# ---------------------------
+# Hashing
+# ---------------------------
+def hash_file(path):
+    """
+    Computes the MD5 and SHA-256 of a file in one pass over its content.
+
+    The file is read unbuffered into one reused buffer of CHUNK_SIZE bytes, so both digests
+    are fed from the same memory without copying each chunk.
+
+    Args:
+        path (str): File to hash.
+
+    Returns:
+        dict: {"path", "size", "md5", "sha256", "mtime_ns"}
+    """
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    size = 0
+    with open(path, "rb", buffering=0) as f:
+        stat = os.fstat(f.fileno())
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            md5.update(view[:read])
+            sha256.update(view[:read])
+            size += read
+    return {"path": path, "size": size, "md5": md5.hexdigest(), "sha256": sha256.hexdigest(),
+            "mtime_ns": stat.st_mtime_ns}
+
+
+def spread_over_devices(paths):
+    """
+    Orders the files so that consecutive files alternate between the devices (disks) they are
+    stored on, so the hashing processes read from all disks at once instead of one after another.
+    """
+    by_device = {}
+    for path in paths:
+        by_device.setdefault(os.stat(path).st_dev, []).append(path)
+    return [path for group in zip_longest(*by_device.values()) for path in group if path is not None]
+
+
+# ---------------------------
+# Manifest
+# ---------------------------
+def read_manifest(manifest_path):
+    """
+    Reads a manifest written by `write_manifest`.
+
+    Returns:
+        dict: {path: {"path", "size", "md5", "sha256", "mtime_ns"}}, empty if there is none.
+    """
+    if not os.path.isfile(manifest_path):
+        return {}
+    entries = {}
+    with open(manifest_path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            try:
+                row["size"] = int(row["size"])
+                row["mtime_ns"] = int(row["mtime_ns"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            entries[row["path"]] = row
+    return entries
+
+
+def write_manifest(manifest_path, entries):
+    """Writes the manifest (sorted by path) to a temporary file and moves it into place."""
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=MANIFEST_COLUMNS, delimiter="\t", lineterminator="\n")
+        writer.writeheader()
+        for path in sorted(entries):
+            writer.writerow(entries[path])
+    os.replace(tmp_path, manifest_path)
+
+
+def build_manifest(paths, manifest_path, workers=None):
+    """
+    Computes size, MD5 and SHA-256 of every file and writes them to the manifest.
+
+    Files are hashed in a pool of up to MAX_WORKERS processes. Entries of an existing manifest
+    whose file still has the same size and modification time are kept, so a retried job does
+    not hash its output a second time.
+
+    Args:
+        paths (iterable): Files to include.
+        manifest_path (str): Manifest file (tab-separated, see MANIFEST_COLUMNS).
+        workers (int, optional): Number of processes (default: MAX_WORKERS).
+
+    Returns:
+        dict: {path: {"path", "size", "md5", "sha256", "mtime_ns"}}
+    """
+    previous = read_manifest(manifest_path)
+    entries = {}
+    pending = []
+    for path in paths:
+        entry = previous.get(path)
+        stat = os.stat(path)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            entries[path] = entry
+        else:
+            pending.append(path)
+
+    with span("checksums.hash") as current:
+        current.rows = len(pending)
+        if pending:
+            workers = min(workers or MAX_WORKERS, len(pending))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for entry in pool.map(hash_file, spread_over_devices(pending)):
+                    entries[entry["path"]] = entry
+        current.bytes = sum(entries[path]["size"] for path in pending)
+
+    write_manifest(manifest_path, entries)
+    print(f"Checksum manifest {manifest_path}: {len(pending)} file(s) hashed, {len(entries) - len(pending)} reused.")
+    return entries
@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import shutil
+import socket
+
+from rq import Queue
+from rq.job import Job
+from rq.registry import StartedJobRegistry, DeferredJobRegistry
+
+from ExecuteRunMainJob import JOB_ROOT, OUTPUT_ROOT, ALTERNATE_OUTPUT_ROOTS
+
+# Upper bound of the clusters (reads) per lane by instrument; the first name that occurs in
+# the instrument name from the samplesheet header is used. Patterned flow cells rarely reach
+# their nominal maximum, so these over- rather than underestimate.
+CLUSTERS_PER_LANE = (
+    ("NovaSeq X", 3.2e9),
+    ("NovaSeq", 2.5e9),
+    ("HiSeq", 4.0e8),
+    ("NextSeq", 4.0e8),
+    ("MiSeq", 2.5e7),
+    ("iSeq", 4.0e6),
+)
+DEFAULT_CLUSTERS_PER_LANE = 2.5e9
+# Bytes of gzipped FASTQ per sequenced base (sequence, qualities and read header).
+FASTQ_BYTES_PER_BASE = 0.5
+# Output directory: bcl2fastq's FASTQs plus fastp's trimmed FASTQs; the container layout is
+# hardlinked (see `OutputPlacement`) and adds nothing.
+OUTPUT_FASTQ_FACTOR = 2.0
+# Work directory: the same files once more before Nextflow publishes them.
+WORK_FASTQ_FACTOR = 2.0
+# Fraction of each volume that is never given out, for logs, reports and other users.
+MIN_FREE_FRACTION = 0.05
+
+# Workers report the free space of their volumes every VOLUME_REPORT_INTERVAL seconds; a report
+# older than VOLUME_REPORT_MAX_AGE is ignored.
+VOLUMES_KEY = "demultiplex:volumes"
+VOLUME_REPORT_INTERVAL = 30
+VOLUME_REPORT_MAX_AGE = 300
+
+GB = 1024 ** 3
+
+
+# ---------------------------
+# Size Estimate
+# ---------------------------
+def clusters_per_lane(instrument):
+    """Returns the expected clusters per lane of an instrument (see CLUSTERS_PER_LANE)."""
+    for name, clusters in CLUSTERS_PER_LANE:
+        if name.lower() in (instrument or "").lower():
+            return clusters
+    return DEFAULT_CLUSTERS_PER_LANE
+
+
+def estimate_job_size(run_metadata):
+    """
+    Estimates the disk space a job needs from its run metadata.
+
+    FASTQ bytes = lanes x clusters per lane x read cycles x FASTQ_BYTES_PER_BASE; the output
+    and work directories need OUTPUT_FASTQ_FACTOR and WORK_FASTQ_FACTOR times that.
+
+    Args:
+        run_metadata (dict): Run metadata from `collect_run_metadata` ("instrument", "lanes", "cycles").
+
+    Returns:
+        dict: {"fastq": bytes, "output": bytes, "work": bytes}
+    """
+    fastq = int(run_metadata.get("lanes", 0) * clusters_per_lane(run_metadata.get("instrument"))
+                * run_metadata.get("cycles", 0) * FASTQ_BYTES_PER_BASE)
+    return {"fastq": fastq, "output": int(fastq * OUTPUT_FASTQ_FACTOR), "work": int(fastq * WORK_FASTQ_FACTOR)}
+
+
+# ---------------------------
+# Free Space (reported by the workers)
+# ---------------------------
+def disk_usage(path):
+    """
+    Returns {"free", "total", "device"} of the volume holding `path` (or its nearest existing
+    parent, as the job directories may not exist yet), or None if nothing of it exists.
+    """
+    while path and not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+    if not path:
+        return None
+    usage = shutil.disk_usage(path)
+    return {"free": usage.free, "total": usage.total, "device": os.stat(path).st_dev}
+
+
+def report_volumes(connection, paths=None):
+    """
+    Stores the free space of the job and output volumes of this host in Redis, for the
+    admission check of the web server (which does not see the compute server's disks).
+
+    Args:
+        connection (redis.Redis): Redis connection.
+        paths (list, optional): Paths to report (default: JOB_ROOT and all output roots).
+    """
+    host = socket.gethostname()
+    reports = {}
+    for path in paths or [JOB_ROOT, OUTPUT_ROOT, *ALTERNATE_OUTPUT_ROOTS]:
+        usage = disk_usage(path)
+        if usage:
+            reports[path] = json.dumps({**usage, "host": host, "reported_at": time.time()})
+    if reports:
+        connection.hset(VOLUMES_KEY, mapping=reports)
+
+
+def read_volumes(connection, paths):
+    """
+    Returns the free space of each path as last reported by a worker. Paths without a report
+    of the last VOLUME_REPORT_MAX_AGE seconds are left out (and not checked): the web server's
+    own disks are not the ones the jobs write to.
+    """
+    reported = connection.hmget(VOLUMES_KEY, paths)
+    volumes = {}
+    for path, raw in zip(paths, reported):
+        report = json.loads(raw) if raw else None
+        if report and time.time() - report["reported_at"] <= VOLUME_REPORT_MAX_AGE:
+            volumes[path] = report
+    return volumes
+
+
+# ---------------------------
+# Reservations of Queued Jobs
+# ---------------------------
+def active_reservations(connection, exclude=None):
+    """
+    Returns the disk reservations of all queued, deferred and running jobs.
+
+    Running jobs count with their full estimate, although part of their output is already
+    on disk (and no longer free); the check errs on the side of holding a job back.
+
+    Args:
+        connection (redis.Redis): Redis connection.
+        exclude (str, optional): Job ID not to count (a resubmission of the same job).
+
+    Returns:
+        list: [(job ID, {"output_root", "output", "work"})]
+    """
+    job_ids = []
+    for queue in Queue.all(connection=connection):
+        job_ids += queue.get_job_ids()
+        job_ids += StartedJobRegistry(queue.name, connection=connection).get_job_ids()
+        job_ids += DeferredJobRegistry(queue.name, connection=connection).get_job_ids()
+    reservations = []
+    for job in Job.fetch_many([job_id for job_id in dict.fromkeys(job_ids) if job_id != exclude], connection=connection):
+        reservation = job.meta.get("disk_reservation") if job is not None else None
+        if reservation:
+            reservations.append((job.id, reservation))
+    return reservations
+
+
+# ---------------------------
+# Admission
+# ---------------------------
+def check_volumes(needs, volumes, reservations, releasable=False):
+    """
+    Checks whether every volume can hold what the job needs on it.
+
+    Args:
+        needs (dict): {path: bytes} the job needs.
+        volumes (dict): Free space per path (see `read_volumes`); paths without it are not checked.
+        reservations (list): Reservations of the active jobs (see `active_reservations`).
+        releasable (bool): Leave out the work directory reservations, which are given back when
+                           those jobs finish.
+
+    Returns:
+        tuple: (list of shortfalls as text, empty if the job fits; job IDs whose reservations
+               are on the short volumes)
+    """
+    def volume(path):
+        info = volumes.get(path)
+        return (info["host"], info["device"]) if info else None
+
+    needed, reserved, info_of, holders = {}, {}, {}, {}
+    for path, size in needs.items():
+        key = volume(path)
+        if key is None:
+            continue
+        needed[key] = needed.get(key, 0) + size
+        info_of[key] = (path, volumes[path])
+
+    for job_id, reservation in reservations:
+        parts = [(reservation.get("output_root"), reservation.get("output", 0))]
+        if not releasable:
+            parts.append((JOB_ROOT, reservation.get("work", 0)))
+        for path, size in parts:
+            key = volume(path)
+            if key in needed and size:
+                reserved[key] = reserved.get(key, 0) + size
+                holders.setdefault(key, []).append(job_id)
+
+    shortfalls, blocking = [], []
+    for key, size in needed.items():
+        path, info = info_of[key]
+        available = info["free"] - info["total"] * MIN_FREE_FRACTION - reserved.get(key, 0)
+        if size > available:
+            shortfalls.append(
+                f"{path} needs {size / GB:.0f} GB, has {info['free'] / GB:.0f} GB free, of which "
+                f"{info['total'] * MIN_FREE_FRACTION / GB:.0f} GB are kept free and {reserved.get(key, 0) / GB:.0f} GB "
+                f"are reserved by {len(holders.get(key, []))} queued or running job(s)"
+            )
+            blocking += holders.get(key, [])
+    return shortfalls, blocking
+
+
+def admit_job(connection, job_key, run_metadata):
+    """
+    Decides before enqueueing whether the volumes can hold the job's output and work files.
+
+    - "admit": JOB_ROOT and OUTPUT_ROOT have room, after the reservations of queued and
+      running jobs.
+    - "reroute": OUTPUT_ROOT is full, but one of ALTERNATE_OUTPUT_ROOTS has room.
+    - "hold": There is only room once the active jobs give back their work directories; the job
+      is enqueued to start after them (see `depends_on`).
+    - "reject": No output root can hold the job.
+
+    Args:
+        connection (redis.Redis): Redis connection.
+        job_key (str): Key of the job to submit.
+        run_metadata (dict): Run metadata from `collect_run_metadata`.
+
+    Returns:
+        dict: {"action", "output_root", "reservation" (job meta), "depends_on" (job IDs),
+               "message"}
+    """
+    estimate = estimate_job_size(run_metadata)
+    output_roots = [OUTPUT_ROOT, *ALTERNATE_OUTPUT_ROOTS]
+    volumes = read_volumes(connection, [JOB_ROOT, *output_roots])
+    reservations = active_reservations(connection, exclude=job_key)
+    for path in (JOB_ROOT, OUTPUT_ROOT):
+        if path not in volumes:
+            print(f"Free space of {path} is unknown (no recent worker report); it is not checked.")
+    size_text = f"about {estimate['output'] / GB:.0f} GB of output and {estimate['work'] / GB:.0f} GB of work files"
+
+    def decision(action, output_root, message, depends_on=()):
+        return {
+            "action": action,
+            "output_root": output_root,
+            "reservation": {"output_root": output_root, "output": estimate["output"], "work": estimate["work"]},
+            "depends_on": list(depends_on),
+            "message": message,
+        }
+
+    def needs(output_root):
+        return {output_root: estimate["output"], JOB_ROOT: estimate["work"]}
+
+    shortfalls = {}
+    for output_root in output_roots:
+        shortfalls[output_root], _ = check_volumes(needs(output_root), volumes, reservations)
+        if not shortfalls[output_root]:
+            if output_root == OUTPUT_ROOT:
+                return decision("admit", output_root, f"The job needs {size_text}.")
+            return decision("reroute", output_root,
+                            f"{OUTPUT_ROOT} is full ({shortfalls[OUTPUT_ROOT][0]}); the output is written to {output_root}.")
+
+    for output_root in output_roots:
+        if not check_volumes(needs(output_root), volumes, reservations, releasable=True)[0]:
+            _, blocking = check_volumes({JOB_ROOT: estimate["work"]}, volumes, reservations)
+            return decision("hold", output_root,
+                            f"The job is held until {len(set(blocking))} active job(s) have released their work space "
+                            f"({shortfalls[output_root][0]}).", depends_on=dict.fromkeys(blocking))
+
+    return decision("reject", None, f"Not enough disk space for this run ({size_text}): {'; '.join(shortfalls[OUTPUT_ROOT])}.")
@@ -1,10 +1,642 @@
 import os
+import io
 import csv
-import pandas as pd
+import time
+import fcntl
+import shutil
+import pickle
+import hashlib
+import subprocess
+from contextlib import contextmanager
+from rq import get_current_job
+from rq.job import Job, Dependency
+from rq.exceptions import NoSuchJobError
+from NextflowProgress import ProgressPublisher
+import PerformanceHistory
+from Tracing import traced
+from SampleRecord import SampleRecord
+from ResourceRegistration import register_outputs, expand_resource_paths
+from ChecksumManifest import build_manifest
+from OutputPlacement import place_outputs
+
+# RQ job states in which a job still holds (or will soon hold) the compute server.
+ACTIVE_JOB_STATUSES = {"queued", "started", "deferred", "scheduled"}
+# RQ job states from which a job can be retried with `retry_job`.
+RETRYABLE_JOB_STATUSES = {"failed", "stopped", "canceled"}
+# How long the job spec of a submission is kept for retries (seconds).
+JOB_SPEC_TTL = 30 * 24 * 3600
+
+# Compute server layout.
+NEXTFLOW_BIN = "/home/nfc/.local/bin/nextflow"
+RUN_FOLDER = "/APPLICATION/200611_A00789R_0071_BHHVCCDRXX"
+# Per-job launch directories (samplesheets, config, Nextflow work dir): <JOB_ROOT>/<job_key>
+JOB_ROOT = f"{RUN_FOLDER}/jobs"
+# Per-job pipeline output directories: <OUTPUT_ROOT>/<job_key>
+OUTPUT_ROOT = "/STORAGE/OUTPUT_TEST"
+# Further output roots a job is rerouted to when OUTPUT_ROOT cannot hold it (see `DiskAdmission`).
+ALTERNATE_OUTPUT_ROOTS = []
+# Upper bound for the disk space kept by job directories under JOB_ROOT.
+MAX_JOB_ROOT_BYTES = 500 * 1024 ** 3
+
+
+# ---------------------------
+# Job Key Construction
+# ---------------------------
+def compute_job_key(run_id, samplesheet_paths, config_path):
+    """
+    Computes a deterministic key identifying one demultiplexing job.
+
+    The key is derived from the run ID, the contents of every samplesheet that is shipped
+    with the job (lane sheets and the pipeline samplesheet) and the contents of the Nextflow
+    configuration file. Submitting the same run with unchanged sheets and configuration
+    therefore always yields the same key, while any edit to a sheet or to the config
+    produces a new one.
+
+    Args:
+        run_id (int or str): B-Fabric ID of the run being demultiplexed.
+        samplesheet_paths (list): Paths of the samplesheets that are sent with the job.
+        config_path (str): Path of the Nextflow configuration file (e.g., NFC_DMX.config).
+
+    Returns:
+        str: A key of the form "dmx-<run_id>-<16 hex digits>", usable as an RQ job ID.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"run:{run_id}\n".encode("utf-8"))
+
+    for path in samplesheet_paths:
+        with open(path, "rb") as f:
+            contents = f.read()
+        digest.update(f"sheet:{os.path.basename(path)}:{len(contents)}\n".encode("utf-8"))
+        digest.update(contents)
+
+    with open(config_path, "rb") as f:
+        config_hash = hashlib.sha256(f.read()).hexdigest()
+    digest.update(f"config:{config_hash}\n".encode("utf-8"))
+
+    return f"dmx-{run_id}-{digest.hexdigest()[:16]}"
+
+
+# ---------------------------
+# Idempotent Enqueue
+# ---------------------------
+def enqueue_unique(queue, job_key, func, kwargs, meta=None, depends_on=None):
+    """
+    Enqueues `func` under `job_key` unless a job with that key is already queued or running.
+
+    A short-lived Redis lock serialises concurrent submissions of the same key (e.g. a
+    double-click on Submit), so only one of them can create the job. A finished or failed
+    job with the same key is replaced by the new submission. The job spec (queue name and
+    kwargs) is stored alongside, so the job can later be retried with `retry_job`.
+
+    Args:
+        queue (rq.Queue): Queue to enqueue into ("light" or "heavy").
+        job_key (str): Deterministic job key from `compute_job_key`, used as the RQ job ID.
+        func (callable): Job function to run on the worker.
+        kwargs (dict): Keyword arguments for `func`.
+        meta (dict, optional): Job meta (e.g. the disk reservation from `DiskAdmission.admit_job`).
+        depends_on (list, optional): Job IDs the job waits for (whether they succeed or fail).
+
+    Returns:
+        tuple: (rq.job.Job, bool) The job holding the key and whether it was newly created.
+    """
+    conn = queue.connection
+    with conn.lock(f"demultiplex:submit-lock:{job_key}", timeout=60, blocking_timeout=30):
+        try:
+            existing = Job.fetch(job_key, connection=conn)
+        except NoSuchJobError:
+            existing = None
+
+        if existing is not None:
+            if existing.get_status() in ACTIVE_JOB_STATUSES:
+                return existing, False
+            # The previous run with this key is over; make room for the new submission.
+            existing.delete()
+
+        dependency = Dependency(jobs=depends_on, allow_failure=True) if depends_on else None
+        job = queue.enqueue(func, kwargs=kwargs, job_id=job_key, meta=meta, depends_on=dependency)
+        conn.set(job_spec_key(job_key), pickle.dumps({"queue": queue.name, "kwargs": kwargs, "meta": meta}), ex=JOB_SPEC_TTL)
+        return job, True
+
+
+def job_spec_key(job_key):
+    """Returns the Redis key under which the job spec for `job_key` is stored."""
+    return f"demultiplex:job-spec:{job_key}"
+
+
+# ---------------------------
+# Retry With Nextflow Resume
+# ---------------------------
+def retry_job(connection, job_key, token, queue_factory):
+    """
+    Re-enqueues a failed job from its stored spec with Nextflow's `-resume` enabled.
+
+    The retry runs under the same job key, so it reuses the job's launch and work
+    directory and Nextflow only re-executes the processes that did not complete.
+
+    Args:
+        connection (redis.Redis): Redis connection holding the jobs and job specs.
+        job_key (str): Key of the job to retry.
+        token (str): Current URL parameters (token) of the user, replacing the stored one.
+        queue_factory (callable): Returns an rq.Queue for a queue name (e.g., `q`).
+
+    Returns:
+        rq.job.Job: The re-enqueued job.
+
+    Raises:
+        ValueError: If the job is still active, already finished, or no job spec is stored.
+    """
+    with connection.lock(f"demultiplex:submit-lock:{job_key}", timeout=60, blocking_timeout=30):
+        try:
+            existing = Job.fetch(job_key, connection=connection)
+            status = existing.get_status()
+        except NoSuchJobError:
+            existing, status = None, None
+
+        if status in ACTIVE_JOB_STATUSES:
+            raise ValueError(f"Job {job_key} is still {status}.")
+        if status is not None and status not in RETRYABLE_JOB_STATUSES:
+            raise ValueError(f"Job {job_key} is {status}; only failed jobs can be retried.")
+
+        raw_spec = connection.get(job_spec_key(job_key))
+        if raw_spec is None:
+            raise ValueError(f"No stored job spec for {job_key}; please submit the run again.")
+        spec = pickle.loads(raw_spec)
+
+        kwargs = dict(spec["kwargs"])
+        kwargs["bash_commands"] = build_bash_commands(build_job_paths(job_key, kwargs.get("output_root")), resume=True)
+        kwargs["token"] = token
+
+        if existing is not None:
+            existing.delete()
+        queue = queue_factory(spec["queue"])
+        job = queue.enqueue(run_demultiplex_job, kwargs=kwargs, job_id=job_key, meta=spec.get("meta"))
+        connection.set(job_spec_key(job_key), pickle.dumps({**spec, "kwargs": kwargs}), ex=JOB_SPEC_TTL)
+        return job
+
+
+# ---------------------------
+# Per-Job Directories
+# ---------------------------
+def build_job_paths(job_key, output_root=None):
+    """
+    Derives all per-job locations on the compute server from the job key.
+
+    Every job gets its own launch directory (holding the shipped samplesheets, the config
+    and the Nextflow work directory) and its own output directory, so concurrent jobs never
+    share Nextflow state, outputs or reports.
+
+    Args:
+        job_key (str): Job key from `compute_job_key`.
+        output_root (str, optional): Output root chosen by the admission check (default: OUTPUT_ROOT).
+
+    Returns:
+        dict: Paths for the job:
+            {
+                "job_dir": "<JOB_ROOT>/<job_key>",
+                "work_dir": "<JOB_ROOT>/<job_key>/work",
+                "output_dir": "<OUTPUT_ROOT>/<job_key>",
+                "pipeline_samplesheet": "<job_dir>/pipeline_samplesheet.csv",
+                "config": "<job_dir>/NFC_DMX.config",
+                "nextflow_log": "<output_dir>/nextflow.log",
+                "trace": "<job_dir>/trace.txt",
+                "success_marker": "<job_dir>/.succeeded",
+                "registration_checkpoint": "<job_dir>/bfabric_registration.jsonl",
+                "checksum_manifest": "<output_dir>/checksums.tsv",
+            }
+    """
+    job_dir = f"{JOB_ROOT}/{job_key}"
+    output_dir = f"{output_root or OUTPUT_ROOT}/{job_key}"
+    return {
+        "job_dir": job_dir,
+        "work_dir": f"{job_dir}/work",
+        "output_dir": output_dir,
+        "pipeline_samplesheet": f"{job_dir}/pipeline_samplesheet.csv",
+        "config": f"{job_dir}/NFC_DMX.config",
+        "nextflow_log": f"{output_dir}/nextflow.log",
+        "trace": f"{job_dir}/trace.txt",
+        "success_marker": f"{job_dir}/.succeeded",
+        "registration_checkpoint": f"{job_dir}/bfabric_registration.jsonl",
+        "checksum_manifest": f"{output_dir}/checksums.tsv",
+    }
+
+
+def build_job_pipeline_samplesheet(pipeline_path, job_dir):
+    """
+    Returns the pipeline samplesheet with every lane samplesheet pointing into the job directory.
+
+    Args:
+        pipeline_path (str): Path of the pipeline_samplesheet.csv created by the app.
+        job_dir (str): Per-job launch directory on the compute server.
+
+    Returns:
+        bytes: The rewritten pipeline samplesheet.
+    """
+    with open(pipeline_path, newline="") as f:
+        reader = csv.DictReader(f)
+        fieldnames = reader.fieldnames
+        rows = list(reader)
+
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=fieldnames)
+    writer.writeheader()
+    for row in rows:
+        row["samplesheet"] = f"{job_dir}/{os.path.basename(row['samplesheet'])}"
+        writer.writerow(row)
+    return out.getvalue().encode("utf-8")
+
+
+def build_bash_commands(paths, resume=False):
+    """
+    Builds the bash commands that run the nf-core demultiplex pipeline for one job.
+
+    Nextflow is launched from the job directory with its own work directory, so its cache
+    and work files are never shared with another job. The success marker is only written
+    when Nextflow exits cleanly.
+
+    Args:
+        paths (dict): Per-job paths from `build_job_paths`.
+        resume (bool): Add `-resume`, so a retry only re-runs the processes that did not
+                       complete in the previous attempt of the same job.
+
+    Returns:
+        list: Bash command strings.
+    """
+    resume_flag = " -resume" if resume else ""
+    return [
+        f"""cd {paths["job_dir"]} && {NEXTFLOW_BIN} run nf-core/demultiplex \
+            -profile docker \
+            --input {paths["pipeline_samplesheet"]} \
+            --outdir {paths["output_dir"]} \
+            --demultiplexer bcl2fastq \
+            --skip_tools samshee,checkqc \
+            -c {paths["config"]} \
+            -w {paths["work_dir"]} \
+            -with-trace {paths["trace"]} \
+            -r 1.5.4{resume_flag} > {paths["nextflow_log"]} && touch {paths["success_marker"]}"""
+    ]
+
+
+@contextmanager
+def hold_job_dir(job_dir):
+    """
+    Holds an exclusive lock on a job directory for as long as the job is running.
+
+    `prune_job_dirs` skips every directory whose lock is held, so a running job's
+    work directory is never removed underneath it.
+    """
+    with open(os.path.join(job_dir, ".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def remove_dir_async(path):
+    """
+    Removes a directory in the background without blocking the job.
+
+    The directory is first renamed (an atomic metadata operation), so a new job with the
+    same key can recreate it immediately, and then deleted by a detached `rm -rf`.
+    """
+    if not os.path.isdir(path):
+        return
+    doomed = f"{path}.deleting-{int(time.time())}"
+    os.rename(path, doomed)
+    subprocess.Popen(
+        ["rm", "-rf", doomed],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True
+    )
+
+
+def directory_size(path):
+    """Returns the disk usage of a directory tree in bytes."""
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_blocks * 512
+            except OSError:
+                continue
+    return total
+
+
+def prune_job_dirs(job_root, max_bytes, keep=None, connection=None):
+    """
+    Removes the oldest idle job directories until `job_root` uses at most `max_bytes`.
+
+    Directories of running jobs (whose lock is held, see `hold_job_dir`), directories whose
+    lock cannot be checked and the directory named `keep` are never removed. With a Redis connection, neither are directories of jobs
+    whose job spec is still stored: a failed job can be retried with `retry_job`, which
+    resumes from its work directory. The spec of a succeeded job is deleted when it ends.
+
+    Args:
+        job_root (str): Directory containing one sub-directory per job.
+        max_bytes (int): Disk usage cap for `job_root`.
+        keep (str, optional): Name of a job directory that must be kept.
+        connection (redis.Redis, optional): Redis connection holding the job specs.
+
+    Returns:
+        list: Paths of the removed job directories.
+    """
+    if not os.path.isdir(job_root):
+        return []
+
+    entries = [e for e in os.scandir(job_root) if e.is_dir() and e.name != keep]
+    sizes = {e.path: directory_size(e.path) for e in entries}
+    total = sum(sizes.values())
+    if keep and os.path.isdir(os.path.join(job_root, keep)):
+        total += directory_size(os.path.join(job_root, keep))
+
+    removed = []
+    for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+        if total <= max_bytes:
+            break
+        if connection is not None and connection.exists(job_spec_key(entry.name)):
+            continue  # The job can still be retried.
+        lock_path = os.path.join(entry.path, ".lock")
+        try:
+            with open(lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except BlockingIOError:
+            continue  # The job is still running.
+        except FileNotFoundError:
+            total -= sizes[entry.path]  # Removed meanwhile (e.g. by another worker's pruning).
+            continue
+        except OSError as e:
+            # The lock could not be checked (e.g. no flock on an NFS mount): the job may be running.
+            print(f"Job directory {entry.path} kept, its lock could not be checked: {e}")
+            continue
+        total -= sizes[entry.path]
+        removed.append(entry.path)
+    return removed
+
+
+# ---------------------------
+# Run Metadata for the Performance History
+# ---------------------------
+def collect_run_metadata(run_id, csv_list):
+    """
+    Collects run-level metadata from the lane samplesheets written by `create_samplesheets`.
+
+    Args:
+        run_id (int or str): B-Fabric ID of the run.
+        csv_list (list): Paths of the lane samplesheets.
+
+    Returns:
+        dict: {"run_id", "run_name", "instrument", "lanes", "samples", "cycles"}
+    """
+    metadata = {"run_id": run_id, "run_name": "", "instrument": "", "lanes": len(csv_list), "samples": 0, "cycles": 0}
+
+    for index, sheet_path in enumerate(csv_list):
+        section = None
+        reads = []
+        with open(sheet_path, newline="") as f:
+            for line in f:
+                stripped = line.strip()
+                if stripped.startswith("["):
+                    section = stripped.split("]")[0] + "]"
+                    header_seen = False
+                    continue
+                if not stripped.strip(","):
+                    continue
+                fields = stripped.split(",")
+                if section == "[Header]" and index == 0:
+                    if fields[0] == "Instrument Type":
+                        metadata["instrument"] = fields[1]
+                    elif fields[0] == "Experiment Name":
+                        metadata["run_name"] = fields[1].rsplit(" - Lane", 1)[0]
+                elif section == "[Reads]":
+                    reads.append(int(fields[0]))
+                elif section == "[Data]":
+                    if header_seen:
+                        metadata["samples"] += 1
+                    header_seen = True
+        if index == 0:
+            metadata["cycles"] = sum(reads)
+
+    return metadata
+
+
+# ---------------------------
+# Job Entry Point (runs on the worker)
+# ---------------------------
+def write_job_files(files_as_byte_strings):
+    """
+    Writes the shipped files, leaving files whose content is already identical untouched.
+
+    Keeping unchanged files (and thus their modification times) intact matters for
+    retries: Nextflow's task cache includes input file timestamps, so rewriting an
+    identical samplesheet would invalidate every cached task.
+
+    Args:
+        files_as_byte_strings (dict): {destination_path: file as byte strings}
+
+    Returns:
+        list: Paths of the files that were (re)written.
+    """
+    written = []
+    for destination, file_bytes in files_as_byte_strings.items():
+        if os.path.isfile(destination):
+            with open(destination, "rb") as f:
+                if f.read() == file_bytes:
+                    continue
+        os.makedirs(os.path.dirname(destination) or ".", exist_ok=True)
+        with open(destination, "wb") as f:
+            f.write(file_bytes)
+        written.append(destination)
+    return written
+
+
+def execute_bash_commands(bash_commands):
+    """
+    Executes the bash commands one after another, stopping at the first failure.
+
+    Args:
+        bash_commands (list): Commands to execute.
+
+    Returns:
+        str: Log of all executed commands and their output.
+
+    Raises:
+        RuntimeError: If a command exits with a non-zero status.
+    """
+    logstring = ""
+    for cmd in bash_commands:
+        result = subprocess.run(cmd, shell=True, text=True, capture_output=True)
+        logstring += "---------------------------------------------------------\n"
+        if result.returncode != 0:
+            logstring += f"Command: {cmd}\nStatus: FAILURE ({result.returncode})\nError Output:\n{result.stderr.strip()}\n"
+            print(logstring)
+            raise RuntimeError(logstring)
+        logstring += f"Command: {cmd}\nStatus: SUCCESS\nOutput:\n{result.stdout.strip()}\n"
+    print(logstring)
+    return logstring
+
+
+def run_demultiplex_job(job_key, files_as_byte_strings, bash_commands, run_metadata=None, output_root=None, **job_kwargs):
+    """
+    Runs one demultiplexing job on the compute server.
+
+    Steps:
+      1. Creates the per-job launch and output directories.
+      2. Removes the oldest idle job directories if JOB_ROOT exceeds MAX_JOB_ROOT_BYTES.
+      3. While holding the job directory lock, writes the shipped files and runs the
+         Nextflow commands. If a command fails, the job raises, so RQ marks it as failed
+         and the work directory is kept for a `-resume` retry (see `retry_job`).
+         While Nextflow runs, its trace file is tailed and per-lane/per-process progress
+         is published to the job's Redis stream (see `NextflowProgress`). Afterwards the
+         trace is stored in the performance history (see `PerformanceHistory`). The final
+         snapshot ("succeeded" or "failed") is published when the job ends, whatever the
+         reason.
+      4. Places the FASTQ files into the container layout of `create_resource_paths_and_dataset`
+         with hardlinks, renames or reflinks instead of copies (see `OutputPlacement`), then
+         hashes them into the job's checksum manifest (see `ChecksumManifest`).
+      5. Registers the outputs in B-Fabric (workunits, datasets and resources, with the MD5 and
+         size from the manifest) in concurrent bulk calls, resuming from the job's checkpoint
+         on a retry (see `ResourceRegistration`), then attaches the reports and charges the
+         containers (see `finish_in_bfabric`).
+      6. Deletes the job's Nextflow work directory in the background.
+
+    Args:
+        job_key (str): Job key from `compute_job_key`.
+        files_as_byte_strings (dict): {destination_path: file as byte strings}
+        bash_commands (list): Commands from `build_bash_commands`.
+        run_metadata (dict, optional): Run metadata from `collect_run_metadata`.
+        output_root (str, optional): Output root chosen by the admission check (see `build_job_paths`).
+        **job_kwargs: Remaining keyword arguments of `bfabric_web_apps.run_main_job`
+                      ("token", "resource_paths", "dataset_dict", "attachment_paths",
+                      "charge", "service_id").
+    """
+    # Imported here: bfabric_web_apps loads Dash, which job planning (and the UI-less
+    # worker start) does not need.
+    from bfabric_web_apps import get_logger
+    from bfabric_web_apps.utils.callbacks import process_url_and_token
+
+    paths = build_job_paths(job_key, output_root)
+    os.makedirs(paths["job_dir"], exist_ok=True)
+    os.makedirs(paths["output_dir"], exist_ok=True)
+
+    current_job = get_current_job()
+    removed = prune_job_dirs(JOB_ROOT, MAX_JOB_ROOT_BYTES, keep=job_key,
+                             connection=current_job.connection if current_job else None)
+    if removed:
+        print(f"Removed old job directories: {removed}")
+
+    _, token_data, _, app_data, *_ = process_url_and_token(job_kwargs["token"])
+    L = get_logger(token_data) if token_data else None
+
+    with hold_job_dir(paths["job_dir"]):
+        publisher = ProgressPublisher(current_job.connection, job_key, paths["trace"]) if current_job else None
+        if publisher:
+            publisher.start()
+
+        # The final snapshot is published whatever ends the job, so no progress stream is
+        # left waiting for a job that is gone.
+        state = "failed"
+        try:
+            if os.path.exists(paths["success_marker"]):
+                os.remove(paths["success_marker"])
+            written = write_job_files(files_as_byte_strings)
+            print(f"Job files written: {written}")
+
+            started_at = time.time()
+            try:
+                bash_log = execute_bash_commands(bash_commands)
+            except RuntimeError as e:
+                record_performance(job_key, run_metadata, paths["trace"], "failed", started_at)
+                if L:
+                    L.log_operation("Error | ORIGIN: run_demultiplex_job function", f"Pipeline failed for job {job_key}; work directory kept for retry:\n{e}")
+                raise
+
+            record_performance(job_key, run_metadata, paths["trace"], "succeeded", started_at)
+            if token_data is None or app_data is None:
+                raise ValueError("Error: the job's token could not be validated; its outputs cannot be registered in B-Fabric.")
+            L.log_operation("Success | ORIGIN: run_demultiplex_job function", f"Bash commands executed successfully:\n{bash_log}")
+
+            resource_paths = job_kwargs.get("resource_paths", {})
+            placed = place_outputs(resource_paths, paths["output_dir"])
+            L.log_operation("Success | ORIGIN: run_demultiplex_job function", f"Outputs placed into container folders: {placed}")
+            output_files, _ = expand_resource_paths(resource_paths)
+            checksums = build_manifest(list(output_files), paths["checksum_manifest"])
+            L.log_operation("Success | ORIGIN: run_demultiplex_job function", f"Checksum manifest written: {paths['checksum_manifest']} ({len(checksums)} files)")
+
+            register_outputs(
+                token_data, app_data, resource_paths, job_kwargs.get("dataset_dict", {}),
+                checkpoint_path=paths["registration_checkpoint"], logger=L, checksums=checksums
+            )
+            finish_in_bfabric(token_data, L, job_kwargs.get("attachment_paths", {}), job_kwargs.get("charge", []),
+                              job_kwargs.get("service_id", 0))
+            # Registered completely: a later submission of the same job key registers anew.
+            if os.path.exists(paths["registration_checkpoint"]):
+                os.remove(paths["registration_checkpoint"])
+            # Nothing left to retry: the job directory may be pruned from now on.
+            if current_job:
+                current_job.connection.delete(job_spec_key(job_key))
+            state = "succeeded"
+        finally:
+            if publisher:
+                publisher.finish(state)
+
+    remove_dir_async(paths["work_dir"])
+
+
+def finish_in_bfabric(token_data, L, attachment_paths, charge, service_id=0):
+    """
+    Attaches the report files and charges the containers: steps 6 and 7 of
+    `bfabric_web_apps.run_main_job`, whose steps 1 to 5 the job does itself.
+
+    Args:
+        token_data (dict): Token data of the job's user.
+        L: Logger of the job.
+        attachment_paths (dict): {source path: file name} of the files to attach to the run.
+        charge (list): Container IDs to charge.
+        service_id (int): Service to charge; charging is skipped without one.
+    """
+    from bfabric_web_apps.utils.run_main_pipeline import attach_gstore_files_to_entities_as_link
+    from bfabric_web_apps.utils.charging import create_charge
+
+    try:
+        attach_gstore_files_to_entities_as_link(token_data, L, attachment_paths)
+        print("Attachment Paths:", attachment_paths)
+    except Exception as e:
+        L.log_operation("Error | ORIGIN: run_demultiplex_job function", f"Failed to attach extra files: {e}")
+        print("Error attaching extra files:", e)
+
+    if not charge:
+        L.log_operation("Info | ORIGIN: run_demultiplex_job function", "Charge creation skipped.")
+    elif not service_id:
+        print("Service ID not provided. Skipping charge creation.")
+        L.log_operation("Info | ORIGIN: run_demultiplex_job function", "Service ID not provided. Skipping charge creation.")
+    else:
+        for container_id in charge:
+            charge_id = create_charge(token_data, container_id, service_id)[0].get("id")
+            L.log_operation("Success | ORIGIN: run_demultiplex_job function", f"Charge created for container {container_id} with service ID {service_id} and charge id {charge_id}")
+            print(f"Charge created with id {charge_id} for container {container_id} with service ID {service_id}")
+
+    L.log_operation("Success | ORIGIN: run_demultiplex_job function", "All steps completed successfully.")
+    print("All steps completed successfully.")
+
+
+def record_performance(job_key, run_metadata, trace_path, state, started_at):
+    """
+    Stores the job's trace in the performance history. Failures are only printed, since
+    the history must never fail the job itself.
+    """
+    try:
+        count = PerformanceHistory.record_run(job_key, run_metadata, trace_path, state, started_at, time.time())
+        print(f"Recorded {count} task(s) of job {job_key} in the performance history.")
+    except Exception as e:
+        print(f"Failed to record performance history for job {job_key}: {e}")
+
 
 # ---------------------------
 # Resource Path Construction
 # ---------------------------
+@traced(rows=lambda result: len(result[0]))
 def create_resource_paths_and_dataset(token_data, base_dir):
     """
     Constructs a dictionary mapping resource file paths to container IDs using pipeline and sample CSV data.
@@ -75,10 +707,10 @@ def create_resource_paths_and_dataset(token_data, base_dir):
 
         # Enumerate samples to assign sample order (S1, S2, ...).
         for idx, sample in enumerate(samples, start=1):
-            sample_id = sample["Sample_ID"]
-            sample_name = sample["Sample_Name"]
+            sample_id = sample.sample_id
+            sample_name = sample.name
             # Use the Sample_Project field as container_id.
-            container_id = sample["Sample_Project"]
+            container_id = sample.project
 
             sample_identifier = f"S{idx}"
             
@@ -125,13 +757,13 @@ def parse_samples_csv(file_path):
 
     The function skips header sections until it reaches the "[Data]" marker.
     The row immediately following "[Data]" is assumed to be the header for the sample data.
-    Each subsequent row is converted into a dictionary using the header.
+    Each subsequent row is converted into a `SampleRecord` using the header.
 
     Args:
         file_path (str): Path to the sample CSV file.
 
     Returns:
-        list: A list of dictionaries, each representing a sample.
+        list: A list of `SampleRecord.SampleRecord`, one per sample.
 
     Raises:
         ValueError: If no "[Data]" section is found in the file.
@@ -152,6 +784,7 @@ def parse_samples_csv(file_path):
 
     # The header row is the next line after the [Data] marker.
     header = lines[data_index + 1].strip().split(',')
+    read_record = SampleRecord.row_reader(header)
     # Data rows start after the header.
     for line in lines[data_index + 2:]:
         if not line.strip():
@@ -159,6 +792,5 @@ def parse_samples_csv(file_path):
         row = line.strip().split(',')
         if len(row) < len(header):
             continue
-        sample_data = dict(zip(header, row))
-        samples.append(sample_data)
+        samples.append(read_record(row))
     return samples
\ No newline at end of file
@@ -1,94 +1,132 @@
-import bfabric_web_apps
-from bfabric_web_apps.objects.BfabricInterface import bfabric_interface
-from sample_sheet import SampleSheet, Sample
+# bfabric_web_apps (which imports Dash) is imported where it is used, so the worker and the
+# CLI scripts can use this module without loading the UI stack.
 from datetime import datetime
-import pandas as pd
-from io import StringIO
 import os
 import csv
-from dash import Input, Output, State, html, dcc, dash_table, callback, no_update
-import dash.exceptions
-import dash_bootstrap_components as dbc
-from generic.callbacks import app
+import json
+from SamplesheetPrefetch import load_cached_samplesheets
+from RedisPool import get_redis
+from BufferedLogger import get_logger
+from Tracing import span, traced
+from SheetTable import read_data_section
+from SamplesheetWriter import write_samplesheet, lane_sample_columns
+from SampleRecord import SampleRecord
 
 #-----------------------
-# Callback for creating samplesheets when loading the app
+# Asynchronous App Load: samplesheets are created in a background thread
 #-----------------------
-@app.callback(
-    Output('csv_list_store', 'data'),
-    [Input("token_data", "data")],
-    [State("app_data", "data")]
-)
-def create_samplesheets_when_loading_app(token_data, app_data):
+# Progress of an app load, stored as JSON in Redis so that any web process can report it.
+LOAD_STATE_KEY = "demultiplex:app-load:{load_id}"
+LOAD_STATE_TTL = 3600
+
+
+def write_load_state(load_id, **state):
+    """Updates the stored progress of an app load with the given fields."""
+    key = LOAD_STATE_KEY.format(load_id=load_id)
+    current = read_load_state(load_id) or {}
+    current.update(state)
+    get_redis().set(key, json.dumps(current), ex=LOAD_STATE_TTL)
+
+
+def read_load_state(load_id):
+    """Returns the stored progress of an app load, or None if it is unknown."""
+    raw = get_redis().get(LOAD_STATE_KEY.format(load_id=load_id))
+    return json.loads(raw) if raw else None
+
+
+def run_samplesheet_load(load_id, token_data, app_data):
     """
-    Generates the required samplesheet CSV files and returns as output.
+    Creates the samplesheets (see `create_samplesheets`) and records the progress of each stage.
+
+    If the run was prefetched by the worker (see `SamplesheetPrefetch`), the cached sheets are
+    written instead and B-Fabric is not queried. Runs in a background thread started by
+    `start_loading_samplesheets`.
 
     Args:
+        load_id (str): ID of this app load.
         token_data (dict): Authentication token data.
         app_data (dict): Application metadata.
-
-    Returns:
-        list: List of created CSV filenames (excluding the pipeline_samplesheet).
     """
-    if token_data:
-        csv_list, output_file = create_samplesheets(
+    csv_list = []
+
+    def progress(stage, message, csv_path=None, **details):
+        if csv_path:
+            csv_list.append(csv_path)
+        write_load_state(load_id, stage=stage, message=message, csv_list=list(csv_list), **details)
+
+    try:
+        cached = load_cached_samplesheets(
+            get_redis(),
+            token_data["entity_id_data"],
+            (app_data or {}).get("name"),
+            output_file_pipeline_samplesheet="pipeline_samplesheet.csv"
+        )
+        if cached:
+            csv_list_cached, output_file = cached
+            L = get_logger(token_data)
+            L.log_operation("Samplesheets Created | ORIGIN: demultiplex web app", f"Prefetched samplesheets loaded: {', '.join(csv_list_cached)} and {output_file}")
+            write_load_state(load_id, stage="done", message="Prefetched samplesheets loaded.", csv_list=csv_list_cached, done=True)
+            return
+
+        csv_list_created, output_file = create_samplesheets(
             token_data,
             app_data,
-            output_file_pipeline_samplesheet="pipeline_samplesheet.csv"
+            output_file_pipeline_samplesheet="pipeline_samplesheet.csv",
+            progress=progress
         )
-        L = bfabric_web_apps.get_logger(token_data)
-        L.log_operation("Samplesheets Created | ORIGIN: demultiplex web app", f"Samplesheets successfully created: {', '.join(csv_list)} and {output_file}")
-        return csv_list
+        L = get_logger(token_data)
+        L.log_operation("Samplesheets Created | ORIGIN: demultiplex web app", f"Samplesheets successfully created: {', '.join(csv_list_created)} and {output_file}")
+        write_load_state(load_id, stage="done", message="All samplesheets created.", csv_list=csv_list_created, done=True)
+    except Exception as e:
+        print(f"Creating the samplesheets failed: {e}")
+        write_load_state(load_id, stage="failed", message=f"Loading the run from B-Fabric failed: {e}", done=True, error=str(e))
 
 
 #-----------------------
 # Function for creating the samplesheets based on API calls to Bfabric
 #-----------------------
 
-def create_samplesheets(token_data, app_data, output_file_pipeline_samplesheet="pipeline_samplesheet.csv"):
+@traced(rows=lambda result: len(result[0]))
+def create_samplesheets(token_data, app_data, output_file_pipeline_samplesheet="pipeline_samplesheet.csv", progress=None,
+                        sheet_dir=".", logger=None):
     """
     Create lane-specific sample sheets and a pipeline_samplesheet.csv.
     
     Steps:
       1. Query metadata for run, rununit, and instrument.
       2. For each lane in the rununit, fetch lane-specific sample IDs and details.
-      3. Create a SampleSheet for each lane and write it to a file (e.g. Samplesheet_lane_1.csv).
+      3. Write an IEM samplesheet for each lane to a file (e.g. Samplesheet_lane_1.csv).
       4. Create a companion pipeline_samplesheet.csv that maps lanes to samplesheet paths.
     
     Parameters:
         token_data: Authentication and metadata token, must include "entity_id_data".
         app_data: Application metadata, expected to contain the key "name".
         output_file_pipeline_samplesheet: Filename for the pipeline samplesheet CSV.
+        progress: Optional callable `progress(stage, message, csv_path=None, **details)`, called at
+                  each stage ("run", "lanes", "samples", "lane"). For "lane", `csv_path` is the
+                  samplesheet that was just written.
+        sheet_dir: Directory the lane samplesheets are written to (default: the working directory).
+        logger: Logger used for the B-Fabric calls (default: `get_logger(token_data)`); the
+                prefetcher passes its own, since it runs without a user session.
     
     Returns:
         - A list of filenames for lane-specific CSV samplesheets (excluding pipeline_samplesheet.csv).
         - output_file, a string with the pipeline_samaplesheet name
     """
-    L = bfabric_web_apps.get_logger(token_data)
+    from bfabric_web_apps.objects.BfabricInterface import bfabric_interface
+
+    L = logger or get_logger(token_data)
     wrapper = bfabric_interface.get_wrapper()
+    progress = progress or (lambda stage, message, csv_path=None, **details: None)
 
     # Query run and rununit metadata using token_data "entity_id_data"
-    run = L.logthis(
-        api_call=wrapper.read,
-        endpoint="run",
-        obj={"id": token_data["entity_id_data"]},
-        flush_logs=False
-    )
-    rununit = L.logthis(
-        api_call=wrapper.read,
-        endpoint="rununit",
-        obj={"runid": token_data["entity_id_data"]},
-        flush_logs=False
-    )
+    progress("run", "Reading run metadata from B-Fabric...")
+    run = read_bfabric(L, wrapper, "run", {"id": token_data["entity_id_data"]})
+    rununit = read_bfabric(L, wrapper, "rununit", {"runid": token_data["entity_id_data"]})
 
     # Retrieve instrument data
     instrument_id = rununit[0]["instrument"]["id"]
-    instrument_data = L.logthis(
-        api_call=wrapper.read,
-        endpoint="instrument",
-        obj={"id": instrument_id},
-        flush_logs=False
-    )
+    instrument_data = read_bfabric(L, wrapper, "instrument", {"id": instrument_id})
 
     rununit_data = rununit[0]
     instrument_data = instrument_data[0]
@@ -97,15 +135,11 @@ def create_samplesheets(token_data, app_data, output_file_pipeline_samplesheet="
     lane_ids = [str(lane["id"]) for lane in rununit_data.get("rununitlane", [])]
     if not lane_ids:
         print("No lanes found in rununit data.")
-        return []
+        return [], None
+    progress("lanes", "Reading {} lanes...".format(len(lane_ids)), lanes_total=len(lane_ids))
 
     # Retrieve lane objects in a single call
-    lane_data_list = L.logthis(
-        api_call=wrapper.read,
-        endpoint="rununitlane",
-        obj={"id": lane_ids},
-        flush_logs=False
-    )
+    lane_data_list = read_bfabric(L, wrapper, "rununitlane", {"id": lane_ids})
 
     lane_samplesheet_files = {}  # Mapping from lane number to samplesheet filename
 
@@ -117,65 +151,59 @@ def create_samplesheets(token_data, app_data, output_file_pipeline_samplesheet="
             print("Lane {} does not have any assigned samples.".format(lane_number))
             continue
 
-        # Fetch full sample details; if more than 100 samples, fetch in batches
+        # Fetch full sample details in batches of 100, keeping only a compact record per sample
+        progress("samples", "Reading {} samples of lane {}...".format(len(lane_sample_ids), lane_number))
         lane_samples = []
-        if len(lane_sample_ids) < 100:
-            lane_samples = L.logthis(
-                api_call=wrapper.read,
-                endpoint="sample",
-                obj={"id": lane_sample_ids},
-                flush_logs=False
-            )
-        else:
-            for i in range(0, len(lane_sample_ids), 100):
-                lane_samples += L.logthis(
-                    api_call=wrapper.read,
-                    endpoint="sample",
-                    obj={"id": lane_sample_ids[i:i+100]},
-                    flush_logs=False
-                )
-
-        # Create a new SampleSheet object for the current lane
-        ss = SampleSheet()
-        ss.Header["IEMFileVersion"] = 5
-        ss.Header["Experiment Name"] = "{} - Lane {}".format(rununit_data.get("name"), lane_number)
-        ss.Header["Date"] = manipulate_date_format(rununit_data.get("created"))
-        ss.Header["Workflow"] = "GenerateFASTQ"
-        ss.Header["Application"] = app_data.get("name")
-        ss.Header["Instrument Type"] = instrument_data.get("name")
-        ss.Reads = [76, 76]
-        ss.Settings["Adapter"] = "CTGTCTCTTATACACATCT"
-
-        # Add each sample record to the samplesheet
-        for record in lane_samples:
-            sample_dict = {
-                "Sample_ID": record["id"],
-                "Sample_Name": record["name"],
-                "Sample_Plate": "",
-                "Sample_Well": "",
-                "Index_Plate": "",
-                "Index_Plate_Well": "",
-                "I7_Index_ID": record["multiplexiddmx"],
-                "index": record["multiplexiddmx"],
-                "I5_Index_ID": record["multiplexid2dmx"],
-                "index2": record["multiplexid2dmx"],
-                "Sample_Project": record["container"]["id"],
-                "Description": ""
-            }
-            ss.add_sample(Sample(sample_dict))
-
-        # Write the lane-specific samplesheet to a CSV file
-        lane_sheet_filename = "Samplesheet_lane_{}.csv".format(lane_number)
-        with open(lane_sheet_filename, "w+", newline="") as handle:
-            ss.write(handle)
+        for i in range(0, len(lane_sample_ids), 100):
+            batch = read_bfabric(L, wrapper, "sample", {"id": lane_sample_ids[i:i+100]})
+            lane_samples += [SampleRecord.from_bfabric(record) for record in batch]
+
+        # Write the lane-specific samplesheet, with the samples as one columnar batch
+        header = {
+            "IEMFileVersion": 5,
+            "Experiment Name": "{} - Lane {}".format(rununit_data.get("name"), lane_number),
+            "Date": manipulate_date_format(rununit_data.get("created")),
+            "Workflow": "GenerateFASTQ",
+            "Application": app_data.get("name"),
+            "Instrument Type": instrument_data.get("name"),
+        }
+        settings = {"Adapter": "CTGTCTCTTATACACATCT"}
+        lane_sheet_filename = os.path.normpath(os.path.join(sheet_dir, "Samplesheet_lane_{}.csv".format(lane_number)))
+        with span("samplesheet.write") as current:
+            write_samplesheet(lane_sheet_filename, header, [76, 76], settings, lane_sample_columns(lane_samples))
+            current.rows = len(lane_samples)
         print("Samplesheet for lane {} written to {}".format(lane_number, lane_sheet_filename))
         lane_samplesheet_files[lane_number] = lane_sheet_filename
+        progress("lane", "Lane {} ready.".format(lane_number), csv_path=lane_sheet_filename)
 
     # Generate the pipeline_samplesheet.csv (not included in the returned list)
     output_file = create_pipeline_samplesheet_csv(run[0], rununit_data, lane_samplesheet_files, output_file_pipeline_samplesheet)
     return list(lane_samplesheet_files.values()), output_file
 
 
+#-----------------------
+# Helper function: Traced B-Fabric Read
+#-----------------------
+def read_bfabric(L, wrapper, endpoint, obj):
+    """
+    Reads entities from B-Fabric through the logger and records the call as a
+    "bfabric.read" span (duration and number of returned entities) per endpoint.
+
+    Args:
+        L: Logger whose `logthis` performs the call.
+        wrapper: B-Fabric wrapper.
+        endpoint (str): B-Fabric endpoint (e.g., "sample").
+        obj (dict): Query.
+
+    Returns:
+        list: The returned entities.
+    """
+    with span("bfabric.read", endpoint=endpoint) as current:
+        result = L.logthis(api_call=wrapper.read, endpoint=endpoint, obj=obj, flush_logs=False)
+        current.rows = len(result)
+    return result
+
+
 #-----------------------
 # Helper function: Create Pipeline Samplesheet CSV
 #-----------------------
@@ -196,7 +224,7 @@ def create_pipeline_samplesheet_csv(run, rununit_data, lane_samplesheet_files, o
     run_id = os.path.basename(run.get("datafolder"))
     rows = []
     for lane_number, sheet_file in sorted(lane_samplesheet_files.items()):
-        full_sheet_path = os.path.join(run.get("datafolder"), sheet_file)
+        full_sheet_path = os.path.join(run.get("datafolder"), os.path.basename(sheet_file))
         rows.append([run_id, full_sheet_path, str(lane_number), run.get("datafolder")])
 
     with open(output_file, mode="w+", newline="") as csvfile:
@@ -227,124 +255,23 @@ def manipulate_date_format(original_str):
     return "{}/{}/{}".format(dt_obj.month, dt_obj.day, dt_obj.year)
 
 
-#-----------------------
-# Callback: Load Samplesheet Data for UI
-#-----------------------
-@app.callback(
-    Output("samplesheet-table", "data"),
-    Output("samplesheet-table", "columns"),
-    Output("samplesheet-table", "selected_rows"),
-    State("token_data", "data"),
-    Input("lane-dropdown", "value"),
-    Input("csv_list_store", "data"),  # Use the dynamically created CSV list,
-)
-def load_samplesheet_data(token_data, lane_value, csv_list):
-    """
-    Load and return samplesheet data based on the token, selected lane, and available CSV files.
-
-    Args:
-        token_data (dict): Authentication token data.
-        lane_value (int or None): The index of the selected lane.
-        csv_list (list): List of CSV file paths.
-
-    Returns:
-        tuple: A tuple containing:
-            - (list): Table data (list of dictionaries).
-            - (list): Table columns (list of dictionaries).
-            - (list): Indices of selected rows.
-    """
-    if not csv_list or not isinstance(csv_list, list):
-        raise dash.exceptions.PreventUpdate("No CSV list available.")
-    return load_samplesheet_data_when_loading_app(token_data, lane_value, csv_list)
-
-#-----------------------
-# Helper function: Load Samplesheet Data When Loading App
-#-----------------------
-
-def load_samplesheet_data_when_loading_app(token_data, lane_value, csv_list):
-    """
-    Loads samplesheet data for a specific lane from a CSV file.
-
-    Args:
-        token_data (dict): Authentication token data.
-        lane_value (int or None): The index of the selected lane.
-        csv_list (list): List of CSV file paths.
-
-    Returns:
-        tuple: A tuple containing:
-            - list: Table data (list of dictionaries).
-            - list: Table columns (list of dictionaries).
-            - list: Indices of selected rows.
-    """
-    if not token_data:
-        raise dash.exceptions.PreventUpdate
-    
-    if lane_value == None:
-         return [], [], []
-
-    try:
-        lane_index = int(lane_value)
-    except (ValueError, TypeError):
-        lane_index = 0
-
-    if lane_index >= len(csv_list):
-        raise dash.exceptions.PreventUpdate(f"Lane {lane_value} does not exist.")
-
-    csv_path = csv_list[lane_index]
-    if not os.path.isfile(csv_path):
-        raise dash.exceptions.PreventUpdate(f"{csv_path} doesn't exist yet.")
-
-    df = parse_samplesheet_data_only(csv_path)
-    if df.empty:
-        return [], [], []
-
-    editable_cols = {"index", "index2"}
-    columns = [{"name": col, "id": col, "editable": (col in editable_cols)} for col in df.columns]
-    data = df.to_dict("records")
-    all_indices = list(range(len(df)))
-    
-    return data, columns, all_indices
-
-
-
 #-----------------------
 # Helper function: Parse Samplesheet Data Only
 #-----------------------
 
-def parse_samplesheet_data_only(filepath):
+def parse_samplesheet_data_only(filepath, backend=None):
     """
     Parses the samplesheet CSV file to extract the data section.
 
     This function locates the "[Data]" marker and reads the CSV data starting from the header row
-    following the marker. Only specific columns are retained.
+    following the marker. Only specific columns are retained (see `SheetTable.DATA_COLUMNS`),
+    all of them as text.
 
     Args:
         filepath (str): Path to the samplesheet CSV file.
+        backend (optional): Table backend (see `SheetTable.get_backend`); Polars if installed.
 
     Returns:
-        pd.DataFrame: A DataFrame containing the samplesheet data.
+        polars.DataFrame or pd.DataFrame: The samplesheet data, in the backend's table type.
     """
-    with open(filepath, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-
-    # Locate the [Data] line.
-    data_start_idx = None
-    for i, line in enumerate(lines):
-        if line.strip().startswith("[Data]"):
-            data_start_idx = i
-            break
-
-    if data_start_idx is None:
-        return pd.DataFrame()
-
-    # Read data starting right after [Data]
-    csv_lines = lines[data_start_idx + 1:]  # +1 to include header row
-
-    csv_string = "".join(csv_lines)
-    df = pd.read_csv(StringIO(csv_string))
-
-    # Select only the specific columns
-    columns_to_keep = ["Sample_ID", "Sample_Name", "index", "index2", "Sample_Project"]
-    df = df[columns_to_keep]
-
-    return df
\ No newline at end of file
+    return read_data_section(filepath, backend)
\ No newline at end of file
@@ -1,16 +1,31 @@
 import bfabric_web_apps
-from bfabric_web_apps.utils.redis_queue import q
 
-from dash import Input, Output, State, html, dcc, dash_table, callback, no_update
+from dash import Input, Output, State, ALL, MATCH, html, dcc, dash_table, callback, no_update
 import dash.exceptions
 import dash_bootstrap_components as dbc
-import pandas as pd
 
 from generic.callbacks import app
 from generic.components import no_auth
 
 import os
-from GetDataFromBfabric import load_samplesheet_data_when_loading_app, parse_samplesheet_data_only
+import re
+import json
+import uuid
+import threading
+from flask import Response, request, stream_with_context
+from bfabric_web_apps.objects.BfabricInterface import bfabric_interface
+from rq.job import Job
+from rq.exceptions import NoSuchJobError
+from NextflowProgress import read_progress
+from ExecuteRunMainJob import ACTIVE_JOB_STATUSES
+from SamplesheetCache import get_sheet, mark_saved
+from RedisPool import get_redis, get_stream_redis, acquire_stream_slot, release_stream_slot
+from BufferedLogger import get_logger
+from WorkunitCache import get_workunit_layout
+from GetDataFromBfabric import write_load_state, read_load_state, run_samplesheet_load
+from Tracing import render_prometheus
+from SheetTable import get_backend, write_data_section
+from IndexImport import decode_upload, parse_import, normalise_indices, validate_indices, join_to_sheet
 
 # ------------------------------------------------------------------------------
 # Sidebar Components: Lane Dropdown, Queue Selection Dropdown, and Submit Button (Run Main Job)
@@ -23,6 +38,13 @@ sidebar = bfabric_web_apps.components.charge_switch + [
         options=[],   # Options will be updated dynamically based on created CSV files
         value=None,      # Default to the first lane
     ),
+    dbc.RadioItems(
+        id="view-mode",
+        options=[{"label": "Selected lane", "value": "single"}, {"label": "All lanes", "value": "all"}],
+        value="single",
+        inline=True,
+        style={"font-size": "16px", "margin-top": "10px"}
+    ),
     html.Br(),
     html.P(id="sidebar_text_3", children="Submit job to which queue?"),
     dcc.Dropdown(
@@ -35,6 +57,9 @@ sidebar = bfabric_web_apps.components.charge_switch + [
     ),
     html.Br(),
     dbc.Button('Submit', id='example-button'),
+    dbc.Button('Retry failed job', id='retry-button', color='secondary', style={"margin-left": "10px"}),
+    html.Br(),
+    html.Div(id="job-key-display", children="", style={"font-size": "14px", "margin-top": "10px", "word-break": "break-all"}),
 ]
 
 # ------------------------------------------------------------------------------  
@@ -81,6 +106,13 @@ app_specific_layout = dbc.Row(
                         dismissable=True,
                         is_open=False
                     ),
+                    dbc.Alert(
+                        "",
+                        color="info",
+                        id="alert-retry",
+                        dismissable=True,
+                        is_open=False
+                    ),
                 ]
             )
         ),
@@ -110,6 +142,8 @@ app_specific_layout = dbc.Row(
             html.Div(
                 id="page-content",
                 children=[
+                    # Progress of the app load (samplesheets are created in the background).
+                    html.Div(id="load-progress"),
                     # This is where the unauthenticated message or user UI is inserted:
                     html.Div(id="auth-div"),
 
@@ -119,13 +153,28 @@ app_specific_layout = dbc.Row(
                         data=[],
                         columns=[],
                         style_table={'display': 'none'},  # Hide initially
-                    )
+                    ),
+                    html.Div(id="progress-panel", style={"margin-left": "2vw", "margin-top": "20px"}),
                 ],
             ),
             width=9,
         ),
         dcc.Store(id='csv_list_store', data=[]),
+        # Background app load (see `start_loading_samplesheets`) and its progress polling.
+        dcc.Store(id='load-task-store', data=None),
+        dcc.Interval(id='load-interval', interval=500, n_intervals=0, disabled=True),
         dcc.Store(id='previous-lane-store', data=0),
+        # Cell edits and page selections on their way to the server (see `apply_sheet_delta`).
+        dcc.Store(id='edit-delta-store', data=None),
+        # Version of each lane's cached sheet on the server, by lane index.
+        dcc.Store(id='sheet-version-store', data={}),
+        dcc.Store(id='job-key-store', data=None),
+        dcc.Store(id='progress-store', data=None),
+        # Client-side only: reads the latest pushed progress, never calls the server.
+        dcc.Interval(id='progress-interval', interval=1000, n_intervals=0),
+        # Picks up background refreshes of the cached workunit listing (see `WorkunitCache`).
+        dcc.Store(id='workunits-version-store', data=None),
+        dcc.Interval(id='workunits-interval', interval=10 * 1000, n_intervals=0),
     ],
     style={"margin-top": "0px", "min-height": "40vh"},
 )
@@ -251,6 +300,7 @@ def toggle_modal(n1, n2, is_open):
 @app.callback(
     [
         Output('example-button', 'disabled'),
+        Output('retry-button', 'disabled'),
         Output('submit-bug-report', 'disabled'),
         Output('Submit', 'disabled'),
         Output('auth-div', 'children'),
@@ -268,16 +318,17 @@ def update_ui(token_data, entity_data):
 
     Returns:
         - (bool): Whether the example button is disabled.
+        - (bool): Whether the retry button is disabled.
         - (bool): Whether the bug report submit button is disabled.
         - (bool): Whether the Submit button is disabled.
         - (dash_html_components.Div): Content for the auth-div (either authentication message or DataTable).
     """
     if token_data is None:
-        sidebar_state = (True, True, True)
+        sidebar_state = (True, True, True, True)
     elif not bfabric_web_apps.DEV:
-        sidebar_state = (False, False, False)
+        sidebar_state = (False, False, False, False)
     else:
-        sidebar_state = (True, True, True)
+        sidebar_state = (True, True, True, True)
 
     if not entity_data or not token_data:
         auth_div_content = html.Div(
@@ -286,7 +337,7 @@ def update_ui(token_data, entity_data):
         )
 
     else:
-        L = bfabric_web_apps.get_logger(token_data)
+        L = get_logger(token_data)
         L.log_operation("INFO", "Application initialization started.") #Upgrade in Template
         try:
             samplesheet_table = dash_table.DataTable(
@@ -294,31 +345,83 @@ def update_ui(token_data, entity_data):
                 data=[],        
                 columns=[],     
                 editable=True,
-                sort_action="native",
+                # Paging, filtering and sorting run on the server against the cached sheet
+                # (see `load_samplesheet_page`), so only the visible page is sent to the browser.
+                sort_action="custom",
                 sort_mode="multi",
+                sort_by=[],
+                filter_action="custom",
+                filter_query="",
                 column_selectable="single",
                 row_selectable="multi",
                 row_deletable=False,
                 selected_columns=[],
                 selected_rows=[],
-                page_action="native",
+                page_action="custom",
                 page_current=0,
                 page_size=15,
+                page_count=1,
                 style_table={'overflowX': 'auto', 'maxWidth': '90%'},
                 style_cell={'minWidth': '60px', 'width': '100px', 'maxWidth': '180px', 'whiteSpace': 'normal'},
             )
+            index_import = dbc.Card(
+                dbc.CardBody([
+                    html.H6("Bulk index import"),
+                    html.P(
+                        "Upload or paste a CSV/TSV with a Sample_ID or Sample_Name column and index (i7) / index2 (i5) "
+                        "columns, or a plate layout whose wells hold 'sample;i7;i5'. The indices are applied to the selected lane.",
+                        style={"fontSize": "14px"}
+                    ),
+                    dcc.Upload(
+                        id="index-upload",
+                        children=html.Div(["Drag and drop or ", html.A("select a file")]),
+                        style={"borderWidth": "1px", "borderStyle": "dashed", "borderRadius": "5px",
+                               "textAlign": "center", "padding": "10px", "fontSize": "14px"},
+                        multiple=False,
+                    ),
+                    dcc.Textarea(id="index-paste", placeholder="...or paste the table here",
+                                 style={"width": "100%", "height": "80px", "marginTop": "10px", "fontSize": "13px"}),
+                    dbc.Row([
+                        dbc.Col(dbc.RadioItems(
+                            id="index-join-on",
+                            options=[{"label": "Auto", "value": "auto"},
+                                     {"label": "Sample_ID", "value": "Sample_ID"},
+                                     {"label": "Sample_Name", "value": "Sample_Name"}],
+                            value="auto", inline=True, style={"fontSize": "14px"}
+                        )),
+                        dbc.Col(dbc.Checklist(
+                            id="index-import-options",
+                            options=[{"label": "Reverse-complement i5", "value": "revcomp_i5"}],
+                            value=[], inline=True, style={"fontSize": "14px"}
+                        )),
+                        dbc.Col(dbc.Button("Import indices", id="index-import-button", size="sm", color="secondary"), width="auto"),
+                    ], style={"marginTop": "10px"}),
+                    dbc.Alert(id="index-import-result", is_open=False, dismissable=True,
+                              style={"marginTop": "10px", "fontSize": "14px", "whiteSpace": "pre-line"}),
+                ]),
+                style={"maxWidth": "90%", "marginTop": "30px"}
+            )
             auth_div_content = html.Div(
                 children=[
-                    html.H4(
-                        id="samplesheet-title",
-                        children="",
-                        style={
-                            "fontSize": "18px",       # Smaller text size
-                            "marginTop": "50px",      # A bit lower
-                            "textAlign": "left"     # Center aligned
-                        }
-                    ),
-                    samplesheet_table
+                    index_import,
+                    html.Div(id="single-lane-view", children=[
+                        html.H4(
+                            id="samplesheet-title",
+                            children="",
+                            style={
+                                "fontSize": "18px",       # Smaller text size
+                                "marginTop": "50px",      # A bit lower
+                                "textAlign": "left"     # Center aligned
+                            }
+                        ),
+                        html.Div(id="samplesheet-selection-info", style={"fontSize": "14px", "marginBottom": "10px"}),
+                        samplesheet_table
+                    ]),
+                    # Overview of all lanes; a lane's table is only loaded while its item is expanded.
+                    html.Div(id="all-lanes-view", style={"display": "none", "marginTop": "50px", "maxWidth": "90%"}, children=[
+                        dbc.Accordion(id="lanes-accordion", children=[], always_open=True, start_collapsed=True),
+                        dcc.Store(id="loaded-lanes-store", data=[]),
+                    ]),
                 ]
                 ,
                 style={"margin-top": "1vw", "margin-left": "2vw", "margin-bottom": "2vw"}
@@ -401,62 +504,684 @@ def highlight_selected_columns(selected_columns):
     """
     return [{'if': {'column_id': col}, 'background_color': '#D2F3FF'} for col in selected_columns]
 
+# ---------------------------
+# Callback: Start creating the samplesheets when loading the app
+# ---------------------------
+@app.callback(
+    Output('load-task-store', 'data'),
+    Output('load-interval', 'disabled'),
+    [Input("token_data", "data")],
+    [State("app_data", "data")]
+)
+def start_loading_samplesheets(token_data, app_data):
+    """
+    Starts creating the samplesheets in a background thread and returns immediately.
+
+    The page stays responsive while B-Fabric is queried; `report_load_progress` shows the
+    progress and hands over each lane's samplesheet as soon as it is written.
+
+    Args:
+        token_data (dict): Authentication token data.
+        app_data (dict): Application metadata.
+
+    Returns:
+        tuple: The load task ({"id", "done"}) and False to start the progress interval.
+    """
+    if not token_data:
+        raise dash.exceptions.PreventUpdate
+
+    load_id = uuid.uuid4().hex
+    write_load_state(load_id, stage="run", message="Reading run metadata from B-Fabric...", csv_list=[], done=False)
+    threading.Thread(target=run_samplesheet_load, args=(load_id, token_data, app_data), daemon=True).start()
+    return {"id": load_id, "done": False}, False
+
+
+# ---------------------------
+# Callback: Report the progress of the app load
+# ---------------------------
+@app.callback(
+    Output('csv_list_store', 'data'),
+    Output('load-progress', 'children'),
+    Output('load-interval', 'disabled', allow_duplicate=True),
+    Output('load-task-store', 'data', allow_duplicate=True),
+    Output('lane-dropdown', 'value', allow_duplicate=True),
+    Input('load-interval', 'n_intervals'),
+    State('load-task-store', 'data'),
+    State('csv_list_store', 'data'),
+    State('lane-dropdown', 'value'),
+    prevent_initial_call=True
+)
+def report_load_progress(n_intervals, load_task, csv_list, lane_value):
+    """
+    Shows the progress of the app load and fills in the lanes as they become available.
+
+    The lane list is only sent when a new lane was written. The first lane is selected as soon
+    as its samplesheet exists, so its table is shown while the other lanes are still loading.
+
+    Args:
+        n_intervals (int): Number of progress polls.
+        load_task (dict): The load task ({"id", "done", "error"}); "error" is set if the load failed
+                          or its state is no longer known.
+        csv_list (list): Lane samplesheets already handed to the UI.
+        lane_value (int or None): Currently selected lane.
+
+    Returns:
+        tuple: Lane samplesheets, progress display, whether polling stops, the load task and
+               the selected lane.
+    """
+    if not load_task:
+        raise dash.exceptions.PreventUpdate
+    state = read_load_state(load_task["id"])
+    if state is None:
+        # Expired or never written: what was loaded is unknown, so the run cannot be submitted.
+        message = "The state of loading the run was lost. Please reload the app."
+        return no_update, html.P(message, style={"color": "red", "margin": "20px 2vw"}), True, \
+            {**load_task, "done": True, "error": message}, no_update
+
+    new_csv_list = state.get("csv_list", [])
+    csv_output = new_csv_list if new_csv_list != (csv_list or []) else no_update
+    lane_output = 0 if new_csv_list and lane_value is None else no_update
+
+    if state.get("done") and not state.get("error"):
+        progress_display = ""
+    else:
+        lanes_total = state.get("lanes_total") or 0
+        lanes_done = len(new_csv_list)
+        progress_display = html.Div([
+            html.P(state.get("message", ""), style={"fontSize": "14px", "marginBottom": "5px"}),
+            dbc.Progress(
+                value=(100 * lanes_done / lanes_total) if lanes_total else 5,
+                label=f"{lanes_done}/{lanes_total} lanes" if lanes_total else "",
+                color="danger" if state.get("error") else "info",
+                style={"maxWidth": "90%"}
+            ),
+        ], style={"margin": "20px 2vw"})
+
+    task = {**load_task, "done": bool(state.get("done")), "error": state.get("error")}
+    return csv_output, progress_display, bool(state.get("done")), task, lane_output
+
+
+# ---------------------------
+# Callback: Load One Page of the Samplesheet
+# ---------------------------
+@app.callback(
+    Output("samplesheet-table", "data"),
+    Output("samplesheet-table", "columns"),
+    Output("samplesheet-table", "selected_rows"),
+    Output("samplesheet-table", "page_count"),
+    Output("samplesheet-table", "page_current"),
+    Input("lane-dropdown", "value"),
+    Input("csv_list_store", "data"),
+    Input("samplesheet-table", "page_current"),
+    Input("samplesheet-table", "page_size"),
+    Input("samplesheet-table", "sort_by"),
+    Input("samplesheet-table", "filter_query"),
+    State("token_data", "data"),
+)
+def load_samplesheet_page(lane_value, csv_list, page_current, page_size, sort_by, filter_query, token_data):
+    """
+    Load the visible page of the selected lane's samplesheet.
+
+    The lane CSV is parsed once and kept in the server-side `SamplesheetCache`, together with
+    the row selection (a bitmap) and the user's edits. Filtering, sorting and paging are applied
+    to the cached sheet, and only the rows of the current page are returned. Each row carries
+    its position in the file as "id", so edits and selections can be mapped back.
+
+    Args:
+        lane_value (int or None): The index of the selected lane.
+        csv_list (list): List of CSV file paths.
+        page_current (int): Current page of the table.
+        page_size (int): Rows per page.
+        sort_by (list): Sort columns and directions of the table.
+        filter_query (str): Filter expression of the table.
+        token_data (dict): Authentication token data.
+
+    Returns:
+        tuple: A tuple containing:
+            - (list): Records of the current page.
+            - (list): Table columns (list of dictionaries).
+            - (list): Page-relative indices of the selected rows.
+            - (int): Number of pages.
+            - (int): Current page (reset to 0 when the lane changes).
+    """
+    if not token_data or not csv_list or not isinstance(csv_list, list):
+        raise dash.exceptions.PreventUpdate("No CSV list available.")
+    if lane_value is None:
+        return [], [], [], 1, 0
+
+    try:
+        lane_index = int(lane_value)
+    except (ValueError, TypeError):
+        lane_index = 0
+
+    if lane_index >= len(csv_list):
+        raise dash.exceptions.PreventUpdate(f"Lane {lane_value} does not exist.")
+
+    csv_path = csv_list[lane_index]
+    if not os.path.isfile(csv_path):
+        raise dash.exceptions.PreventUpdate(f"{csv_path} doesn't exist yet.")
+
+    triggered = dash.callback_context.triggered_id
+    if triggered in ("lane-dropdown", "csv_list_store"):
+        page_current = 0
+
+    sheet = get_sheet(csv_path)
+    if sheet.row_count() == 0:
+        return [], [], [], 1, 0
+
+    data, selected_rows, page_count = sheet.query_page(page_current or 0, page_size or 15, sort_by, filter_query)
+    return data, sheet.columns(), selected_rows, page_count, page_current or 0
+
+
+# ---------------------------
+# Client-side Callback: Capture Edits as Cell Deltas
+# ---------------------------
+# Runs in the browser on every edit (`data_timestamp` is only set by user edits) and every
+# selection change. Only the changed cells (row ID, column, old and new value) and the
+# selection state of the visible page's rows are sent on; the table data itself never
+# leaves the browser. The page is diffed against `data_previous` rather than looking at
+# `active_cell` alone, because a paste can change several cells at once.
+app.clientside_callback(
+    """
+    function(dataTimestamp, selectedRows, data, previous, lane) {
+        const dc = window.dash_clientside;
+        if (lane === null || lane === undefined || !data || !data.length || data[0].id === undefined) {
+            return dc.no_update;
+        }
+        const triggered = dc.callback_context.triggered.map(t => t.prop_id);
+        const changes = [];
+        if (triggered.includes("samplesheet-table.data_timestamp") && previous) {
+            const before = {};
+            previous.forEach(row => { before[row.id] = row; });
+            data.forEach(row => {
+                const old = before[row.id];
+                if (!old) { return; }
+                ["index", "index2"].forEach(column => {
+                    if (row[column] !== old[column]) {
+                        changes.push({id: row.id, column: column, old: old[column], new: row[column]});
+                    }
+                });
+            });
+        }
+        const selected = new Set(selectedRows || []);
+        return {
+            lane: lane,
+            sent: Date.now(),
+            changes: changes,
+            selection: data.map((row, i) => [row.id, selected.has(i)])
+        };
+    }
+    """,
+    Output("edit-delta-store", "data"),
+    Input("samplesheet-table", "data_timestamp"),
+    Input("samplesheet-table", "selected_rows"),
+    State("samplesheet-table", "data"),
+    State("samplesheet-table", "data_previous"),
+    State("lane-dropdown", "value"),
+    prevent_initial_call=True
+)
+
+
+# ---------------------------
+# Callback: Show Background Refreshes of the Workunit Listing
+# ---------------------------
+@app.callback(
+    Output("workunits-content", "children", allow_duplicate=True),
+    Output("workunits-version-store", "data"),
+    Input("workunits-interval", "n_intervals"),
+    State("token_data", "data"),
+    State("workunits-version-store", "data"),
+    prevent_initial_call=True
+)
+def refresh_workunits_tab(n_intervals, token_data, shown_version):
+    """
+    Re-renders the workunits tab when the cached listing changed since it was last shown.
+
+    Reading the cached listing also starts a background sync once it is stale, so an open tab
+    keeps following new workunits without querying B-Fabric per tick.
+
+    Args:
+        n_intervals (int): Number of polls.
+        token_data (dict): Authentication token data.
+        shown_version (int or None): Listing version currently shown.
+
+    Returns:
+        tuple: The workunits tab content and its listing version.
+    """
+    if not token_data:
+        raise dash.exceptions.PreventUpdate
+    layout, version = get_workunit_layout(token_data)
+    if version == shown_version:
+        raise dash.exceptions.PreventUpdate
+    return layout, version
+
+
+# ---------------------------
+# Callback: Apply Cell Deltas to the Cached Sheet
+# ---------------------------
+@app.callback(
+    Output("sheet-version-store", "data"),
+    Output("samplesheet-selection-info", "children"),
+    Input("edit-delta-store", "data"),
+    State("csv_list_store", "data"),
+    State("sheet-version-store", "data"),
+    prevent_initial_call=True
+)
+def apply_sheet_delta(delta, csv_list, versions):
+    """
+    Apply the cell deltas and page selection sent by the browser to the cached sheet in place.
+
+    Args:
+        delta (dict): {"lane", "changes": [{"id", "column", "old", "new"}, ...],
+                       "selection": [[row ID, selected], ...]}
+        csv_list (list): List of CSV file paths.
+        versions (dict): Version of each lane's cached sheet, by lane index.
+
+    Returns:
+        tuple: A tuple containing:
+            - (dict): Updated versions, including the new version of this lane's sheet.
+            - (str): Number of selected samples in the lane.
+    """
+    if not delta or not csv_list:
+        raise dash.exceptions.PreventUpdate
+
+    lane_index = int(delta["lane"])
+    sheet = get_sheet(csv_list[lane_index])
+    conflicts = sheet.apply_cell_changes(delta.get("changes", []))
+    if conflicts:
+        print(f"Lane {lane_index + 1}: {len(conflicts)} edit(s) overwrote values changed elsewhere: {conflicts}")
+    sheet.apply_selection(delta.get("selection", []))
+
+    versions = dict(versions or {})
+    versions[str(lane_index)] = sheet.version
+    return versions, f"{sheet.selection.count()} of {sheet.selection.size} samples selected"
+
+
+# ---------------------------
+# Callback: Bulk Index Import
+# ---------------------------
+@app.callback(
+    Output("samplesheet-table", "data", allow_duplicate=True),
+    Output("samplesheet-table", "selected_rows", allow_duplicate=True),
+    Output("sheet-version-store", "data", allow_duplicate=True),
+    Output("index-import-result", "children"),
+    Output("index-import-result", "color"),
+    Output("index-import-result", "is_open"),
+    Output("index-upload", "contents"),
+    Output("index-upload", "filename"),
+    Input("index-import-button", "n_clicks"),
+    State("index-upload", "contents"),
+    State("index-upload", "filename"),
+    State("index-paste", "value"),
+    State("index-join-on", "value"),
+    State("index-import-options", "value"),
+    State("lane-dropdown", "value"),
+    State("csv_list_store", "data"),
+    State("sheet-version-store", "data"),
+    State("samplesheet-table", "page_current"),
+    State("samplesheet-table", "page_size"),
+    State("samplesheet-table", "sort_by"),
+    State("samplesheet-table", "filter_query"),
+    prevent_initial_call=True
+)
+def import_indices(n_clicks, upload_contents, upload_filename, pasted, join_on, options, lane_value, csv_list,
+                   versions, page_current, page_size, sort_by, filter_query):
+    """
+    Apply indices from an uploaded or pasted file to the selected lane.
+
+    The callback executes the following steps:
+      1. Parses the upload (preferred) or the pasted text with `parse_import` (CSV/TSV table or plate layout).
+         The upload is cleared after every import, so a later import reads the pasted text
+         unless a new file is uploaded.
+      2. Normalises case and whitespace and, if requested, reverse-complements i5 (`normalise_indices`).
+      3. Validates all indices in one vectorised pass (`validate_indices`); nothing is applied if any is invalid.
+      4. Hash-joins the import to the lane's cached sheet by Sample_ID or Sample_Name (`join_to_sheet`).
+      5. Applies the changed cells to the cached sheet as cell deltas and writes the lane CSV with
+         `save_cached_sheet`, the same path as edits made in the table.
+      6. Reloads the visible page of the table.
+
+    Args:
+        n_clicks (int): Number of clicks on the import button.
+        upload_contents (str or None): Contents of the uploaded file (base64 data URL).
+        upload_filename (str or None): Name of the uploaded file.
+        pasted (str or None): Pasted import text.
+        join_on (str): "auto", "Sample_ID" or "Sample_Name".
+        options (list): Selected options (e.g., ["revcomp_i5"]).
+        lane_value (int or None): The index of the selected lane.
+        csv_list (list): List of CSV file paths.
+        versions (dict): Version of each lane's cached sheet, by lane index.
+        page_current, page_size, sort_by, filter_query: Current paging, sorting and filter of the table.
+
+    Returns:
+        tuple: Page data, selected rows and sheet versions (unchanged on failure), followed by the
+               result message, its color and whether it is shown, and the cleared upload
+               (contents and file name).
+    """
+    if lane_value is None or not csv_list:
+        return no_update, no_update, no_update, "Select a lane first.", "warning", True, no_update, no_update
+
+    try:
+        if upload_contents:
+            text, source = decode_upload(upload_contents), upload_filename
+        else:
+            text, source = pasted or "", "pasted table"
+        imported = normalise_indices(parse_import(text), reverse_complement_i5="revcomp_i5" in (options or []))
+        errors = validate_indices(imported)
+        if errors:
+            return no_update, no_update, no_update, "Nothing was imported:\n" + "\n".join(errors), "danger", True, None, None
+
+        lane_index = int(lane_value)
+        csv_path = csv_list[lane_index]
+        sheet = get_sheet(csv_path)
+        changes, unmatched, join_column = join_to_sheet(sheet.to_pandas(), imported, join_on)
+        sheet.apply_cell_changes(changes)
+        save_cached_sheet(csv_path, (versions or {}).get(str(lane_index)))
+
+    except ValueError as e:
+        return no_update, no_update, no_update, f"Import failed: {e}", "danger", True, None, None
+
+    versions = dict(versions or {})
+    versions[str(lane_index)] = sheet.version
+    data, selected_rows, _ = sheet.query_page(page_current or 0, page_size or 15, sort_by, filter_query)
+
+    message = f"{len(changes)} index value(s) updated from {source} (joined on {join_column}, {len(imported)} imported rows)."
+    if unmatched:
+        message += f"\n{len(unmatched)} imported sample(s) not found in this lane: {', '.join(unmatched[:10])}"
+    return data, selected_rows, versions, message, "warning" if unmatched else "success", True, None, None
+
+
+# ---------------------------
+# Callback: Switch Between the Selected Lane and the All-Lanes Overview
+# ---------------------------
+@app.callback(
+    Output("single-lane-view", "style"),
+    Output("all-lanes-view", "style"),
+    Input("view-mode", "value"),
+    State("all-lanes-view", "style"),
+    prevent_initial_call=True
+)
+def switch_view_mode(view_mode, all_lanes_style):
+    """
+    Show either the selected lane's table or the overview of all lanes.
+
+    Args:
+        view_mode (str): "single" or "all".
+        all_lanes_style (dict): Current style of the overview container.
+
+    Returns:
+        tuple: Styles of the single-lane view and of the overview.
+    """
+    overview = view_mode == "all"
+    return (
+        {"display": "none"} if overview else {},
+        {**(all_lanes_style or {}), "display": "block" if overview else "none"},
+    )
+
+
+# ---------------------------
+# Callback: Build the All-Lanes Accordion
+# ---------------------------
+@app.callback(
+    Output("lanes-accordion", "children"),
+    Output("loaded-lanes-store", "data"),
+    Input("csv_list_store", "data"),
+)
+def build_lanes_accordion(csv_list):
+    """
+    Create one (empty, collapsed) accordion item per lane.
+
+    Only the structure is built here; summaries are filled in by `update_lane_summaries` and
+    tables by `load_expanded_lanes`.
+
+    Args:
+        csv_list (list): List of CSV file paths.
+
+    Returns:
+        tuple: Accordion items and the (empty) list of loaded lanes.
+    """
+    if not csv_list or not isinstance(csv_list, list):
+        return [], []
+    items = [
+        dbc.AccordionItem(
+            id={"type": "lane-item", "lane": i},
+            item_id=str(i),
+            title=f"Lane {i + 1}",
+            children=html.Div(id={"type": "lane-table-container", "lane": i}),
+        )
+        for i in range(len(csv_list))
+    ]
+    return items, []
+
+
+# ---------------------------
+# Callback: Lane Summaries (sample counts, index collisions, edit state)
+# ---------------------------
+@app.callback(
+    Output({"type": "lane-item", "lane": ALL}, "title"),
+    Input("view-mode", "value"),
+    Input("sheet-version-store", "data"),
+    Input("loaded-lanes-store", "data"),
+    State("csv_list_store", "data"),
+    prevent_initial_call=True
+)
+def update_lane_summaries(view_mode, versions, loaded_lanes, csv_list):
+    """
+    Summarise every lane in its accordion title.
+
+    Summaries come from the cached sheets (see `CachedSheet.summary`) and are only computed
+    while the overview is shown; they are recomputed only for lanes that changed.
+
+    Args:
+        view_mode (str): "single" or "all".
+        versions (dict): Version of each lane's cached sheet (triggers a refresh after edits).
+        loaded_lanes (list): Expanded lanes (set when the accordion is built or toggled).
+        csv_list (list): List of CSV file paths.
+
+    Returns:
+        list: One title per lane.
+    """
+    if view_mode != "all" or not csv_list:
+        raise dash.exceptions.PreventUpdate
+
+    titles = []
+    for output in dash.callback_context.outputs_list:
+        lane_index = output["id"]["lane"]
+        csv_path = csv_list[lane_index]
+        if not os.path.isfile(csv_path):
+            titles.append(f"Lane {lane_index + 1}: samplesheet missing")
+            continue
+        summary = get_sheet(csv_path).summary()
+        if summary["duplicates"]:
+            collisions = f"{summary['duplicates']} duplicate index pair(s)"
+        elif summary["similar"]:
+            collisions = f"{summary['similar']} index pair(s) too similar"
+        else:
+            collisions = "no index collisions"
+        state = "unsaved edits" if summary["dirty"] else ("edited" if summary["version"] else "unchanged")
+        titles.append(
+            f"Lane {lane_index + 1}: {summary['selected']} of {summary['samples']} samples selected · {collisions} · {state}"
+        )
+    return titles
+
+
+# ---------------------------
+# Callback: Load the Tables of Expanded Lanes
+# ---------------------------
+@app.callback(
+    Output({"type": "lane-table-container", "lane": ALL}, "children"),
+    Output("loaded-lanes-store", "data", allow_duplicate=True),
+    Input("lanes-accordion", "active_item"),
+    State("loaded-lanes-store", "data"),
+    prevent_initial_call=True
+)
+def load_expanded_lanes(active_items, loaded_lanes):
+    """
+    Create the table of a lane when its accordion item is expanded and drop it when collapsed.
+
+    Lanes that stay expanded keep their table (and page) untouched. The rows themselves are
+    loaded page by page by `load_lane_overview_page`, so collapsed lanes send no data at all.
+
+    Args:
+        active_items (list or None): Item IDs (lane indices as str) of the expanded lanes.
+        loaded_lanes (list): Lanes whose table was created before.
+
+    Returns:
+        tuple: Children of every lane container and the lanes now loaded.
+    """
+    active = set(active_items or [])
+    loaded = set(loaded_lanes or [])
+
+    children = []
+    for output in dash.callback_context.outputs_list[0]:
+        lane_id = str(output["id"]["lane"])
+        if lane_id in active and lane_id in loaded:
+            children.append(no_update)
+        elif lane_id in active:
+            children.append(dash_table.DataTable(
+                id={"type": "lane-table", "lane": int(lane_id)},
+                data=[],
+                columns=[],
+                sort_action="custom",
+                sort_mode="multi",
+                sort_by=[],
+                page_action="custom",
+                page_current=0,
+                page_size=15,
+                page_count=1,
+                style_table={'overflowX': 'auto'},
+                style_cell={'minWidth': '60px', 'width': '100px', 'maxWidth': '180px', 'whiteSpace': 'normal'},
+            ))
+        else:
+            children.append(None)
+    return children, sorted(active)
+
+
+# ---------------------------
+# Callback: Page of an Expanded Lane in the Overview
+# ---------------------------
+@app.callback(
+    Output({"type": "lane-table", "lane": MATCH}, "data"),
+    Output({"type": "lane-table", "lane": MATCH}, "columns"),
+    Output({"type": "lane-table", "lane": MATCH}, "page_count"),
+    Input({"type": "lane-table", "lane": MATCH}, "page_current"),
+    Input({"type": "lane-table", "lane": MATCH}, "page_size"),
+    Input({"type": "lane-table", "lane": MATCH}, "sort_by"),
+    State("csv_list_store", "data"),
+)
+def load_lane_overview_page(page_current, page_size, sort_by, csv_list):
+    """
+    Load the visible page of one lane in the overview (read-only, with a "Selected" column).
+
+    Args:
+        page_current (int): Current page of the lane's table.
+        page_size (int): Rows per page.
+        sort_by (list): Sort columns and directions.
+        csv_list (list): List of CSV file paths.
+
+    Returns:
+        tuple: Page records, columns and page count.
+    """
+    lane_index = dash.callback_context.outputs_list[0]["id"]["lane"]
+    if not csv_list or lane_index >= len(csv_list) or not os.path.isfile(csv_list[lane_index]):
+        raise dash.exceptions.PreventUpdate
+
+    sheet = get_sheet(csv_list[lane_index])
+    data, selected_rows, page_count = sheet.query_page(page_current or 0, page_size or 15, sort_by)
+    selected_rows = set(selected_rows)
+    for position, record in enumerate(data):
+        record["Selected"] = "✓" if position in selected_rows else ""
+
+    columns = [{"name": "Selected", "id": "Selected"}] + [{"name": c["name"], "id": c["id"]} for c in sheet.columns()]
+    return data, columns, page_count
+
+
 # ---------------------------
 # Callback: Save the current samplesheet data from UI to csv
 # ---------------------------
 
 @app.callback(
     Output("previous-lane-store", "data"),
+    Output("alert-fade-fail", "is_open", allow_duplicate=True),
+    Output("alert-fade-fail", "children", allow_duplicate=True),
     Input("lane-dropdown", "value"),
     State("previous-lane-store", "data"),
-    State("samplesheet-table", "data"),
-    State("samplesheet-table", "selected_rows"),
     State("csv_list_store", "data"),
+    State("sheet-version-store", "data"),
     prevent_initial_call=True
 )
-def save_on_lane_change(new_lane, prev_lane, table_data, selected_rows, csv_list):
+def save_on_lane_change(new_lane, prev_lane, csv_list, versions):
     """
-    Save updates to the current CSV file when the lane selection changes, but only if the table data has been modified.
+    Save updates to the current CSV file when the lane selection changes, but only if the samplesheet has been modified.
 
-    This callback is triggered when a user selects a new lane from the dropdown. It performs the following steps:
-      1. If a previous lane and a valid CSV list exist, it retrieves the CSV file path for the previously selected lane.
-      2. Loads the current CSV data (from the "[Data]" section) into a DataFrame using `parse_samplesheet_data_only`.
-      3. Constructs a new DataFrame from the provided table data. If specific rows are selected, it filters the DataFrame accordingly.
-      4. Compares the new DataFrame with the existing CSV DataFrame. If there is any difference, it calls 
-         `update_csv_based_on_ui` to update the CSV file with the new data.
-      5. Returns the new lane index to store as the previous lane for subsequent changes.
+    The edits and the row selection of the previous lane were already sent as cell deltas and
+    are held in the server-side `SamplesheetCache`, so only the lane index and the sheet version
+    are sent with this callback. If the cached sheet of the previous lane was modified, its
+    selected rows are written to the CSV file with `save_cached_sheet`.
 
     Args:
         new_lane (int): The newly selected lane index from the dropdown.
         prev_lane (int or None): The previously selected lane index used to reference the current CSV file.
-        table_data (list): A list of dictionaries representing the current state of the samplesheet table.
-        selected_rows (list or None): List of indices indicating which rows in the table are selected.
         csv_list (list): List of CSV file paths corresponding to each lane.
+        versions (dict): Version of each lane's cached sheet as last confirmed to the browser.
 
     Returns:
-        int: The new lane index, which will be stored as the previous lane for future lane-change events.
-    """
-    if prev_lane is not None and csv_list:
-        # Get the CSV file path for the current lane before switching.
-        csv_path = csv_list[prev_lane]
-        
-        # Load the current CSV data from the file.
-        current_df = parse_samplesheet_data_only(csv_path)
-        
-        # Create a DataFrame from the table data.
-        new_df = pd.DataFrame(table_data)
-        # If there are selected rows, only consider those rows.
-        if selected_rows:
-            new_df = new_df.iloc[selected_rows]
-        
-        # Compare the new DataFrame with the CSV DataFrame.
-        # .equals() checks if they have the same shape and elements.
-        if not new_df.equals(current_df):
-            # Only update the CSV if there is an actual difference.
-            update_csv_based_on_ui(table_data, selected_rows, csv_path)
-   
+        tuple:
+            - (int) The new lane index, which will be stored as the previous lane for future lane-change events.
+            - (bool) Failure alert state: True if the previous lane could not be saved.
+            - (str) Failure message, telling the user that the lane's edits were not saved and why.
+    """
+    if prev_lane is not None and csv_list and prev_lane < len(csv_list):
+        # Write the previous lane's edits and selection, if there are any.
+        try:
+            save_cached_sheet(csv_list[prev_lane], (versions or {}).get(str(prev_lane)))
+        except Exception as e:
+            print(e)
+            # Return the new lane as the "previous" lane for the next change.
+            return new_lane, True, f"The edits of lane {prev_lane + 1} could not be saved: {e}"
+
     # Return the new lane as the "previous" lane for the next change.
-    return new_lane
+    return new_lane, no_update, no_update
+
+
+# ------------------------------------------------------------------------------
+# Function: Save a Cached Sheet to its CSV
+# ------------------------------------------------------------------------------
+def save_cached_sheet(csv_path, client_version=None):
+    """
+    Write the selected rows of a cached sheet (including the user's edits) to its CSV file.
+
+    Nothing is written if the sheet was not modified since it was read, or if its selected
+    rows are the same as the rows in the file (e.g., an edit was changed back).
+
+    Args:
+        csv_path (str): Path to the lane CSV file.
+        client_version (int, optional): Sheet version the browser last got back. If the cached
+                                        sheet is older (e.g., the server was restarted and
+                                        the edits were lost), a ValueError is raised.
+
+    Returns:
+        bool: True if the file was rewritten.
+    """
+    if not os.path.isfile(csv_path):
+        return False
+    sheet = get_sheet(csv_path)
+    if client_version is not None and sheet.version < client_version:
+        raise ValueError(
+            f"The edits of {os.path.basename(csv_path)} are not on the server anymore "
+            f"(version {sheet.version} < {client_version}). Please reload the page and edit the samplesheet again."
+        )
+    if not sheet.dirty:
+        return False
+
+    table = sheet.selected_table()
+    if sheet.backend.equals(table, sheet.saved):
+        mark_saved(csv_path)
+        return False
+    error = write_data_section(csv_path, table, sheet.backend)
+    if error:
+        raise ValueError(f"{os.path.basename(csv_path)}: {error}")
+    mark_saved(csv_path, table)
+    return True
 
 
 # ------------------------------------------------------------------------------
@@ -467,15 +1192,13 @@ def update_csv_based_on_ui(table_data, selected_rows, csv_path):
     Update the CSV file based on the user-edited table data from the UI.
 
     This function performs the following steps:
-      1. Converts the table data (provided as a list of dictionaries) into a Pandas DataFrame.
-      2. Filters the DataFrame based on the selected row indices; if no rows are selected,
-         the DataFrame is set to empty.
-      3. Reads the entire CSV file from the specified path.
-      4. Locates the "[Data]" section within the CSV file.
-      5. Preserves the lines up to and including the header of the data section.
-      6. Reconstructs the data rows using the updated DataFrame values while ensuring that
-         the data aligns with the original CSV header columns.
-      7. Writes the reassembled CSV content back to the file.
+      1. Converts the table data (provided as a list of dictionaries) into a table of the
+         samplesheet table backend (see `SheetTable`).
+      2. Filters the table based on the selected row indices; if no rows are selected,
+         the table is set to empty.
+      3. Replaces the data rows of the CSV file with the table's rows, keeping everything up
+         to and including the header of the "[Data]" section and the order of its columns
+         (see `SheetTable.write_data_section`).
 
     Args:
         table_data (list): List of dictionaries representing the current state of the samplesheet table.
@@ -486,51 +1209,189 @@ def update_csv_based_on_ui(table_data, selected_rows, csv_path):
         str: An error message if the "[Data]" section or its header is not found in the CSV.
              If successful, the CSV file is updated in-place and the function returns None.
     """
-    # Convert the table data (edited values from the UI) to a DataFrame. 
-    updated_df = pd.DataFrame(table_data)
-    if selected_rows is None or len(selected_rows) == 0:
-        updated_df = updated_df.iloc[0:0]
-    else:
-        updated_df = updated_df.iloc[selected_rows]
-
-    # Read the full original CSV file as a list of lines using the provided path.
-    with open(csv_path, 'r', encoding='utf-8') as f:
-        all_lines = f.readlines()
-
-    # Locate the line where the "[Data]" marker is.
-    data_marker_index = None
-    for i, line in enumerate(all_lines):
-        if line.strip().startswith("[Data]"):
-            data_marker_index = i
-            break
-    if data_marker_index is None:
-        return "Error: [Data] section not found in CSV."
-
-    # Ensure there is a header line after the [Data] marker.
-    if len(all_lines) <= data_marker_index + 1:
-        return "Error: Data header line missing in CSV."
-
-    # Preserve all lines up to and including the original data header line.
-    preserved_lines = all_lines[:data_marker_index + 2]
-
-    # Extract the original header columns.
-    orig_header_line = all_lines[data_marker_index + 1]
-    orig_header_cols = orig_header_line.strip().split(",")
-
-    # Build new data rows aligned with the original header.
-    new_data_rows = []
-    for _, row in updated_df.iterrows():
-        new_row = []
-        for col in orig_header_cols:
-            if col in updated_df.columns:
-                new_row.append(str(row[col]))
-            else:
-                new_row.append("")
-        new_data_rows.append(",".join(new_row) + "\n")
-
-    new_data_csv = "".join(new_data_rows)
-    new_file_content = "".join(preserved_lines) + new_data_csv
-
-    # Write the reassembled content back to the CSV file.
-    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
-        f.write(new_file_content)
\ No newline at end of file
+    backend = get_backend()
+    rows = [table_data[i] for i in (selected_rows or [])]
+    return write_data_section(csv_path, backend.from_records(rows), backend)
+
+
+# ------------------------------------------------------------------------------
+# Metrics endpoint (Prometheus text format)
+# ------------------------------------------------------------------------------
+@app.server.route("/metrics")
+def metrics():
+    """
+    Exposes the timing spans recorded in this process (see `Tracing`) for Prometheus.
+
+    Returns:
+        flask.Response: Histograms of durations, row counts and payload sizes per operation.
+    """
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+# ------------------------------------------------------------------------------
+# Live Job Progress: Server-Sent Events endpoint
+# ------------------------------------------------------------------------------
+def token_may_follow(token, job_key):
+    """
+    Checks that `token` is a valid B-Fabric session token for the run of `job_key`
+    ("dmx-<run_id>-...", see `compute_job_key`).
+    """
+    if not token:
+        return False
+    raw = bfabric_interface.token_to_data(token)
+    if not raw or raw == "EXPIRED":
+        return False
+    return job_key.startswith(f"dmx-{json.loads(raw).get('entity_id_data')}-")
+
+
+def job_is_active(job_key):
+    """Returns whether the job is still queued, deferred or running."""
+    try:
+        return Job.fetch(job_key, connection=get_redis()).get_status() in ACTIVE_JOB_STATUSES
+    except NoSuchJobError:
+        return False
+
+
+@app.server.route("/progress/<job_key>")
+def stream_job_progress(job_key):
+    """
+    Streams the progress snapshots of a job as Server-Sent Events.
+
+    Each event carries one snapshot published by the worker's `ProgressPublisher`. The
+    connection blocks on the job's Redis stream, so a snapshot reaches the browser as soon
+    as it is published, and nothing is sent while the job makes no progress (apart from a
+    keep-alive comment every 15 seconds). The stream ends after the final snapshot, or when
+    the job is no longer queued or running (e.g. its worker died before publishing one).
+
+    The request must carry the session token ("token" query parameter) of the run the job
+    belongs to. Streams read from their own Redis pool; beyond `RedisPool.MAX_STREAMS` open
+    streams, a new one is refused with 503, so open tabs cannot starve the app's other Redis
+    calls.
+
+    Args:
+        job_key (str): Job key of the job to follow.
+
+    Returns:
+        flask.Response: A text/event-stream response.
+    """
+    if not re.fullmatch(r"[\w.-]+", job_key):
+        return Response("Invalid job key", status=404)
+    if not token_may_follow(request.args.get("token"), job_key):
+        return Response("Invalid or expired token", status=403)
+
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_id", "0")
+
+    def events(current_id):
+        while True:
+            current_id, snapshot = read_progress(get_stream_redis(), job_key, current_id, block_ms=15000)
+            if snapshot is None:
+                if not job_is_active(job_key):
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            yield f"id: {current_id}\ndata: {json.dumps(snapshot)}\n\n"
+            if snapshot.get("state") != "running":
+                return
+
+    if not acquire_stream_slot():
+        return Response("Too many open progress streams", status=503, headers={"Retry-After": "30"})
+    response = Response(
+        stream_with_context(events(last_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    response.call_on_close(release_stream_slot)
+    return response
+
+
+# ---------------------------
+# Client-side Callback: Receive Pushed Progress
+# ---------------------------
+# Opens one EventSource per job key and copies a snapshot into the progress store only
+# when a new one has arrived. The interval runs in the browser; the server is only
+# involved when the progress actually changed.
+app.clientside_callback(
+    """
+    function(n_intervals, jobKey, search) {
+        const dc = window.dash_clientside;
+        if (!jobKey) { return dc.no_update; }
+        const state = window.dmxProgress = window.dmxProgress || {};
+        if (state.key !== jobKey) {
+            if (state.source) { state.source.close(); }
+            state.key = jobKey;
+            state.latest = null;
+            state.seen = null;
+            const token = new URLSearchParams(search || "").get("token") || "";
+            state.source = new EventSource("/progress/" + encodeURIComponent(jobKey) + "?token=" + encodeURIComponent(token));
+            state.source.onmessage = function(event) {
+                state.latest = event.data;
+                if (JSON.parse(event.data).state !== "running") { state.source.close(); }
+            };
+        }
+        if (!state.latest || state.latest === state.seen) { return dc.no_update; }
+        state.seen = state.latest;
+        return JSON.parse(state.latest);
+    }
+    """,
+    Output("progress-store", "data"),
+    Input("progress-interval", "n_intervals"),
+    State("job-key-store", "data"),
+    State("url", "search"),
+)
+
+
+# ---------------------------
+# Callback: Render Job Progress
+# ---------------------------
+@app.callback(
+    Output("progress-panel", "children"),
+    Input("progress-store", "data"),
+    prevent_initial_call=True
+)
+def render_job_progress(snapshot):
+    """
+    Render per-lane and per-process progress of the current job.
+
+    Args:
+        snapshot (dict): Progress snapshot published by the worker (see `NextflowProgress`).
+
+    Returns:
+        list: Components showing the job state, a lane table and a process table.
+    """
+    if not snapshot:
+        raise dash.exceptions.PreventUpdate
+
+    lane_rows = [
+        html.Tr([
+            html.Td("All lanes" if lane == "all" else f"Lane {lane}"),
+            html.Td(entry["completed"]),
+            html.Td(entry["failed"]),
+            html.Td(f"{entry['cpu_hours']:.2f}"),
+            html.Td(entry["last_process"]),
+        ])
+        for lane, entry in sorted(snapshot["lanes"].items(), key=lambda item: (item[0] == "all", item[0].zfill(3)))
+    ]
+    process_rows = [
+        html.Tr([
+            html.Td(process),
+            html.Td(entry["completed"]),
+            html.Td(entry["failed"]),
+            html.Td(f"{entry['cpu_hours']:.2f}"),
+            html.Td(f"{entry['peak_rss'] / 1024 ** 3:.2f} GB"),
+        ])
+        for process, entry in sorted(snapshot["processes"].items())
+    ]
+
+    return [
+        html.H5(f"Job {snapshot['job_key']}: {snapshot['state']}"),
+        dbc.Table(
+            [html.Thead(html.Tr([html.Th(h) for h in ["Lane", "Completed tasks", "Failed", "CPU hours", "Last process"]])),
+             html.Tbody(lane_rows)],
+            bordered=True, size="sm", style={"maxWidth": "90%"}
+        ),
+        dbc.Table(
+            [html.Thead(html.Tr([html.Th(h) for h in ["Process", "Completed tasks", "Failed", "CPU hours", "Peak RSS"]])),
+             html.Tbody(process_rows)],
+            bordered=True, size="sm", style={"maxWidth": "90%"}
+        ),
+    ]
@@ -0,0 +1,209 @@
+import io
+import re
+import csv
+import base64
+
+# Accepted header names of the index columns (compared case-insensitively, ignoring blanks and "_").
+INDEX_ALIASES = {"index": "index", "index1": "index", "i7": "index", "i7index": "index"}
+INDEX2_ALIASES = {"index2": "index2", "i5": "index2", "i5index": "index2"}
+
+# Plate rows are letters (A-H for 96, A-P for 384 wells), plate columns are numbers.
+PLATE_ROW = re.compile(r"^[A-Pa-p]$")
+VALID_INDEX = r"[ACGTN]*"
+COMPLEMENT = str.maketrans("ACGTN", "TGCAN")
+
+
+# ---------------------------
+# Reading the Import
+# ---------------------------
+def decode_upload(contents):
+    """
+    Decodes the `contents` of a dcc.Upload ("data:<mime>;base64,<data>") to text.
+
+    Args:
+        contents (str): Upload contents.
+
+    Returns:
+        str: Decoded file content.
+    """
+    _, encoded = contents.split(",", 1)
+    return base64.b64decode(encoded).decode("utf-8-sig")
+
+
+def header_name(value):
+    return re.sub(r"[\s_]", "", str(value)).lower()
+
+
+def parse_import(text):
+    """
+    Parses pasted or uploaded indices into a table of key, index and index2.
+
+    Two layouts are recognised:
+      - A table (CSV or TSV, detected from the first line) with a Sample_ID or Sample_Name
+        column and index/i7 and, optionally, index2/i5 columns.
+      - A plate layout: a header row with the plate column numbers, then one row per plate
+        row letter, where each well holds "<Sample_ID or Sample_Name>;<i7>;<i5>" (i5 optional).
+
+    Args:
+        text (str): Import content.
+
+    Returns:
+        pd.DataFrame: Columns "key", "index", "index2" (all str); `df.attrs["key_column"]` is
+                      "Sample_ID" or "Sample_Name" for tables and None for plate layouts.
+
+    Raises:
+        ValueError: If the content matches neither layout.
+    """
+    import pandas as pd
+
+    text = text.strip()
+    if not text:
+        raise ValueError("Nothing to import.")
+    first_line = text.splitlines()[0]
+    delimiter = "\t" if first_line.count("\t") >= first_line.count(",") else ","
+    rows = [row for row in csv.reader(io.StringIO(text), delimiter=delimiter) if any(cell.strip() for cell in row)]
+    header = [header_name(cell) for cell in rows[0]]
+
+    # Sample_ID is preferred as key if the table has both key columns.
+    key_column = next((col for col in ("Sample_ID", "Sample_Name") if header_name(col) in header), None)
+    if key_column is not None:
+        positions = {"key": header.index(header_name(key_column))}
+        for i, h in enumerate(header):
+            name = INDEX_ALIASES.get(h) or INDEX2_ALIASES.get(h)
+            if name and name not in positions:
+                positions[name] = i
+        if "index" not in positions:
+            raise ValueError("The import has no index (i7) column.")
+        width = len(header)
+        body = [row + [""] * (width - len(row)) for row in rows[1:]]
+        df = pd.DataFrame({
+            name: [row[i] for row in body]
+            for name, i in positions.items()
+        })
+        if "index2" not in df:
+            df["index2"] = ""
+        df = df[["key", "index", "index2"]]
+        df.attrs["key_column"] = key_column
+        return df
+
+    if all(PLATE_ROW.match(row[0].strip()) for row in rows[1:] if row):
+        wells = []
+        for row in rows[1:]:
+            for cell in row[1:]:
+                parts = cell.split(";")
+                if not cell.strip():
+                    continue
+                if len(parts) < 2:
+                    raise ValueError(f"Plate well '{cell}' is not of the form 'sample;i7;i5'.")
+                wells.append((parts[0], parts[1], parts[2] if len(parts) > 2 else ""))
+        df = pd.DataFrame(wells, columns=["key", "index", "index2"])
+        df.attrs["key_column"] = None
+        return df
+
+    raise ValueError("Unrecognised format: expected a Sample_ID/Sample_Name column or a plate layout.")
+
+
+# ---------------------------
+# Normalising and Validating
+# ---------------------------
+def normalise_indices(df, reverse_complement_i5=False):
+    """
+    Normalises keys and indices: surrounding whitespace is removed, indices are upper-cased
+    and stripped of inner whitespace, and i5 is reverse-complemented on request.
+
+    Args:
+        df (pd.DataFrame): Output of `parse_import`.
+        reverse_complement_i5 (bool): Reverse-complement index2.
+
+    Returns:
+        pd.DataFrame: Normalised copy.
+    """
+    df = df.copy()
+    df["key"] = df["key"].astype(str).str.strip()
+    for col in ("index", "index2"):
+        df[col] = df[col].fillna("").astype(str).str.replace(r"\s+", "", regex=True).str.upper()
+    if reverse_complement_i5:
+        df["index2"] = df["index2"].str.translate(COMPLEMENT).str[::-1]
+    return df
+
+
+def validate_indices(df):
+    """
+    Validates all imported indices in one vectorised pass.
+
+    An index is invalid if it contains characters other than A, C, G, T and N, if i7 is empty,
+    or if its length differs from the most common length of its column.
+
+    Args:
+        df (pd.DataFrame): Output of `normalise_indices`.
+
+    Returns:
+        list: Error messages (empty if everything is valid).
+    """
+    errors = []
+    duplicated = df["key"][df["key"].duplicated()]
+    if not duplicated.empty:
+        errors.append(f"Duplicate samples in the import: {', '.join(duplicated.unique()[:10])}")
+
+    for col in ("index", "index2"):
+        values = df[col]
+        lengths = values.str.len()
+        present = lengths > 0
+        if col == "index2" and not present.any():
+            continue
+        expected = lengths[present].mode().iloc[0] if present.any() else 0
+        bad = ~values.str.fullmatch(VALID_INDEX) | (present & (lengths != expected))
+        if col == "index":
+            bad |= ~present
+        for key, value in zip(df["key"][bad][:10], values[bad][:10]):
+            errors.append(f"{key}: invalid {col} '{value}' (expected {expected} bases of A/C/G/T/N)")
+        if bad.sum() > 10:
+            errors.append(f"... and {bad.sum() - 10} more invalid {col} values")
+    return errors
+
+
+# ---------------------------
+# Joining to the Lane
+# ---------------------------
+def join_to_sheet(sheet_df, imported, join_on="auto"):
+    """
+    Joins imported indices to the lane's rows with a hash join on Sample_ID or Sample_Name.
+
+    The import is hashed once by key, and every lane row is looked up in it, so the join is
+    linear in the number of rows.
+
+    Args:
+        sheet_df (pd.DataFrame): The lane's cached sheet (row ID as index).
+        imported (pd.DataFrame): Normalised import.
+        join_on (str): "Sample_ID", "Sample_Name" or "auto" (the table's key column, or the
+                       column with more matches for plate layouts).
+
+    Returns:
+        tuple: (list of cell deltas {"id", "column", "old", "new"} for changed cells,
+                list of imported keys that matched no row of the lane,
+                name of the join column)
+    """
+    import pandas as pd
+
+    lookup = imported.drop_duplicates("key", keep="last").set_index("key")
+    if join_on == "auto":
+        join_on = imported.attrs.get("key_column")
+    if join_on not in ("Sample_ID", "Sample_Name"):
+        join_on = max(("Sample_ID", "Sample_Name"), key=lambda col: sheet_df[col].astype(str).isin(lookup.index).sum())
+
+    keys = sheet_df[join_on].astype(str).str.strip()
+    matched = keys.isin(lookup.index)
+
+    changes = []
+    for col in ("index", "index2"):
+        new_values = keys[matched].map(lookup[col])
+        # An empty i5 in the import leaves the lane's i5 as it is.
+        if col == "index2":
+            new_values = new_values[new_values != ""]
+        old_values = sheet_df.loc[new_values.index, col]
+        differs = old_values.fillna("").astype(str) != new_values
+        for row_id, old, new in zip(new_values.index[differs], old_values[differs], new_values[differs]):
+            changes.append({"id": int(row_id), "column": col, "old": None if pd.isna(old) else old, "new": new})
+
+    unmatched = sorted(set(lookup.index) - set(keys[matched]))
+    return changes, unmatched, join_on
@@ -0,0 +1,238 @@
+import os
+import re
+import json
+import time
+import threading
+
+# Redis stream holding the progress snapshots of one job.
+PROGRESS_STREAM = "demultiplex:progress:{job_key}"
+# Number of snapshots kept per stream (older ones are trimmed).
+PROGRESS_STREAM_MAXLEN = 200
+# How long a finished job's progress stays available (seconds).
+PROGRESS_STREAM_TTL = 7 * 24 * 3600
+
+# Trace statuses that count as finished tasks. Tasks taken from the cache on a
+# `-resume` retry are reported as CACHED.
+DONE_STATUSES = {"COMPLETED", "CACHED"}
+FAILED_STATUSES = {"FAILED", "ABORTED"}
+
+# Lane suffixes in task tags, e.g. "HHVCCDRXX.1" (per-lane tasks) or "Sample_S1_L001" (per-sample tasks).
+LANE_PATTERNS = [re.compile(r"_L0*(\d+)(?:_|$)"), re.compile(r"\.(\d+)$")]
+
+
+# ---------------------------
+# Incremental Trace Reader
+# ---------------------------
+class TraceTailer:
+    """
+    Reads a Nextflow trace file incrementally.
+
+    Only the bytes appended since the previous `poll` are read, so polling a trace with
+    thousands of tasks every few seconds costs no more than the new lines. A trailing line
+    that is still being written is kept back until it is complete. If the file is replaced
+    or truncated (e.g. by a retry with `trace.overwrite = true`), reading starts over.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.inode = None
+        self.partial = b""
+        self.header = None
+
+    def poll(self):
+        """
+        Returns the trace rows appended since the previous call.
+
+        Returns:
+            list: One dict per task, keyed by the trace header fields.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            self.inode, self.offset, self.partial, self.header = stat.st_ino, 0, b"", None
+        if stat.st_size == self.offset:
+            return []
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(stat.st_size - self.offset)
+        self.offset += len(chunk)
+
+        lines = (self.partial + chunk).split(b"\n")
+        self.partial = lines.pop()
+
+        rows = []
+        for line in lines:
+            fields = line.decode("utf-8", errors="replace").rstrip("\r").split("\t")
+            if self.header is None:
+                self.header = fields
+                continue
+            if len(fields) == len(self.header):
+                rows.append(dict(zip(self.header, fields)))
+        return rows
+
+
+# ---------------------------
+# Helper functions: Trace Fields
+# ---------------------------
+def to_number(value):
+    """Converts a raw trace value (`trace.raw = true`) to a float; '-' and blanks become 0."""
+    try:
+        return float(value.rstrip("%"))
+    except (AttributeError, ValueError):
+        return 0.0
+
+
+def process_short_name(row):
+    """Returns the process name without its workflow prefix (e.g., "BCL2FASTQ")."""
+    process = row.get("process") or row.get("name", "").split(" (")[0]
+    return process.split(":")[-1]
+
+
+def lane_of(row):
+    """Returns the lane number of a task as a string, or "all" for tasks spanning the run."""
+    tag = row.get("tag") or row.get("name", "")
+    for pattern in LANE_PATTERNS:
+        match = pattern.search(tag.strip(" ()"))
+        if match:
+            return str(int(match.group(1)))
+    return "all"
+
+
+# ---------------------------
+# Progress Aggregation
+# ---------------------------
+class ProgressAggregator:
+    """
+    Accumulates trace rows into per-lane and per-process progress.
+
+    CPU hours are computed as realtime × %cpu, peak RSS is the maximum over a process's tasks.
+    """
+
+    def __init__(self, job_key):
+        self.job_key = job_key
+        self.lanes = {}
+        self.processes = {}
+
+    def add(self, rows):
+        for row in rows:
+            status = row.get("status", "")
+            process = process_short_name(row)
+            lane = lane_of(row)
+            cpu_hours = to_number(row.get("realtime")) / 3600000 * to_number(row.get("%cpu")) / 100
+            peak_rss = to_number(row.get("peak_rss"))
+
+            lane_entry = self.lanes.setdefault(lane, {"completed": 0, "failed": 0, "cpu_hours": 0.0, "last_process": ""})
+            proc_entry = self.processes.setdefault(process, {"completed": 0, "failed": 0, "cpu_hours": 0.0, "peak_rss": 0})
+
+            if status in DONE_STATUSES:
+                lane_entry["completed"] += 1
+                proc_entry["completed"] += 1
+            elif status in FAILED_STATUSES:
+                lane_entry["failed"] += 1
+                proc_entry["failed"] += 1
+            lane_entry["cpu_hours"] += cpu_hours
+            lane_entry["last_process"] = process
+            proc_entry["cpu_hours"] += cpu_hours
+            proc_entry["peak_rss"] = max(proc_entry["peak_rss"], int(peak_rss))
+
+    def snapshot(self, state="running"):
+        """
+        Returns the current progress as a JSON-serialisable dict.
+
+        Args:
+            state (str): "running", "succeeded" or "failed".
+        """
+        return {
+            "job_key": self.job_key,
+            "state": state,
+            "updated": time.time(),
+            "lanes": self.lanes,
+            "processes": self.processes,
+        }
+
+
+# ---------------------------
+# Publishing and Reading Progress (Redis Streams)
+# ---------------------------
+def publish_progress(connection, snapshot):
+    """Appends a progress snapshot to the job's Redis stream."""
+    stream = PROGRESS_STREAM.format(job_key=snapshot["job_key"])
+    connection.xadd(stream, {"data": json.dumps(snapshot)}, maxlen=PROGRESS_STREAM_MAXLEN, approximate=True)
+    connection.expire(stream, PROGRESS_STREAM_TTL)
+
+
+def read_progress(connection, job_key, last_id="0", block_ms=None):
+    """
+    Returns the newest progress snapshot of a job that is newer than `last_id`.
+
+    Args:
+        connection (redis.Redis): Redis connection.
+        job_key (str): Job key.
+        last_id (str): Stream ID of the last snapshot the caller has seen ("0" for none).
+        block_ms (int, optional): Wait up to this many milliseconds for a new snapshot.
+
+    Returns:
+        tuple: (stream_id, snapshot dict), or (last_id, None) if there is nothing newer.
+    """
+    stream = PROGRESS_STREAM.format(job_key=job_key)
+    if last_id in (None, "", "0"):
+        entries = connection.xrevrange(stream, count=1)
+        if entries:
+            entry_id, fields = entries[0]
+            return entry_id.decode(), json.loads(fields[b"data"])
+        last_id = "0"
+
+    response = connection.xread({stream: last_id}, block=block_ms)
+    if not response:
+        return last_id, None
+    entry_id, fields = response[0][1][-1]
+    return entry_id.decode(), json.loads(fields[b"data"])
+
+
+class ProgressPublisher(threading.Thread):
+    """
+    Background thread that tails a job's trace file and publishes progress while the
+    pipeline runs. A snapshot is only published when new trace rows arrived.
+
+    Usage:
+        publisher = ProgressPublisher(connection, job_key, trace_path)
+        publisher.start()
+        ...run the pipeline...
+        publisher.finish("succeeded")
+    """
+
+    def __init__(self, connection, job_key, trace_path, interval=5):
+        super().__init__(daemon=True)
+        self.connection = connection
+        self.tailer = TraceTailer(trace_path)
+        self.aggregator = ProgressAggregator(job_key)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def publish(self, state="running"):
+        try:
+            publish_progress(self.connection, self.aggregator.snapshot(state))
+        except Exception as e:
+            print(f"Failed to publish progress: {e}")
+
+    def publish_new_rows(self, state="running"):
+        rows = self.tailer.poll()
+        if rows or state != "running":
+            self.aggregator.add(rows)
+            self.publish(state)
+
+    def run(self):
+        self.publish()
+        while not self._stop_event.wait(self.interval):
+            self.publish_new_rows()
+
+    def finish(self, state):
+        """Stops the thread and publishes the final snapshot with the given state."""
+        self._stop_event.set()
+        self.join()
+        self.publish_new_rows(state)
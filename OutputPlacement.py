@@ -0,0 +1,200 @@
+import os
+import errno
+import fcntl
+import shutil
+import filecmp
+from concurrent.futures import ThreadPoolExecutor
+
+from Tracing import span
+
+# Concurrent placements. Links and renames are metadata operations that release the GIL, so
+# threads overlap their round trips to the file system (NFS, parallel file systems).
+MAX_WORKERS = 16
+# Compare copied files byte for byte with their source. Links, renames and reflinks share
+# the source's data blocks and are checked by inode or size only.
+VERIFY_COPIES = True
+# Files the pipeline writes that are placed into the container folders.
+PLACED_SUFFIX = ".fastq.gz"
+
+# ioctl FICLONE (Linux): make the destination share the source's extents (Btrfs, XFS with
+# reflink=1, ...). Raises EOPNOTSUPP/EXDEV/EINVAL where not supported.
+FICLONE = 0x40049409
+
+# Errors on which a hardlink is not possible but a rename on the same file system may be.
+NO_LINK_ERRORS = {errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP}
+
+
+# ---------------------------
+# Placing One File
+# ---------------------------
+def reflink(source, target):
+    """Creates `target` as a copy-on-write clone of `source`; raises OSError where unsupported."""
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            dst.close()
+            os.remove(target)
+            raise
+    shutil.copystat(source, target)
+
+
+def copy_verified(source, target):
+    """
+    Copies `source` to a temporary name next to `target`, checks it and moves it into place, so
+    an interrupted copy never looks like a placed file.
+    """
+    partial = f"{target}.partial"
+    try:
+        shutil.copy2(source, partial)
+        if os.path.getsize(partial) != os.path.getsize(source):
+            raise OSError(f"size of the copy of {source} differs from the source")
+        if VERIFY_COPIES and not filecmp.cmp(source, partial, shallow=False):
+            raise OSError(f"content of the copy of {source} differs from the source")
+        os.replace(partial, target)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def place_file(source, target):
+    """
+    Makes `source` available at `target` without copying its data where possible.
+
+    In order: a hardlink; a rename if the file system does not allow another link; a reflink
+    if the target is on another device; a verified copy if nothing else works. A target that
+    already holds the source (a placement of an earlier attempt) is left as it is.
+
+    Args:
+        source (str): File in the pipeline's output tree.
+        target (str): Path in the container layout of `create_resource_paths_and_dataset`.
+
+    Returns:
+        str: How the file was placed ("placed", "hardlink", "rename", "reflink" or "copy").
+
+    Raises:
+        OSError: If the file could not be placed.
+    """
+    if os.path.exists(target):
+        if not os.path.exists(source) or os.path.samefile(source, target):
+            return "placed"
+        os.remove(target)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    try:
+        os.link(source, target)
+        return "hardlink"
+    except OSError as e:
+        if e.errno in NO_LINK_ERRORS:
+            os.rename(source, target)
+            return "rename"
+        if e.errno != errno.EXDEV:
+            raise
+
+    try:
+        reflink(source, target)
+        if os.path.getsize(target) != os.path.getsize(source):
+            raise OSError(f"size of the reflink of {source} differs from the source")
+        return "reflink"
+    except OSError:
+        pass
+
+    copy_verified(source, target)
+    return "copy"
+
+
+# ---------------------------
+# Placing a Job's Output
+# ---------------------------
+def find_sources(resource_paths, base_dir):
+    """
+    Finds the pipeline output file for every target path.
+
+    Target paths are `<base_dir>/<pipeline_id>/<lane>/<container_id>/<sample_id>/<file_name>`.
+    bcl2fastq writes the same file names (they contain the sample number, lane and read) in
+    its own tree below `<base_dir>/<pipeline_id>`, so each pipeline ID's tree is walked once
+    and its FASTQ files are looked up by name.
+
+    Args:
+        resource_paths (dict): {target path: container ID}
+        base_dir (str): The job's output directory.
+
+    Returns:
+        tuple: ({target path: source path}, list of target paths without a source)
+    """
+    by_pipeline = {}
+    for target in resource_paths:
+        pipeline_id = os.path.relpath(target, base_dir).split(os.sep, 1)[0]
+        by_pipeline.setdefault(pipeline_id, []).append(target)
+
+    sources = {}
+    missing = []
+    for pipeline_id, targets in by_pipeline.items():
+        wanted = set(targets)
+        by_name = {}
+        for root, _, files in os.walk(os.path.join(base_dir, pipeline_id)):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.endswith(PLACED_SUFFIX) and path not in wanted:
+                    by_name.setdefault(name, path)
+        for target in targets:
+            source = by_name.get(os.path.basename(target))
+            if source:
+                sources[target] = source
+            elif os.path.isfile(target):
+                sources[target] = target
+            else:
+                missing.append(target)
+    return sources, missing
+
+
+def place_outputs(resource_paths, base_dir, workers=MAX_WORKERS):
+    """
+    Builds the container layout expected by `create_resource_paths_and_dataset` from the
+    pipeline's output, with `place_file` for every file, in parallel.
+
+    Every placed file is checked afterwards: the target must exist and have the source's size.
+
+    Args:
+        resource_paths (dict): {target path: container ID}
+        base_dir (str): The job's output directory.
+        workers (int): Concurrent placements.
+
+    Returns:
+        dict: Number of files per placement method, plus "missing" (targets without a source).
+
+    Raises:
+        RuntimeError: If files could not be placed or failed the check.
+    """
+    sources, missing = find_sources(resource_paths, base_dir)
+    for target in missing:
+        print(f"Warning: No pipeline output found for {target}.")
+
+    def place(target):
+        source = sources[target]
+        if source == target:
+            return "placed", None
+        try:
+            # Taken before placing: a rename moves the source away.
+            size = os.path.getsize(source) if os.path.exists(source) else None
+            method = place_file(source, target)
+            if size is not None and os.path.getsize(target) != size:
+                raise OSError("size of the placed file differs from the source")
+            return method, None
+        except OSError as e:
+            return "failed", f"{source} -> {target}: {e}"
+
+    summary = {"missing": len(missing)}
+    failures = []
+    with span("outputs.place") as current:
+        current.rows = len(sources)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="place-outputs") as pool:
+            for method, error in pool.map(place, sorted(sources)):
+                summary[method] = summary.get(method, 0) + 1
+                if error:
+                    failures.append(error)
+
+    print(f"Placed outputs: {summary}")
+    if failures:
+        raise RuntimeError(f"{len(failures)} output file(s) could not be placed (e.g. {failures[0]}).")
+    return summary
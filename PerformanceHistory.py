@@ -0,0 +1,255 @@
+import os
+import csv
+import sqlite3
+from contextlib import closing
+
+from NextflowProgress import process_short_name, to_number
+
+# Default location of the performance database on the compute server.
+DEFAULT_DB_PATH = os.path.expanduser("~/.demultiplex/performance.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    job_key       TEXT PRIMARY KEY,
+    run_id        TEXT,
+    run_name      TEXT,
+    instrument    TEXT,
+    lanes         INTEGER,
+    samples       INTEGER,
+    cycles        INTEGER,
+    state         TEXT,
+    attempts      INTEGER,
+    started_at    REAL,
+    finished_at   REAL,
+    wall_seconds  REAL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    job_key       TEXT,
+    task_id       INTEGER,
+    process       TEXT,
+    tag           TEXT,
+    status        TEXT,
+    exit_code     TEXT,
+    cpus          REAL,
+    pct_cpu       REAL,
+    realtime_ms   REAL,
+    duration_ms   REAL,
+    memory_bytes  REAL,
+    peak_rss      REAL,
+    peak_vmem     REAL,
+    rchar         REAL,
+    wchar         REAL,
+    PRIMARY KEY (job_key, task_id)
+);
+CREATE INDEX IF NOT EXISTS tasks_process ON tasks (process);
+"""
+
+
+# ---------------------------
+# Database Access
+# ---------------------------
+def connect(db_path=DEFAULT_DB_PATH):
+    """
+    Opens the performance database, creating it and its tables if needed.
+
+    Args:
+        db_path (str): Path of the SQLite file.
+
+    Returns:
+        sqlite3.Connection: Open connection.
+    """
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# ---------------------------
+# Trace Ingestion
+# ---------------------------
+def read_trace(trace_path):
+    """
+    Parses a Nextflow trace file written with `trace.raw = true`.
+
+    Args:
+        trace_path (str): Path of the trace file.
+
+    Returns:
+        list: One dict per task, keyed by the trace header fields.
+    """
+    if not os.path.isfile(trace_path):
+        return []
+    with open(trace_path, newline="") as f:
+        return list(csv.DictReader(f, delimiter="\t"))
+
+
+def record_run(job_key, run_metadata, trace_path, state, started_at, finished_at, db_path=DEFAULT_DB_PATH):
+    """
+    Stores one finished job (run-level metadata and every task of its trace).
+
+    A retry of the same job key replaces the tasks of the previous attempt; its trace
+    already contains the tasks taken from the cache (status CACHED).
+
+    Args:
+        job_key (str): Job key of the run.
+        run_metadata (dict): Metadata from `ExecuteRunMainJob.collect_run_metadata`
+                             (run_id, run_name, instrument, lanes, samples, cycles).
+        trace_path (str): Path of the job's Nextflow trace file.
+        state (str): "succeeded" or "failed".
+        started_at (float): Start time of the pipeline (epoch seconds).
+        finished_at (float): End time of the pipeline (epoch seconds).
+        db_path (str): Path of the SQLite file.
+
+    Returns:
+        int: Number of task rows stored.
+    """
+    run_metadata = run_metadata or {}
+    rows = read_trace(trace_path)
+
+    with closing(connect(db_path)) as conn, conn:
+        previous = conn.execute("SELECT attempts FROM runs WHERE job_key = ?", (job_key,)).fetchone()
+        attempts = (previous[0] if previous else 0) + 1
+
+        conn.execute(
+            "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                job_key,
+                str(run_metadata.get("run_id", "")),
+                run_metadata.get("run_name", ""),
+                run_metadata.get("instrument", ""),
+                run_metadata.get("lanes"),
+                run_metadata.get("samples"),
+                run_metadata.get("cycles"),
+                state,
+                attempts,
+                started_at,
+                finished_at,
+                finished_at - started_at,
+            ),
+        )
+        conn.execute("DELETE FROM tasks WHERE job_key = ?", (job_key,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    job_key,
+                    int(to_number(row.get("task_id"))),
+                    process_short_name(row),
+                    row.get("tag", ""),
+                    row.get("status", ""),
+                    row.get("exit", ""),
+                    to_number(row.get("cpus")),
+                    to_number(row.get("%cpu")),
+                    to_number(row.get("realtime")),
+                    to_number(row.get("duration")),
+                    to_number(row.get("memory")),
+                    to_number(row.get("peak_rss")),
+                    to_number(row.get("peak_vmem")),
+                    to_number(row.get("rchar")),
+                    to_number(row.get("wchar")),
+                )
+                for row in rows
+            ],
+        )
+    return len(rows)
+
+
+# ---------------------------
+# Query API
+# ---------------------------
+def percentile(values, pct):
+    """Returns the `pct`-th percentile of `values` (nearest-rank with linear interpolation)."""
+    values = sorted(values)
+    if not values:
+        return None
+    k = (len(values) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (k - lower)
+
+
+def runtime_percentiles(db_path=DEFAULT_DB_PATH, percentiles=(50, 95)):
+    """
+    Wall-clock runtime percentiles of succeeded runs per instrument type.
+
+    Args:
+        db_path (str): Path of the SQLite file.
+        percentiles (tuple): Percentiles to compute.
+
+    Returns:
+        dict: {instrument: {"runs": n, "p50": seconds, "p95": seconds, ...}}
+    """
+    with closing(connect(db_path)) as conn:
+        rows = conn.execute("SELECT instrument, wall_seconds FROM runs WHERE state = 'succeeded'").fetchall()
+
+    by_instrument = {}
+    for instrument, wall_seconds in rows:
+        by_instrument.setdefault(instrument or "unknown", []).append(wall_seconds)
+
+    return {
+        instrument: {"runs": len(values), **{f"p{p}": percentile(values, p) for p in percentiles}}
+        for instrument, values in sorted(by_instrument.items())
+    }
+
+
+def memory_headroom(db_path=DEFAULT_DB_PATH):
+    """
+    Requested memory versus observed peak RSS per process, over all completed tasks.
+
+    Args:
+        db_path (str): Path of the SQLite file.
+
+    Returns:
+        dict: {process: {"tasks": n, "requested": bytes, "p95_rss": bytes, "max_rss": bytes,
+                         "headroom": fraction of the request left unused at p95 (None if unknown)}}
+    """
+    with closing(connect(db_path)) as conn:
+        rows = conn.execute(
+            "SELECT process, memory_bytes, peak_rss FROM tasks WHERE status = 'COMPLETED'"
+        ).fetchall()
+
+    by_process = {}
+    for process, requested, peak_rss in rows:
+        entry = by_process.setdefault(process, {"requested": 0.0, "rss": []})
+        entry["requested"] = max(entry["requested"], requested or 0.0)
+        entry["rss"].append(peak_rss or 0.0)
+
+    report = {}
+    for process, entry in sorted(by_process.items()):
+        p95 = percentile(entry["rss"], 95)
+        requested = entry["requested"]
+        report[process] = {
+            "tasks": len(entry["rss"]),
+            "requested": requested,
+            "p95_rss": p95,
+            "max_rss": max(entry["rss"]),
+            "headroom": (1 - p95 / requested) if requested else None,
+        }
+    return report
+
+
+def format_report(db_path=DEFAULT_DB_PATH):
+    """
+    Returns a plain-text sizing report (runtime per instrument, memory headroom per process).
+
+    Args:
+        db_path (str): Path of the SQLite file.
+
+    Returns:
+        str: The report.
+    """
+    gb = 1024 ** 3
+    lines = ["Runtime per instrument (succeeded runs)", "-" * 60]
+    lines.append(f"{'Instrument':<25}{'Runs':>6}{'p50 [h]':>12}{'p95 [h]':>12}")
+    for instrument, stats in runtime_percentiles(db_path).items():
+        lines.append(f"{instrument:<25}{stats['runs']:>6}{stats['p50'] / 3600:>12.2f}{stats['p95'] / 3600:>12.2f}")
+
+    lines += ["", "Memory headroom per process (completed tasks)", "-" * 60]
+    lines.append(f"{'Process':<25}{'Tasks':>6}{'Req [GB]':>10}{'p95 [GB]':>10}{'Max [GB]':>10}{'Headroom':>10}")
+    for process, stats in memory_headroom(db_path).items():
+        headroom = f"{stats['headroom']:.0%}" if stats["headroom"] is not None else "n/a"
+        lines.append(
+            f"{process:<25}{stats['tasks']:>6}{stats['requested'] / gb:>10.1f}"
+            f"{stats['p95_rss'] / gb:>10.1f}{stats['max_rss'] / gb:>10.1f}{headroom:>10}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,209 @@
+import time
+import threading
+
+from dash import html
+import dash_bootstrap_components as dbc
+from rq import Queue, Worker
+from rq.job import Job
+from rq.registry import StartedJobRegistry, FailedJobRegistry, FinishedJobRegistry
+
+from RedisPool import get_redis
+
+# Seconds between two snapshots; matches the queue tab's polling interval ("queue-interval").
+SNAPSHOT_INTERVAL = 5
+# Jobs listed per queue and state (newest first); the counts always cover all jobs.
+MAX_JOBS_PER_STATE = 50
+
+REGISTRIES = (
+    ("running", StartedJobRegistry),
+    ("failed", FailedJobRegistry),
+    ("completed", FinishedJobRegistry),
+)
+
+
+# ---------------------------
+# Queue Snapshot
+# ---------------------------
+def take_snapshot(connection):
+    """
+    Reads the state of all RQ queues and workers in one pass.
+
+    Per queue, the job IDs of the running, failed and completed registries are read once, and
+    the listed jobs are fetched with a single pipelined `Job.fetch_many`.
+
+    Args:
+        connection (redis.Redis): Redis connection.
+
+    Returns:
+        dict: {"taken_at": timestamp, "queues": [{"name", "count", "running", "failed",
+               "completed", "jobs": [{"id", "func_name", "state", "ended_at"}],
+               "workers": [{"name", "state", "current_job"}]}]}
+    """
+    workers = Worker.all(connection=connection)
+    queues = []
+    for queue in Queue.all(connection=connection):
+        entry = {"name": queue.name, "count": queue.count, "jobs": []}
+        for state, registry_class in REGISTRIES:
+            job_ids = registry_class(queue.name, connection=connection).get_job_ids()
+            entry[state] = len(job_ids)
+            listed = job_ids[::-1][:MAX_JOBS_PER_STATE]
+            for job in Job.fetch_many(listed, connection=connection):
+                if job is None:
+                    continue
+                entry["jobs"].append({
+                    "id": job.id,
+                    "func_name": job.func_name,
+                    "state": state,
+                    "ended_at": job.ended_at.strftime("%Y-%m-%d %H:%M:%S") if job.ended_at else None,
+                })
+        entry["workers"] = [
+            {"name": worker.name, "state": worker.get_state(), "current_job": worker.get_current_job_id()}
+            for worker in workers if queue.name in worker.queue_names()
+        ]
+        queues.append(entry)
+    return {"taken_at": time.time(), "queues": queues}
+
+
+class SnapshotRefresher:
+    """
+    Keeps one queue snapshot per web process up to date in a background thread.
+
+    Every browser tab polls the queue tab, but the tabs only read the latest snapshot, so the
+    load on Redis does not grow with the number of open sessions. The thread is started on
+    the first read (i.e. in the serving process, after any fork of the web server).
+    """
+
+    def __init__(self, interval=SNAPSHOT_INTERVAL, connection_factory=get_redis):
+        self.interval = interval
+        self.connection_factory = connection_factory
+        self.snapshot = None
+        self.error = None
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.thread = None
+
+    def refresh(self):
+        try:
+            snapshot = take_snapshot(self.connection_factory())
+            with self.lock:
+                self.snapshot, self.error = snapshot, None
+        except Exception as e:
+            print(f"Reading the queue status failed: {e}")
+            with self.lock:
+                self.error = str(e)
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            self.refresh()
+
+    def get(self):
+        """
+        Returns the latest snapshot. The first call takes it synchronously (concurrent first
+        calls wait for it) and starts the refresh thread.
+
+        Returns:
+            tuple: (snapshot dict or None, error message or None)
+        """
+        with self.lock:
+            start = self.thread is None
+            if start:
+                self.thread = threading.Thread(target=self.run, name="queue-status", daemon=True)
+        if start:
+            self.refresh()
+            self.ready.set()
+            self.thread.start()
+        else:
+            self.ready.wait(self.interval)
+        with self.lock:
+            return self.snapshot, self.error
+
+
+refresher = SnapshotRefresher()
+
+
+# ---------------------------
+# Queue Tab Layout
+# ---------------------------
+JOB_CARD_STYLES = {
+    "running": ("Running", "text-success", "#d4edda"),
+    "failed": ("Failed", "text-danger", "#f8d7da"),
+    "completed": ("Completed", "text-primary", "#d1ecf1"),
+}
+
+
+def render_queue_layout(snapshot, error=None):
+    """
+    Builds the queue tab from a snapshot, in the layout of `bfabric_web_apps.get_redis_queue_layout`.
+
+    Args:
+        snapshot (dict or None): Output of `take_snapshot`.
+        error (str, optional): Error of the last refresh; shown above the (older) snapshot.
+
+    Returns:
+        dbc.Container: Queue tab content.
+    """
+    children = []
+    if error:
+        children.append(dbc.Alert(f"The queue status could not be refreshed: {error}", color="warning"))
+    if snapshot is None:
+        return dbc.Container(children, className="mt-4")
+
+    queue_cards = []
+    for queue in snapshot["queues"]:
+        stats_row = dbc.Row([
+            dbc.Col([
+                html.P([html.B("Jobs in queue: "), f"{queue['count']}"]),
+                html.P([html.B("Running: "), f"{queue['running']}"]),
+            ], width=6),
+            dbc.Col([
+                html.P([html.B("Failed: "), f"{queue['failed']}"]),
+                html.P([html.B("Completed: "), f"{queue['completed']}"]),
+            ], width=6)
+        ])
+
+        worker_lines = [
+            html.P(f"Worker {worker['name']}: {worker['state']}" + (f" ({worker['current_job']})" if worker["current_job"] else ""),
+                   className="text-muted", style={"fontSize": "14px", "marginBottom": "2px"})
+            for worker in queue["workers"]
+        ]
+
+        job_cards = []
+        for job in queue["jobs"]:
+            label, text_class, background = JOB_CARD_STYLES[job["state"]]
+            body = [
+                html.H6(f"Job ID: {job['id']}", className="card-title"),
+                html.P(f"Function: {job['func_name']}", className="card-text"),
+                html.P(f"Status: {label}", className=text_class),
+            ]
+            if job["state"] == "completed":
+                body.append(html.P(f"Finished at: {job['ended_at'] or 'Unknown'}", className="text-muted"))
+            job_cards.append(dbc.Card(dbc.CardBody(body), style={"maxWidth": "36vw", "backgroundColor": background}, className="mb-2"))
+
+        queue_cards.append(dbc.Col([
+            dbc.Card(
+                [
+                    dbc.CardHeader(html.H5(f"Queue: {queue['name']}")),
+                    dbc.CardBody([
+                        stats_row,
+                        *worker_lines,
+                        html.Hr(),
+                        *job_cards
+                    ], style={"maxHeight": "58vh", "overflow-y": "scroll"})
+                ],
+                style={"maxWidth": "36vw", "backgroundColor": "#f8f9fa", "max-height": "60vh"}, className="mb-4"
+            )
+        ]))
+
+    children.append(dbc.Row(queue_cards))
+    children.append(html.P(
+        "Updated at {}".format(time.strftime("%H:%M:%S", time.localtime(snapshot["taken_at"]))),
+        className="text-muted", style={"fontSize": "12px"}
+    ))
+    return dbc.Container(children, className="mt-4")
+
+
+def get_queue_layout():
+    """Returns the queue tab content from the shared snapshot (no Redis access per call)."""
+    snapshot, error = refresher.get()
+    return render_queue_layout(snapshot, error)
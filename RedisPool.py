@@ -0,0 +1,130 @@
+import os
+import threading
+
+import redis
+from rq import Queue
+
+# Upper bound of open Redis connections per web/worker process. A caller that finds all of
+# them in use waits up to POOL_TIMEOUT seconds for one to be returned instead of opening
+# another.
+MAX_CONNECTIONS = 100
+POOL_TIMEOUT = 20
+# Live-progress streams block on Redis for as long as a browser tab follows a job, so they
+# get their own pool of at most MAX_STREAMS connections; a stream beyond that is refused
+# instead of waiting, and the shared pool is never used up by streams.
+MAX_STREAMS = 50
+
+# Same job timeout as `bfabric_web_apps.utils.redis_queue.q`.
+QUEUE_DEFAULT_TIMEOUT = 10000000
+
+# `.env` of the app's root folder; a `.env` in the working directory overrides it (the web app
+# runs from the root folder, the workers from `scripts`).
+APP_ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+
+_lock = threading.Lock()
+_client = None
+_stream_client = None
+_stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+_queues = {}
+
+
+# ---------------------------
+# Shared Redis Client
+# ---------------------------
+def redis_address():
+    """
+    Returns the Redis host and port configured for the app.
+
+    Read the way `bfabric_web_apps`' settings read them (environment variables, then `.env`,
+    then localhost:6379), but without importing bfabric_web_apps, which imports Dash; the
+    workers use the same address as the web app without that start-up cost.
+
+    Returns:
+        tuple: (host, port)
+    """
+    from pydantic_settings import BaseSettings, SettingsConfigDict
+
+    class RedisSettings(BaseSettings):
+        model_config = SettingsConfigDict(env_file=(APP_ENV_FILE, ".env"), extra="ignore")
+        REDIS_HOST: str = "localhost"
+        REDIS_PORT: int = 6379
+
+    settings = RedisSettings()
+    return settings.REDIS_HOST, settings.REDIS_PORT
+
+
+def get_redis():
+    """
+    Returns the process-wide Redis client.
+
+    All Redis access of the app (app load state, samplesheet cache, job queues, queue status
+    and live progress) goes through this client, so the process keeps one bounded pool of
+    connections instead of a client (and pool) per caller. The host and port are the ones
+    configured for bfabric_web_apps (see `redis_address`).
+
+    Returns:
+        redis.Redis: Client backed by a `redis.BlockingConnectionPool`.
+    """
+    global _client
+    with _lock:
+        if _client is None:
+            host, port = redis_address()
+            pool = redis.BlockingConnectionPool(
+                host=host, port=port, max_connections=MAX_CONNECTIONS, timeout=POOL_TIMEOUT
+            )
+            _client = redis.Redis(connection_pool=pool)
+        return _client
+
+
+def get_stream_redis():
+    """
+    Returns the process-wide Redis client for live-progress streams, backed by its own
+    connection pool of MAX_STREAMS connections (see `acquire_stream_slot`).
+
+    Returns:
+        redis.Redis: Client backed by a separate `redis.BlockingConnectionPool`.
+    """
+    global _stream_client
+    with _lock:
+        if _stream_client is None:
+            host, port = redis_address()
+            pool = redis.BlockingConnectionPool(
+                host=host, port=port, max_connections=MAX_STREAMS, timeout=POOL_TIMEOUT
+            )
+            _stream_client = redis.Redis(connection_pool=pool)
+        return _stream_client
+
+
+def acquire_stream_slot():
+    """
+    Reserves one of the MAX_STREAMS stream connections without waiting.
+
+    Returns:
+        bool: True if a slot was reserved; it must be given back with `release_stream_slot`.
+    """
+    return _stream_slots.acquire(blocking=False)
+
+
+def release_stream_slot():
+    """Gives back a slot reserved with `acquire_stream_slot`."""
+    _stream_slots.release()
+
+
+def get_queue(name):
+    """
+    Returns the RQ queue `name` on the shared client; the Queue object is created once per name.
+
+    Drop-in replacement for `bfabric_web_apps.utils.redis_queue.q`.
+
+    Args:
+        name (str): Queue name (e.g., "light" or "heavy").
+
+    Returns:
+        rq.Queue: The queue.
+    """
+    connection = get_redis()
+    with _lock:
+        queue = _queues.get(name)
+        if queue is None or queue.connection is not connection:
+            queue = _queues[name] = Queue(name=name, connection=connection, default_timeout=QUEUE_DEFAULT_TIMEOUT)
+        return queue
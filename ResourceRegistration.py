@@ -0,0 +1,333 @@
+import os
+import json
+import time
+import random
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import bfabric.errors
+
+from Tracing import span
+
+# Resources per B-Fabric save call; a batch that B-Fabric rejects for one of its resources is
+# split in halves down to single resources, so one bad resource does not hold back the rest
+# of its batch.
+BATCH_SIZE = 100
+# Concurrent save calls (each thread uses its own power-user wrapper).
+MAX_WORKERS = 4
+# Attempts per call, with exponential backoff and jitter between them.
+MAX_ATTEMPTS = 4
+BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 30.0
+
+# Same values as `bfabric_web_apps.utils.run_main_pipeline.create_workunits_step` and
+# `create_resource` (storage 20 is the GWC server).
+WORKUNIT_APPLICATION_NAME = "Test Workunit"
+WORKUNIT_DESCRIPTION = "Workunits for batch processing"
+STORAGE_ID = "20"
+
+LOG_ORIGIN = "ORIGIN: resource registration"
+
+
+# ---------------------------
+# Checkpoint
+# ---------------------------
+class RegistrationCheckpoint:
+    """
+    What a job has already registered in B-Fabric, kept in a JSON-lines file in the job
+    directory.
+
+    Every created workunit, job link, dataset and resource batch is appended as soon as
+    B-Fabric confirms it, so a job that is retried after a failure (or a worker that died)
+    continues with what is missing instead of creating everything a second time.
+
+    Args:
+        path (str or None): Checkpoint file; None keeps the checkpoint in memory only.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.workunits = {}
+        self.linked = set()
+        self.datasets = {}
+        self.resources = {}
+        if path and os.path.isfile(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.apply(json.loads(line))
+                    except ValueError:
+                        # A line cut off by a crash; everything after it was not confirmed.
+                        break
+
+    def apply(self, entry):
+        kind = entry["kind"]
+        if kind == "workunit":
+            self.workunits[entry["container"]] = entry["id"]
+        elif kind == "linked":
+            self.linked.update(entry["ids"])
+        elif kind == "dataset":
+            self.datasets[entry["container"]] = entry["id"]
+        elif kind == "resources":
+            self.resources.update(entry["ids"])
+
+    def record(self, **entry):
+        with self.lock:
+            self.apply(entry)
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+
+
+# ---------------------------
+# Retries
+# ---------------------------
+def is_entity_error(error):
+    """
+    Whether B-Fabric answered and rejected what was saved (an invalid field, a duplicate, ...).
+
+    Such an error comes back the same on every attempt, so it is not retried. Everything else
+    (B-Fabric unreachable, timeouts, transport or HTTP errors) is.
+    """
+    unavailable = getattr(bfabric.errors, "BfabricUnavailableError", ())
+    return isinstance(error, bfabric.errors.BfabricRequestError) and not isinstance(error, unavailable)
+
+
+def call_with_retry(call, description, attempts=MAX_ATTEMPTS):
+    """
+    Calls `call()` until it succeeds, at most `attempts` times, waiting BACKOFF_SECONDS,
+    then twice as long, and so on (plus up to the same again as jitter, at most
+    MAX_BACKOFF_SECONDS) between attempts. Entity errors (see `is_entity_error`) are
+    raised at once.
+
+    Raises:
+        Exception: The last attempt's exception.
+    """
+    for attempt in range(attempts):
+        try:
+            return call()
+        except Exception as e:
+            if attempt == attempts - 1 or is_entity_error(e):
+                raise
+            delay = min(MAX_BACKOFF_SECONDS, BACKOFF_SECONDS * 2 ** attempt)
+            delay += random.uniform(0, delay)
+            print(f"{description} failed ({e}); retrying in {delay:.1f} s.")
+            time.sleep(delay)
+
+
+def save(wrapper, endpoint, obj, description):
+    """Saves one object or a list of objects with retries; returns the saved entities."""
+    with span("bfabric.save", endpoint=endpoint) as current:
+        result = call_with_retry(lambda: wrapper.save(endpoint, obj), description)
+        current.rows = len(result)
+    return list(result)
+
+
+# ---------------------------
+# Registration
+# ---------------------------
+def expand_resource_paths(resource_paths):
+    """
+    Expands directories into the files below them, like `create_workunits_step`.
+
+    Returns:
+        tuple: ({file path: container ID as int}, list of paths that do not exist)
+    """
+    expanded = {}
+    missing = []
+    for path_str, container_id in resource_paths.items():
+        path = Path(path_str)
+        if path.is_file():
+            expanded[str(path)] = int(container_id)
+        elif path.is_dir():
+            for file in path.rglob("*"):
+                if file.is_file():
+                    expanded[str(file)] = int(container_id)
+        else:
+            missing.append(path_str)
+    return expanded, missing
+
+
+def register_outputs(token_data, app_data, resource_paths, dataset_dict, checkpoint_path=None, logger=None,
+                     user_wrapper=None, wrapper_factory=None, checksums=None):
+    """
+    Registers a job's outputs in B-Fabric: one workunit per container (linked to the B-Fabric
+    job), one dataset per container and one resource per output file.
+
+    This replaces steps 3 to 5 of `bfabric_web_apps.run_main_job`, which saves one resource
+    per API call. Here the workunits are saved in one call, and the resources are grouped by
+    container and saved in batches of BATCH_SIZE by MAX_WORKERS threads, each call retried with
+    backoff. A batch that B-Fabric rejects for one of its resources is split in halves to
+    register the others; a batch that fails otherwise (e.g. B-Fabric is unreachable) fails as
+    a whole after its retries. Everything confirmed by B-Fabric is recorded in the checkpoint
+    file, so a retried job only registers what is still missing.
+
+    Args:
+        token_data (dict): Token data of the job's user ("jobId", "environment", ...).
+        app_data (dict): Application data ("id", "name").
+        resource_paths (dict): {file or directory path: container ID}
+        dataset_dict (dict): {container ID: {column: list of values}}
+        checkpoint_path (str, optional): Checkpoint file (see `RegistrationCheckpoint`).
+        logger (optional): Logger with `log_operation` for the job's B-Fabric log.
+        user_wrapper (optional): Wrapper the workunits are created with (default: the user's).
+        wrapper_factory (callable, optional): Returns a new power-user wrapper; called once
+                                              per thread.
+        checksums (dict, optional): {file path: manifest entry} from `ChecksumManifest.build_manifest`;
+                                    the MD5 and size of each listed file are stored with its resource.
+
+    Returns:
+        dict: Counts {"workunits", "datasets", "resources", "resumed", "missing"}.
+
+    Raises:
+        RuntimeError: If datasets or resources could not be registered after all retries.
+                      What was registered is in the checkpoint; retrying the job continues.
+    """
+    from bfabric_web_apps.utils.dataset_utils import dictionary_to_dataset
+    from bfabric_web_apps.utils.config import settings as config
+
+    if user_wrapper is None:
+        from bfabric_web_apps.objects.BfabricInterface import bfabric_interface
+        user_wrapper = bfabric_interface.get_wrapper()
+    if wrapper_factory is None:
+        from bfabric_web_apps.utils.get_power_user_wrapper import get_power_user_wrapper
+        wrapper_factory = lambda: get_power_user_wrapper(token_data)
+
+    log = (lambda level, message: logger.log_operation(f"{level} | {LOG_ORIGIN}", message, params=None, flush_logs=True)) \
+        if logger else (lambda level, message: None)
+    local = threading.local()
+
+    def power_wrapper():
+        if not hasattr(local, "wrapper"):
+            local.wrapper = wrapper_factory()
+        return local.wrapper
+
+    checkpoint = RegistrationCheckpoint(checkpoint_path)
+    resumed = len(checkpoint.resources)
+    expanded, missing = expand_resource_paths(resource_paths)
+    for path_str in missing:
+        print(f"Warning: Path {path_str} does not exist or is not accessible.")
+    if missing:
+        log("Warning", f"{len(missing)} resource path(s) do not exist, e.g. {missing[0]}")
+    if not expanded:
+        raise ValueError("No valid file paths found in resource_paths.")
+
+    by_container = {}
+    for file_path, container_id in expanded.items():
+        by_container.setdefault(container_id, []).append(file_path)
+
+    # 1. Workunits: one save call for all containers that do not have one yet.
+    new_containers = [cid for cid in sorted(by_container) if str(cid) not in checkpoint.workunits]
+    if new_containers:
+        created = save(user_wrapper, "workunit", [{
+            "name": f"Workunit - {WORKUNIT_APPLICATION_NAME} - Container {cid}",
+            "description": f"{WORKUNIT_DESCRIPTION} for Container {cid}",
+            "applicationid": int(app_data["id"]),
+            "containerid": cid,
+        } for cid in new_containers], "Creating workunits")
+        if len(created) != len(new_containers):
+            raise RuntimeError(f"Mismatch in workunit creation: Expected {len(new_containers)} workunits, got {len(created)}.")
+        for cid, wu in zip(new_containers, created):
+            cid = (wu.get("container") or {}).get("id", cid)
+            checkpoint.record(kind="workunit", container=str(cid), id=wu["id"])
+    workunits = {int(cid): wu_id for cid, wu_id in checkpoint.workunits.items()}
+
+    # Link the new workunits to the B-Fabric job in one read and one save.
+    unlinked = [wu_id for wu_id in workunits.values() if wu_id not in checkpoint.linked]
+    if unlinked and token_data.get("jobId"):
+        job = call_with_retry(lambda: power_wrapper().read("job", {"id": token_data.get("jobId")}), "Reading the job")
+        existing = [wu.get("id") for wu in (job[0].get("workunit", []) if job else [])]
+        save(power_wrapper(), "job", {"id": token_data.get("jobId"), "workunitid": unlinked + existing}, "Linking workunits to the job")
+        checkpoint.record(kind="linked", ids=unlinked)
+    log("Success", f"Workunits per container: {workunits}")
+
+    # 2. Datasets, one per container, linked to the container's workunit.
+    failures = []
+    for container_id, dataset_data in (dataset_dict or {}).items():
+        if str(container_id) in checkpoint.datasets:
+            continue
+        dataset_name = f'Dataset - {str(app_data.get("name", "Unknown App"))} - Container {container_id}'
+        try:
+            dataset = dictionary_to_dataset(dataset_data, dataset_name, container_id, config.DATASET_TEMPLATE_ID,
+                                            workunits.get(int(container_id)))
+            saved = save(power_wrapper(), "dataset", dataset, f"Creating the dataset of container {container_id}")
+            checkpoint.record(kind="dataset", container=str(container_id), id=saved[0].get("id"))
+        except Exception as e:
+            print(f"Error creating dataset for container {container_id}: {e}")
+            failures.append(f"dataset of container {container_id}: {e}")
+
+    # 3. Resources, in batches per container, saved concurrently.
+    checksums = checksums or {}
+
+    def resource(workunit_id, path):
+        entry = {
+            "workunitid": str(workunit_id),
+            "name": Path(path).name,
+            "description": f"Resource attached to workunit {workunit_id}",
+            "relativepath": path,
+            "storageid": STORAGE_ID,
+        }
+        if path in checksums:
+            entry["filechecksum"] = checksums[path]["md5"]
+            entry["size"] = checksums[path]["size"]
+        return entry
+
+    unavailable = threading.Event()
+
+    def register_batch(workunit_id, paths):
+        """
+        Saves one batch; returns the paths that could not be registered (with the error).
+
+        Only an entity error (see `is_entity_error`) splits the batch; any other failure, after
+        the retries of `save`, fails the whole batch, so an outage does not multiply the calls,
+        and the batches not started yet are skipped.
+        """
+        if unavailable.is_set():
+            return [(path, "skipped after B-Fabric failed for an earlier batch") for path in paths]
+        try:
+            saved = save(power_wrapper(), "resource", [resource(workunit_id, path) for path in paths],
+                         f"Registering {len(paths)} resource(s) for workunit {workunit_id}")
+            if len(saved) != len(paths):
+                # Not split: saving the halves again could register the saved ones twice.
+                return [(path, f"expected {len(paths)} resources, got {len(saved)}") for path in paths]
+        except Exception as e:
+            if not is_entity_error(e):
+                unavailable.set()
+                return [(path, str(e)) for path in paths]
+            if len(paths) == 1:
+                return [(paths[0], str(e))]
+            middle = len(paths) // 2
+            return register_batch(workunit_id, paths[:middle]) + register_batch(workunit_id, paths[middle:])
+        checkpoint.record(kind="resources", ids={path: entry.get("id") for path, entry in zip(paths, saved)})
+        return []
+
+    batches = []
+    for container_id, paths in sorted(by_container.items()):
+        pending = [path for path in sorted(paths) if path not in checkpoint.resources]
+        for i in range(0, len(pending), BATCH_SIZE):
+            batches.append((workunits[container_id], pending[i:i + BATCH_SIZE]))
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="bfabric-register") as pool:
+        failed = [item for result in pool.map(lambda batch: register_batch(*batch), batches) for item in result]
+    for path, error in failed:
+        print(f"Failed to attach resource {path}: {error}")
+        failures.append(f"resource {path}: {error}")
+
+    summary = {
+        "workunits": len(workunits),
+        "datasets": len(checkpoint.datasets),
+        "resources": len(checkpoint.resources),
+        "resumed": resumed,
+        "missing": len(missing),
+    }
+    log("Success", f"Registered outputs: {summary}")
+    print(f"Registered outputs: {summary}")
+
+    if failures:
+        log("Error", f"{len(failures)} registration(s) failed, e.g. {failures[0]}")
+        raise RuntimeError(
+            f"{len(failures)} dataset(s)/resource(s) could not be registered in B-Fabric (e.g. {failures[0]}). "
+            f"Retry the job to register the rest."
+        )
+    return summary
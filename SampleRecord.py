@@ -0,0 +1,75 @@
+import sys
+import operator
+
+# [Data] columns of a samplesheet and the SampleRecord attribute each one is kept in.
+COLUMN_FIELDS = {
+    "Sample_ID": "sample_id",
+    "Sample_Name": "name",
+    "index": "index",
+    "index2": "index2",
+    "Sample_Project": "project",
+}
+
+
+def shared(value):
+    """Interned text of a value that repeats across samples (project IDs, index sequences)."""
+    return None if value is None else sys.intern(str(value))
+
+
+# ---------------------------
+# Sample Record
+# ---------------------------
+class SampleRecord:
+    """
+    One sample of a lane, as far as the app uses it.
+
+    Samples travel from B-Fabric into the lane samplesheets and from the samplesheets into
+    the resource paths of a job. A record holds the five values these steps need in slots
+    instead of a dict per sample, and project IDs and index sequences are interned, so a
+    project or an index plate used by thousands of samples is stored once.
+
+    All values are text (None if missing), as they appear in the samplesheet.
+    """
+
+    __slots__ = tuple(COLUMN_FIELDS.values())
+
+    def __init__(self, sample_id, name, index, index2, project):
+        self.sample_id = None if sample_id is None else str(sample_id)
+        self.name = None if name is None else str(name)
+        self.index = shared(index)
+        self.index2 = shared(index2)
+        self.project = shared(project)
+
+    @classmethod
+    def from_bfabric(cls, record):
+        """Builds a record from a B-Fabric sample ("id", "name", "multiplexiddmx", "multiplexid2dmx", "container")."""
+        return cls(
+            record["id"], record["name"], record["multiplexiddmx"], record["multiplexid2dmx"],
+            record["container"]["id"],
+        )
+
+    @classmethod
+    def row_reader(cls, header):
+        """
+        Returns a function that builds a record from one split [Data] row with this header.
+
+        The column positions are looked up once per file instead of zipping every row into a dict.
+        Columns missing from the header are None.
+        """
+        positions = [header.index(col) if col in header else None for col in COLUMN_FIELDS]
+        if None not in positions:
+            pick = operator.itemgetter(*positions)
+            return lambda row: cls(*pick(row))
+
+        def read(row):
+            return cls(*(None if position is None else row[position] for position in positions))
+        return read
+
+    def __eq__(self, other):
+        if not isinstance(other, SampleRecord):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self):
+        values = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"SampleRecord({values})"
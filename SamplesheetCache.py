@@ -0,0 +1,312 @@
+import os
+import threading
+
+# numpy is imported where it is used, so the web server starts without it.
+from GetDataFromBfabric import parse_samplesheet_data_only
+from SheetTable import get_backend
+
+# Columns the user may edit in the samplesheet table.
+EDITABLE_COLUMNS = ("index", "index2")
+
+# Two selected samples whose combined index (i7 + i5) differs in at most this many bases
+# cannot be told apart by bcl2fastq with its default of one allowed mismatch per index.
+MIN_INDEX_DISTANCE = 3
+# Upper bound for the comparison matrix built per chunk in `find_index_collisions` (cells).
+COLLISION_CHUNK_CELLS = 4_000_000
+
+
+# ---------------------------
+# Selection Bitmap
+# ---------------------------
+class SelectionBitmap:
+    """
+    Compact row selection: one bit per row of the sheet.
+
+    A lane with 100,000 samples needs 12.5 kB instead of a list of 100,000 row indices
+    going back and forth between browser and server.
+    """
+
+    def __init__(self, size, selected=True):
+        self.size = size
+        self.bits = bytearray([0xFF if selected else 0x00]) * ((size + 7) // 8)
+        if selected and size % 8:
+            self.bits[-1] = (1 << (size % 8)) - 1
+
+    def __contains__(self, row):
+        return bool(self.bits[row >> 3] & (1 << (row & 7)))
+
+    def set(self, row, selected):
+        if selected:
+            self.bits[row >> 3] |= 1 << (row & 7)
+        else:
+            self.bits[row >> 3] &= ~(1 << (row & 7)) & 0xFF
+
+    def count(self):
+        return int.from_bytes(self.bits, "little").bit_count()
+
+    def indices(self):
+        """Returns the selected row numbers in ascending order."""
+        return [row for row in range(self.size) if row in self]
+
+
+# ---------------------------
+# Cached Lane Sheet
+# ---------------------------
+class CachedSheet:
+    """
+    Parsed [Data] section of one lane samplesheet, held on the server together with the
+    user's row selection and edits.
+
+    Rows keep their position in the file as row ID, so paging, filtering and sorting never
+    change which row a selection bit or an edit belongs to. `version` counts the applied
+    changes; the browser keeps the version it last got back, so a submission only needs to
+    send that number to prove the server has all of its edits.
+
+    The table is held in the type of the table backend (see `SheetTable`); `saved` is the
+    table of the rows that are in the file on disk, to tell whether a save would change it.
+    """
+
+    def __init__(self, csv_path, backend=None):
+        self.csv_path = csv_path
+        self.backend = backend or get_backend()
+        self.stamp = file_stamp(csv_path)
+        self.table = parse_samplesheet_data_only(csv_path, self.backend)
+        self.saved = self.table
+        self.selection = SelectionBitmap(self.row_count())
+        self.dirty = False
+        self.version = 0
+        self.lock = threading.RLock()
+        self._summary = None
+
+    def row_count(self):
+        return self.backend.height(self.table)
+
+    def columns(self):
+        return [{"name": col, "id": col, "editable": (col in EDITABLE_COLUMNS)} for col in self.backend.columns(self.table)]
+
+    def cell(self, row_id, column):
+        with self.lock:
+            return self.backend.cell(self.table, row_id, column)
+
+    def query_page(self, page_current, page_size, sort_by=None, filter_query=""):
+        """
+        Returns one page of the filtered and sorted sheet.
+
+        Args:
+            page_current (int): Zero-based page number.
+            page_size (int): Rows per page.
+            sort_by (list): DataTable `sort_by` ([{"column_id", "direction"}, ...]).
+            filter_query (str): DataTable `filter_query`.
+
+        Returns:
+            tuple: (page records with an "id" key, page-relative indices of selected rows,
+                    page count)
+        """
+        with self.lock:
+            row_ids = self.backend.query(self.table, filter_query, sort_by)
+            page_count = max(1, -(-len(row_ids) // page_size))
+            page_ids = row_ids[page_current * page_size:(page_current + 1) * page_size]
+
+            records = self.backend.records(self.table, page_ids)
+            for record, row_id in zip(records, page_ids):
+                record["id"] = int(row_id)
+            selected = [i for i, row_id in enumerate(page_ids) if row_id in self.selection]
+            return records, selected, page_count
+
+    def apply_cell_changes(self, changes):
+        """
+        Applies cell edits from the browser to the cached sheet.
+
+        Args:
+            changes (list): Cell deltas [{"id": row ID, "column", "old", "new"}, ...].
+
+        Returns:
+            list: Deltas whose "old" value did not match the cached value (e.g., the row was
+                  edited in another tab). Their new value is applied nonetheless.
+        """
+        conflicts = []
+        with self.lock:
+            pending = {}
+            for change in changes:
+                row_id, col = change.get("id"), change.get("column")
+                if col not in EDITABLE_COLUMNS or not isinstance(row_id, int) or not 0 <= row_id < self.row_count():
+                    continue
+                current = pending.get((row_id, col), self.backend.cell(self.table, row_id, col))
+                if not same_value(current, change.get("old")):
+                    conflicts.append(change)
+                if not same_value(current, change.get("new")):
+                    pending[(row_id, col)] = change.get("new")
+            if pending:
+                # One column update per edited column, however many cells the batch changes.
+                for col in EDITABLE_COLUMNS:
+                    cells = [(row_id, value) for (row_id, column), value in pending.items() if column == col]
+                    if cells:
+                        rows, values = zip(*cells)
+                        self.table = self.backend.set_cells(self.table, col, list(rows), list(values))
+                self.version += 1
+                self.dirty = True
+        return conflicts
+
+    def apply_selection(self, states):
+        """
+        Applies the selection state of the rows shown on the browser's current page.
+
+        Args:
+            states (list): [[row ID, selected], ...] for the rows of the page.
+        """
+        with self.lock:
+            changed = False
+            for row_id, selected in states:
+                if isinstance(row_id, int) and 0 <= row_id < self.selection.size and (row_id in self.selection) != bool(selected):
+                    self.selection.set(row_id, bool(selected))
+                    changed = True
+            if changed:
+                self.version += 1
+                self.dirty = True
+
+    def summary(self):
+        """
+        Returns sample counts, index collisions and edit state of the sheet.
+
+        Collisions are computed over the selected rows only and cached until the next change.
+
+        Returns:
+            dict: {"samples", "selected", "duplicates", "similar", "dirty", "version"}
+        """
+        with self.lock:
+            if self._summary is None or self._summary["version"] != self.version:
+                rows = self.selection.indices()
+                combined = [
+                    i7 + i5 for i7, i5 in zip(
+                        self.backend.column(self.table, "index", rows),
+                        self.backend.column(self.table, "index2", rows),
+                    )
+                ]
+                distances = [distance for _, _, distance in find_index_collisions(combined)]
+                self._summary = {
+                    "samples": self.row_count(),
+                    "selected": len(rows),
+                    "duplicates": sum(1 for d in distances if d == 0),
+                    "similar": sum(1 for d in distances if d > 0),
+                    "version": self.version,
+                }
+            return {**self._summary, "dirty": self.dirty}
+
+    def selected_table(self):
+        """Returns the selected rows (with the user's edits) in file order, as a backend table."""
+        with self.lock:
+            return self.backend.take(self.table, self.selection.indices())
+
+    def to_pandas(self):
+        """Returns the whole sheet as a pandas DataFrame (row ID as index), for pandas-based helpers."""
+        with self.lock:
+            return self.backend.to_pandas(self.table)
+
+
+# ---------------------------
+# Helper functions
+# ---------------------------
+def file_stamp(csv_path):
+    """Returns (mtime_ns, size) of a file, used to notice when it was rewritten."""
+    stat = os.stat(csv_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def find_index_collisions(indices, min_distance=MIN_INDEX_DISTANCE):
+    """
+    Finds pairs of indices that differ in fewer than `min_distance` positions.
+
+    Indices of equal length are compared as a uint8 matrix, chunk by chunk, so a lane with
+    thousands of samples is checked in a few vectorised steps.
+
+    Args:
+        indices (list): Index sequences (e.g., i7 + i5 per sample).
+        min_distance (int): Smallest Hamming distance that is not a collision.
+
+    Returns:
+        list: (position_a, position_b, distance) for every colliding pair (a < b).
+    """
+    import numpy as np
+
+    by_length = {}
+    for position, index in enumerate(indices):
+        by_length.setdefault(len(index), []).append(position)
+
+    collisions = []
+    for length, positions in by_length.items():
+        if length == 0 or len(positions) < 2:
+            continue
+        matrix = np.frombuffer("".join(indices[p] for p in positions).encode("ascii", "replace"), dtype=np.uint8)
+        matrix = matrix.reshape(len(positions), length)
+        chunk = max(1, COLLISION_CHUNK_CELLS // (len(positions) * length))
+        for start in range(0, len(positions), chunk):
+            block = matrix[start:start + chunk]
+            distances = (block[:, None, :] != matrix[None, :, :]).sum(axis=2)
+            rows, cols = np.nonzero(distances < min_distance)
+            for row, col in zip(rows, cols):
+                a, b = start + row, col
+                if a < b:
+                    collisions.append((positions[a], positions[b], int(distances[row, col])))
+    return collisions
+
+
+def same_value(old, new):
+    """Compares two cell values; empty cells (None/null, or "" from the browser) are equal."""
+    if old in (None, "") and new in (None, ""):
+        return True
+    return old == new
+
+
+# ---------------------------
+# Cache Access
+# ---------------------------
+_sheets = {}
+_sheets_lock = threading.Lock()
+
+
+def get_sheet(csv_path):
+    """
+    Returns the cached sheet of a lane CSV, parsing it on first use.
+
+    The file is parsed again when it was rewritten on disk (e.g., after the app
+    recreated the samplesheets), which also discards the previous selection.
+
+    Args:
+        csv_path (str): Path of the lane samplesheet.
+
+    Returns:
+        CachedSheet: The cached sheet.
+    """
+    key = os.path.abspath(csv_path)
+    with _sheets_lock:
+        sheet = _sheets.get(key)
+        if sheet is None or sheet.stamp != file_stamp(csv_path):
+            sheet = _sheets[key] = CachedSheet(csv_path)
+        return sheet
+
+
+def mark_saved(csv_path, saved_table=None):
+    """
+    Marks a sheet as saved after its selected rows were written to disk.
+
+    The cached sheet is kept as it is (deselected rows included), so the row IDs shown in the
+    browser stay valid; only the file stamp is updated so that the write is not taken for an
+    outside change.
+
+    Args:
+        csv_path (str): Path of the lane samplesheet.
+        saved_table (optional): Backend table of the rows now in the file.
+    """
+    sheet = get_sheet_if_cached(csv_path)
+    if sheet is not None:
+        with sheet.lock:
+            sheet.stamp = file_stamp(csv_path)
+            sheet.dirty = False
+            if saved_table is not None:
+                sheet.saved = saved_table
+
+
+def get_sheet_if_cached(csv_path):
+    """Returns the cached sheet of a lane CSV, or None if it was not loaded yet."""
+    with _sheets_lock:
+        return _sheets.get(os.path.abspath(csv_path))
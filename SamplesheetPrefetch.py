@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+from rq.job import Job
+from rq.exceptions import NoSuchJobError
+
+from Tracing import span
+
+# Per-run samplesheet cache in Redis, shared by the compute server (which fills it) and the
+# UI server (which reads it when a user opens the app for the run).
+SHEET_CACHE_KEY = "demultiplex:sheet-cache:{run_id}"
+SHEET_CACHE_INDEX = "demultiplex:sheet-cache:index"
+
+PREFETCH_JOB_ID = "demultiplex-prefetch"
+ACTIVE_JOB_STATUSES = {"queued", "started", "deferred", "scheduled"}
+
+# Files written by the sequencer / RTA once a run folder is complete.
+RUN_COMPLETE_MARKERS = ("CopyComplete.txt", "RTAComplete.txt")
+
+
+# ---------------------------
+# Samplesheet Cache (Redis)
+# ---------------------------
+def store_samplesheets(connection, run_id, app_name, csv_list, pipeline_path, max_age_seconds):
+    """
+    Stores the samplesheets of one run in the cache.
+
+    Args:
+        connection (redis.Redis): Redis connection.
+        run_id (int or str): B-Fabric ID of the run.
+        app_name (str): Application name written into the sheets' [Header].
+        csv_list (list): Paths of the lane samplesheets.
+        pipeline_path (str): Path of the pipeline samplesheet.
+        max_age_seconds (int): How long the entry is kept.
+    """
+    manifest = {
+        "run_id": str(run_id),
+        "app_name": app_name,
+        "created": time.time(),
+        "lanes": [os.path.basename(path) for path in csv_list],
+        "pipeline": os.path.basename(pipeline_path),
+    }
+    files = {}
+    for path in list(csv_list) + [pipeline_path]:
+        with open(path, "rb") as f:
+            files[os.path.basename(path)] = f.read()
+
+    key = SHEET_CACHE_KEY.format(run_id=run_id)
+    pipe = connection.pipeline()
+    pipe.delete(key)
+    pipe.hset(key, mapping={"manifest": json.dumps(manifest), **files})
+    pipe.expire(key, int(max_age_seconds))
+    pipe.zadd(SHEET_CACHE_INDEX, {str(run_id): manifest["created"]})
+    pipe.execute()
+
+
+def load_cached_samplesheets(connection, run_id, app_name, sheet_dir=".", output_file_pipeline_samplesheet="pipeline_samplesheet.csv"):
+    """
+    Writes the cached samplesheets of a run to `sheet_dir`, if the run was prefetched.
+
+    Args:
+        connection (redis.Redis): Redis connection.
+        run_id (int or str): B-Fabric ID of the run.
+        app_name (str): Application name the sheets must have been created for.
+        sheet_dir (str): Directory the lane samplesheets are written to.
+        output_file_pipeline_samplesheet (str): Path of the pipeline samplesheet to write.
+
+    Returns:
+        tuple or None: (list of lane samplesheet paths, pipeline samplesheet path), or None if
+                       the run is not in the cache.
+    """
+    entry = connection.hgetall(SHEET_CACHE_KEY.format(run_id=run_id))
+    if not entry or b"manifest" not in entry:
+        return None
+    manifest = json.loads(entry[b"manifest"])
+    if manifest.get("app_name") != app_name:
+        return None
+
+    csv_list = []
+    for name in manifest["lanes"]:
+        path = os.path.normpath(os.path.join(sheet_dir, name))
+        with open(path, "wb") as f:
+            f.write(entry[name.encode()])
+        csv_list.append(path)
+    with open(output_file_pipeline_samplesheet, "wb") as f:
+        f.write(entry[manifest["pipeline"].encode()])
+    return csv_list, output_file_pipeline_samplesheet
+
+
+def trim_cache(connection, max_runs, max_age_seconds):
+    """
+    Drops cache entries beyond the `max_runs` newest and entries older than `max_age_seconds`.
+
+    Returns:
+        int: Number of dropped runs.
+    """
+    expired = connection.zrangebyscore(SHEET_CACHE_INDEX, "-inf", time.time() - max_age_seconds)
+    surplus = connection.zrevrange(SHEET_CACHE_INDEX, max_runs, -1)
+    dropped = set(expired) | set(surplus)
+    if dropped:
+        pipe = connection.pipeline()
+        for run_id in dropped:
+            pipe.delete(SHEET_CACHE_KEY.format(run_id=run_id.decode()))
+            pipe.zrem(SHEET_CACHE_INDEX, run_id)
+        pipe.execute()
+    return len(dropped)
+
+
+# ---------------------------
+# Helper functions: Finding Completed Runs
+# ---------------------------
+class PrefetchLogger:
+    """
+    Stand-in for the B-Fabric job logger used by `create_samplesheets`.
+
+    The prefetcher runs without a user session (there is no B-Fabric job to log to), so API
+    calls are made directly and operations are printed to the worker log.
+    """
+
+    def logthis(self, api_call, *args, params=None, flush_logs=True, **kwargs):
+        return api_call(*args, **kwargs)
+
+    def log_operation(self, operation, message, params=None, flush_logs=True):
+        print(f"{operation}: {message}")
+
+
+def run_is_complete(run):
+    """Returns True if the run's data folder exists on this host and the sequencer finished writing it."""
+    datafolder = run.get("datafolder") or ""
+    return os.path.isdir(datafolder) and any(
+        os.path.isfile(os.path.join(datafolder, marker)) for marker in RUN_COMPLETE_MARKERS
+    )
+
+
+def find_recent_runs(wrapper, lookback_days, limit):
+    """
+    Reads the runs created in the last `lookback_days` days from B-Fabric, newest first.
+
+    Args:
+        wrapper: B-Fabric wrapper.
+        lookback_days (int): Age of the oldest run to consider.
+        limit (int): Maximum number of runs to read.
+
+    Returns:
+        list: Run dicts.
+    """
+    since = (datetime.now() - timedelta(days=lookback_days)).strftime("%Y-%m-%dT%H:%M:%S")
+    with span("bfabric.read", endpoint="run") as current:
+        runs = list(wrapper.read("run", {"createdafter": since}, max_results=limit))
+        current.rows = len(runs)
+    return sorted(runs, key=lambda run: run.get("created", ""), reverse=True)
+
+
+# ---------------------------
+# Prefetch Job (runs on the worker)
+# ---------------------------
+def prefetch_recent_runs(app_name, max_runs=20, max_age_hours=72, lookback_days=3):
+    """
+    Creates the samplesheets of recently completed runs ahead of time.
+
+    Executed as an RQ job on the "prefetch" queue (enqueued periodically by the worker
+    launcher). For each completed run that is not cached yet (newest first, at most
+    `max_runs`), `create_samplesheets` is run into a temporary directory and the result is
+    stored in the Redis samplesheet cache. When a user opens the app for one of these runs,
+    the sheets are taken from the cache instead of being fetched from B-Fabric.
+
+    Args:
+        app_name (str): Application name written into the sheets' [Header]; must match the
+                        app's B-Fabric application name for the cache to be used.
+        max_runs (int): Maximum number of runs kept in the cache.
+        max_age_hours (float): How long a prefetched run is kept.
+        lookback_days (int): Only runs created within this many days are considered.
+
+    Returns:
+        dict: {"prefetched": [run IDs], "failed": {run ID: error}, "dropped": n}
+    """
+    from bfabric_web_apps.objects.BfabricInterface import bfabric_interface
+    from RedisPool import get_redis
+    from GetDataFromBfabric import create_samplesheets
+
+    max_age_seconds = int(max_age_hours * 3600)
+    redis_conn = get_redis()
+    wrapper = bfabric_interface.get_wrapper()
+    result = {"prefetched": [], "failed": {}, "dropped": 0}
+
+    for run in find_recent_runs(wrapper, lookback_days, max_runs * 5):
+        if len(result["prefetched"]) >= max_runs:
+            break
+        run_id = run["id"]
+        if redis_conn.exists(SHEET_CACHE_KEY.format(run_id=run_id)) or not run_is_complete(run):
+            continue
+
+        sheet_dir = tempfile.mkdtemp(prefix=f"prefetch-{run_id}-")
+        try:
+            csv_list, pipeline_path = create_samplesheets(
+                {"entity_id_data": run_id},
+                {"name": app_name},
+                output_file_pipeline_samplesheet=os.path.join(sheet_dir, "pipeline_samplesheet.csv"),
+                sheet_dir=sheet_dir,
+                logger=PrefetchLogger()
+            )
+            if csv_list:
+                store_samplesheets(redis_conn, run_id, app_name, csv_list, pipeline_path, max_age_seconds)
+                result["prefetched"].append(run_id)
+                print(f"Prefetched {len(csv_list)} samplesheet(s) of run {run_id}.")
+        except Exception as e:
+            print(f"Prefetching run {run_id} failed: {e}")
+            result["failed"][run_id] = str(e)
+        finally:
+            shutil.rmtree(sheet_dir, ignore_errors=True)
+
+    result["dropped"] = trim_cache(redis_conn, max_runs, max_age_seconds)
+    return result
+
+
+def enqueue_prefetch(queue, **job_kwargs):
+    """
+    Enqueues `prefetch_recent_runs` unless a prefetch job is still queued or running.
+
+    Args:
+        queue (rq.Queue): Queue of the prefetch job (e.g., "prefetch").
+        **job_kwargs: Arguments of `prefetch_recent_runs`.
+
+    Returns:
+        rq.job.Job or None: The new job, or None if one is still active.
+    """
+    try:
+        existing = Job.fetch(PREFETCH_JOB_ID, connection=queue.connection)
+        if existing.get_status() in ACTIVE_JOB_STATUSES:
+            return None
+        existing.delete()
+    except NoSuchJobError:
+        pass
+    return queue.enqueue(prefetch_recent_runs, job_id=PREFETCH_JOB_ID, kwargs=job_kwargs)
@@ -0,0 +1,150 @@
+import re
+import csv
+import warnings
+from io import StringIO
+
+# Columns of the [Data] section of the lane samplesheets, in file order.
+DATA_COLUMNS = [
+    "Sample_ID", "Sample_Name", "Sample_Plate", "Sample_Well", "Index_Plate", "Index_Plate_Well",
+    "I7_Index_ID", "index", "I5_Index_ID", "index2", "Sample_Project", "Description",
+]
+
+# Same index checks as `sample_sheet.Sample`: columns named "index", "index2", ... must hold
+# bases (or a 10x sample index set name).
+INDEX_COLUMN = re.compile(r"index\d?")
+INDEX_VALUE = re.compile(r"^[ACGTN]*$|^SI-[ACGTNS]{2}-[A-H]\d+$")
+
+
+# ---------------------------
+# Sample Columns
+# ---------------------------
+def lane_sample_columns(lane_samples):
+    """
+    Builds the [Data] columns of a lane from its sample records.
+
+    Args:
+        lane_samples (list): `SampleRecord.SampleRecord` per sample, in sheet order.
+
+    Returns:
+        dict: {column: list of values}, one entry per DATA_COLUMNS column.
+    """
+    i7 = [sample.index for sample in lane_samples]
+    i5 = [sample.index2 for sample in lane_samples]
+    empty = [""] * len(lane_samples)
+    return {
+        "Sample_ID": [sample.sample_id for sample in lane_samples],
+        "Sample_Name": [sample.name for sample in lane_samples],
+        "Sample_Plate": empty,
+        "Sample_Well": empty,
+        "Index_Plate": empty,
+        "Index_Plate_Well": empty,
+        "I7_Index_ID": i7,
+        "index": i7,
+        "I5_Index_ID": i5,
+        "index2": i5,
+        "Sample_Project": [sample.project for sample in lane_samples],
+        "Description": empty,
+    }
+
+
+def validate_samples(columns):
+    """
+    Checks the samples of one lane the way `sample_sheet.SampleSheet.add_sample` does, in one
+    pass with hash lookups instead of comparing every sample with every earlier one.
+
+    - Every sample needs a Sample_ID.
+    - Index values must be valid index sequences.
+    - Samples with the same Sample_ID are allowed, with a warning.
+    - Two samples must not have the same index combination.
+
+    Args:
+        columns (dict): {column: list of values} (see `lane_sample_columns`).
+
+    Raises:
+        ValueError: On the first sample that breaks a rule, with the library's message.
+    """
+    sample_ids = columns.get("Sample_ID", [])
+    index_values = [columns[col] for col in columns if INDEX_COLUMN.match(col)]
+    i7 = columns.get("index", [None] * len(sample_ids))
+    i5 = columns.get("index2", [None] * len(sample_ids))
+    seen_ids = set()
+    seen_indices = {}
+    for position, sample_id in enumerate(sample_ids):
+        for values in index_values:
+            if not INDEX_VALUE.match(str(values[position])):
+                raise ValueError(f"Not a valid index: {values[position]}")
+        if sample_id is None:
+            raise ValueError('Sample must have "Sample_ID" defined.')
+        if sample_id in seen_ids:
+            warnings.warn(UserWarning(f"Two equivalent samples added: Sample_ID {sample_id}"))
+        seen_ids.add(sample_id)
+
+        combination = (i7[position], i5[position])
+        if combination in seen_indices:
+            raise ValueError(
+                f"Sample index combination for {sample_id} has already been "
+                f"added on this lane or flowcell: {seen_indices[combination]}"
+            )
+        seen_indices[combination] = sample_id
+
+
+# ---------------------------
+# IEM Samplesheet Writer
+# ---------------------------
+def render_samplesheet(header, reads, settings, columns, blank_lines=1):
+    """
+    Renders an Illumina Experiment Manager (IEM v5) samplesheet.
+
+    The output is the same, byte for byte, as `sample_sheet.SampleSheet.write` for a sheet
+    with these sections and samples: CSV rows padded to the width of the [Data] section,
+    "\\r\\n" line endings and fields quoted only where needed. A lane without samples has no
+    [Data] columns (the library takes them from the samples), so its sheet is two columns wide.
+
+    Args:
+        header (dict): [Header] keys and values, in order.
+        reads (list): [Reads] cycle counts.
+        settings (dict): [Settings] keys and values, in order.
+        columns (dict): {column: list of values} for the [Data] section, in column order.
+        blank_lines (int): Blank lines between sections.
+
+    Returns:
+        str: The samplesheet.
+    """
+    if not any(len(values) for values in columns.values()):
+        columns = {}
+    width = max(len(columns), 2)
+
+    def pad(values):
+        return list(values) + [""] * (width - len(values))
+
+    rows = []
+    for title, section in (("Header", header), ("Reads", reads), ("Settings", settings)):
+        rows.append(pad([f"[{title}]"]))
+        if title == "Reads":
+            rows += [pad([read]) for read in section]
+        else:
+            rows += [pad([key, value]) for key, value in section.items()]
+        rows += [pad([])] * blank_lines
+
+    rows.append(pad(["[Data]"]))
+    rows.append(pad(list(columns)))
+    data = zip(*columns.values())
+    rows += data if width == len(columns) else (pad(row) for row in data)
+
+    buffer = StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def write_samplesheet(path, header, reads, settings, columns):
+    """
+    Validates the samples (see `validate_samples`) and writes the samplesheet in one write.
+
+    Args:
+        path (str): Output file.
+        header (dict), reads (list), settings (dict), columns (dict): See `render_samplesheet`.
+    """
+    validate_samples(columns)
+    content = render_samplesheet(header, reads, settings, columns)
+    with open(path, "w+", newline="") as handle:
+        handle.write(content)
@@ -0,0 +1,389 @@
+import re
+import operator
+from io import StringIO
+
+from Tracing import traced, annotate
+
+# Table library used for the lane sheets: "polars", "pandas", or "auto" (Polars if it can be
+# imported, pandas otherwise). Both are imported on first use only.
+TABLE_BACKEND = "auto"
+
+# Columns of the [Data] section shown and kept in the samplesheet table.
+DATA_COLUMNS = ["Sample_ID", "Sample_Name", "index", "index2", "Sample_Project"]
+
+# Operators of the DataTable filter syntax (word and symbol form).
+FILTER_OPERATORS = {
+    "ge": ">=", "le": "<=", "lt": "<", "gt": ">", "ne": "!=", "eq": "=",
+    "contains": "contains", "datestartswith": "datestartswith",
+}
+COMPARISONS = {
+    ">=": operator.ge, "<=": operator.le, "<": operator.lt,
+    ">": operator.gt, "!=": operator.ne, "=": operator.eq,
+}
+FILTER_PART = re.compile(r"\{(?P<column>[^}]+)\}\s*(?P<operator>\S+)\s*(?P<value>.*)")
+
+
+# ---------------------------
+# Filter Queries
+# ---------------------------
+def split_filter_part(filter_part):
+    """
+    Splits one clause of a DataTable filter query, e.g. '{index} contains "ACG"'.
+
+    Returns:
+        tuple: (column, operator, value), or (None, None, None) if the clause is not understood.
+               Unquoted numbers are returned as float.
+    """
+    match = FILTER_PART.match(filter_part.strip())
+    if not match:
+        return None, None, None
+    symbol = FILTER_OPERATORS.get(match.group("operator"), match.group("operator"))
+    if symbol not in COMPARISONS and symbol not in ("contains", "datestartswith"):
+        return None, None, None
+
+    value = match.group("value").strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ("'", '"', "`"):
+        value = value[1:-1]
+    else:
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+    return match.group("column"), symbol, value
+
+
+def filter_clauses(filter_query, columns):
+    """Returns the understood clauses of a filter query on existing columns."""
+    clauses = []
+    for part in (filter_query or "").split(" && "):
+        column, symbol, value = split_filter_part(part)
+        if column in columns:
+            clauses.append((column, symbol, value))
+    return clauses
+
+
+def as_text(value):
+    """Filter value as cell text: 12.0 -> "12"."""
+    return str(value).removesuffix(".0") if isinstance(value, float) else str(value)
+
+
+# ---------------------------
+# Polars Backend
+# ---------------------------
+class PolarsBackend:
+    """
+    Lane sheets as `polars.DataFrame` (all columns as strings, empty cells as null).
+
+    Parsing, filtering, sorting and serialising run in Polars' native, multi-threaded code
+    instead of row by row in Python.
+    """
+
+    name = "polars"
+
+    def __init__(self):
+        import polars as pl
+        self.pl = pl
+
+    def read_data(self, text, columns=DATA_COLUMNS):
+        pl = self.pl
+        header = next(iter(text.splitlines()), "").split(",")
+        frame = pl.read_csv(
+            StringIO(text),
+            schema_overrides={col: pl.String for col in header if col},
+            infer_schema=False,
+            truncate_ragged_lines=True,
+        )
+        return frame.select([pl.col(col) if col in frame.columns else pl.lit(None, pl.String).alias(col) for col in columns])
+
+    def empty(self, columns=DATA_COLUMNS):
+        return self.pl.DataFrame({col: [] for col in columns}, schema={col: self.pl.String for col in columns})
+
+    def from_records(self, records):
+        pl = self.pl
+        if not records:
+            return pl.DataFrame()
+        columns = list(dict.fromkeys(key for record in records for key in record))
+        return pl.DataFrame(
+            {col: [None if record.get(col) is None else str(record.get(col)) for record in records] for col in columns},
+            schema={col: pl.String for col in columns},
+        )
+
+    def height(self, frame):
+        return frame.height
+
+    def columns(self, frame):
+        return frame.columns
+
+    def cell(self, frame, row, column):
+        return frame[row, column]
+
+    def set_cells(self, frame, column, rows, values):
+        return frame.with_columns(frame[column].clone().scatter(rows, values))
+
+    def column(self, frame, column, rows=None):
+        series = frame[column] if rows is None else frame[column].gather(rows)
+        return series.fill_null("").to_list()
+
+    def take(self, frame, rows):
+        return frame[rows] if rows else frame.clear()
+
+    def records(self, frame, rows):
+        return self.take(frame, rows).to_dicts()
+
+    def query(self, frame, filter_query="", sort_by=None):
+        pl = self.pl
+        view = frame.with_row_index("__row__")
+        for column, symbol, value in filter_clauses(filter_query, frame.columns):
+            cell = pl.col(column)
+            if symbol == "contains":
+                mask = cell.str.to_lowercase().str.contains(str(value).lower(), literal=True)
+            elif symbol == "datestartswith":
+                mask = cell.str.starts_with(str(value))
+            elif symbol in ("=", "!="):
+                mask = COMPARISONS[symbol](cell, as_text(value))
+            elif isinstance(value, float):
+                mask = COMPARISONS[symbol](cell.cast(pl.Float64, strict=False), value)
+            else:
+                mask = COMPARISONS[symbol](cell, value)
+            view = view.filter(mask.fill_null(False))
+        if sort_by:
+            keys, descending = [], []
+            for s in sort_by:
+                column = s["column_id"]
+                if self.is_numeric(frame, column):
+                    keys.append(pl.col(column).cast(pl.Float64, strict=False))
+                    descending.append(s["direction"] != "asc")
+                keys.append(pl.col(column))
+                descending.append(s["direction"] != "asc")
+            view = view.sort(keys, descending=descending, nulls_last=True, maintain_order=True)
+        return view["__row__"].to_list()
+
+    def is_numeric(self, frame, column):
+        pl = self.pl
+        cell = pl.col(column)
+        numbers = cell.cast(pl.Float64, strict=False)
+        return frame.select(
+            numbers.is_not_null().any() & ~(numbers.is_null() & cell.is_not_null() & (cell != "")).any()
+        ).item()
+
+    def equals(self, a, b):
+        return a.equals(b, null_equal=True)
+
+    def to_pandas(self, frame):
+        import pandas as pd
+        return pd.DataFrame(frame.to_dict(as_series=False), columns=frame.columns, dtype=object)
+
+    def write_rows(self, frame, header):
+        pl = self.pl
+        if frame.height == 0:
+            return ""
+        aligned = frame.select([
+            pl.col(col) if col in frame.columns else pl.lit(None, pl.String).alias(col) for col in header
+        ])
+        return aligned.write_csv(include_header=False, null_value="", line_terminator="\n")
+
+
+# ---------------------------
+# pandas Backend
+# ---------------------------
+class PandasBackend:
+    """
+    Lane sheets as `pandas.DataFrame` (object columns of str, empty cells as None), the
+    fallback when Polars is not installed.
+    """
+
+    name = "pandas"
+
+    def __init__(self):
+        import pandas as pd
+        self.pd = pd
+
+    def normalise(self, frame):
+        frame = frame.astype(object)
+        return frame.where(frame.notna(), None).reset_index(drop=True)
+
+    def read_data(self, text, columns=DATA_COLUMNS):
+        frame = self.pd.read_csv(StringIO(text), dtype=str, keep_default_na=False, na_values=[""])
+        return self.normalise(frame.reindex(columns=columns))
+
+    def empty(self, columns=DATA_COLUMNS):
+        return self.pd.DataFrame({col: [] for col in columns}, dtype=object)
+
+    def from_records(self, records):
+        frame = self.normalise(self.pd.DataFrame(records))
+        return frame.map(lambda value: value if value is None or isinstance(value, str) else str(value))
+
+    def height(self, frame):
+        return len(frame)
+
+    def columns(self, frame):
+        return list(frame.columns)
+
+    def cell(self, frame, row, column):
+        return frame.at[row, column]
+
+    def set_cells(self, frame, column, rows, values):
+        frame = frame.copy()
+        for row, value in zip(rows, values):
+            frame.at[row, column] = value
+        return frame
+
+    def column(self, frame, column, rows=None):
+        series = frame[column] if rows is None else frame[column].iloc[rows]
+        return ["" if value is None else value for value in series.tolist()]
+
+    def take(self, frame, rows):
+        return frame.iloc[rows].reset_index(drop=True)
+
+    def records(self, frame, rows):
+        return frame.iloc[rows].to_dict("records")
+
+    def query(self, frame, filter_query="", sort_by=None):
+        pd = self.pd
+        view = frame
+        for column, symbol, value in filter_clauses(filter_query, frame.columns):
+            series = view[column]
+            if symbol == "contains":
+                mask = series.str.contains(str(value), case=False, regex=False, na=False)
+            elif symbol == "datestartswith":
+                mask = series.str.startswith(str(value), na=False)
+            elif symbol in ("=", "!="):
+                mask = COMPARISONS[symbol](series, as_text(value)) & series.notna()
+            elif isinstance(value, float):
+                mask = COMPARISONS[symbol](pd.to_numeric(series, errors="coerce"), value)
+            else:
+                mask = series.map(lambda cell: cell is not None and COMPARISONS[symbol](cell, value)).astype(bool)
+            view = view[mask]
+        if sort_by:
+            keys = pd.DataFrame(index=view.index)
+            ascending = []
+            for position, s in enumerate(sort_by):
+                column = s["column_id"]
+                if self.is_numeric(frame, column):
+                    keys[f"number_{position}"] = pd.to_numeric(view[column], errors="coerce")
+                    ascending.append(s["direction"] == "asc")
+                keys[f"text_{position}"] = view[column]
+                ascending.append(s["direction"] == "asc")
+            view = view.loc[keys.sort_values(list(keys.columns), ascending=ascending, kind="mergesort",
+                                             na_position="last").index]
+        return [int(row) for row in view.index]
+
+    def is_numeric(self, frame, column):
+        series = frame[column]
+        numbers = self.pd.to_numeric(series, errors="coerce")
+        return bool(numbers.notna().any()) and not (numbers.isna() & series.notna() & (series != "")).any()
+
+    def equals(self, a, b):
+        return a.reset_index(drop=True).equals(b.reset_index(drop=True))
+
+    def to_pandas(self, frame):
+        return frame.copy()
+
+    def write_rows(self, frame, header):
+        if len(frame) == 0:
+            return ""
+        return frame.reindex(columns=header).to_csv(header=False, index=False, na_rep="", lineterminator="\n")
+
+
+# ---------------------------
+# Backend Selection
+# ---------------------------
+BACKENDS = {"polars": PolarsBackend, "pandas": PandasBackend}
+_backends = {}
+
+
+def get_backend(name=None):
+    """
+    Returns the table backend `name` ("polars", "pandas" or "auto"; default TABLE_BACKEND).
+
+    "auto" falls back to pandas if Polars cannot be imported.
+
+    Returns:
+        PolarsBackend or PandasBackend: Shared backend instance.
+    """
+    name = name or TABLE_BACKEND
+    if name == "auto":
+        try:
+            return get_backend("polars")
+        except ImportError:
+            return get_backend("pandas")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown table backend '{name}' (expected one of {', '.join(BACKENDS)} or 'auto').")
+    if name not in _backends:
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
+
+
+# ---------------------------
+# [Data] Section I/O
+# ---------------------------
+def find_data_section(lines):
+    """Returns the position of the "[Data]" marker line, or None."""
+    for i, line in enumerate(lines):
+        if line.strip().startswith("[Data]"):
+            return i
+    return None
+
+
+@traced(rows=lambda frame: frame.shape[0])
+def read_data_section(filepath, backend=None):
+    """
+    Parses the [Data] section of a samplesheet into a table of DATA_COLUMNS.
+
+    All cells are read as text, so sample IDs and indices are never turned into numbers, and
+    empty cells are null (None).
+
+    Args:
+        filepath (str): Path to the samplesheet CSV file.
+        backend (optional): Table backend; defaults to `get_backend()`.
+
+    Returns:
+        Table of the backend (an empty one if the file has no [Data] section).
+    """
+    backend = backend or get_backend()
+    with open(filepath, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    annotate(bytes=sum(len(line) for line in lines))
+
+    data_start_idx = find_data_section(lines)
+    if data_start_idx is None or len(lines) <= data_start_idx + 1:
+        return backend.empty()
+    return backend.read_data("".join(lines[data_start_idx + 1:]))
+
+
+@traced()
+def write_data_section(csv_path, frame, backend=None):
+    """
+    Replaces the data rows of a samplesheet with the rows of `frame`.
+
+    Everything up to and including the [Data] header line is kept as it is; the rows are
+    written in the order of that header (columns missing in `frame` are left empty).
+
+    Args:
+        csv_path (str): Path to the samplesheet CSV file.
+        frame: Table of the backend with the rows to keep.
+        backend (optional): Table backend of `frame`; defaults to `get_backend()`.
+
+    Returns:
+        str: An error message if the "[Data]" section or its header is not found, else None.
+    """
+    backend = backend or get_backend()
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        all_lines = f.readlines()
+
+    data_marker_index = find_data_section(all_lines)
+    if data_marker_index is None:
+        return "Error: [Data] section not found in CSV."
+    if len(all_lines) <= data_marker_index + 1:
+        return "Error: Data header line missing in CSV."
+
+    preserved_lines = all_lines[:data_marker_index + 2]
+    orig_header_cols = all_lines[data_marker_index + 1].strip().split(",")
+    if not preserved_lines[-1].endswith("\n"):
+        preserved_lines[-1] += "\n"
+
+    new_file_content = "".join(preserved_lines) + backend.write_rows(frame, orig_header_cols)
+    annotate(rows=backend.height(frame), bytes=len(new_file_content))
+
+    with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+        f.write(new_file_content)
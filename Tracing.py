@@ -0,0 +1,194 @@
+import time
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+
+# Histogram bucket bounds (upper bounds, Prometheus "le") per measured quantity.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROW_BUCKETS = (1, 10, 100, 1_000, 10_000, 100_000)
+BYTE_BUCKETS = (1_024, 10_240, 102_400, 1_048_576, 10_485_760, 104_857_600)
+
+METRICS = {
+    "duration": ("demultiplex_span_duration_seconds", "Duration of traced operations in seconds.", DURATION_BUCKETS),
+    "rows": ("demultiplex_span_rows", "Rows (records, samples, lines) handled per traced operation.", ROW_BUCKETS),
+    "bytes": ("demultiplex_span_payload_bytes", "Payload size handled per traced operation in bytes.", BYTE_BUCKETS),
+}
+
+
+# ---------------------------
+# In-memory Histograms
+# ---------------------------
+class Histogram:
+    """Cumulative-bucket histogram as exposed by Prometheus (counts per bucket, sum, count)."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Histograms per (metric, span name, labels) and error counters per span; thread-safe."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.errors = {}
+
+    def observe(self, metric, span_name, labels, value):
+        key = (metric, span_name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(METRICS[metric][2])
+            histogram.observe(value)
+
+    def count_error(self, span_name, labels):
+        with self.lock:
+            self.errors[(span_name, labels)] = self.errors.get((span_name, labels), 0) + 1
+
+    def reset(self):
+        with self.lock:
+            self.histograms.clear()
+            self.errors.clear()
+
+
+registry = Registry()
+_active = threading.local()
+
+
+# ---------------------------
+# Spans
+# ---------------------------
+class Span:
+    """One timed operation. `rows` and `bytes` may be set while it runs (see `annotate`)."""
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.rows = None
+        self.bytes = None
+        self.duration = None
+
+
+@contextmanager
+def span(name, **labels):
+    """
+    Times a block of code and records it in the in-memory histograms.
+
+    Usage:
+        with span("bfabric.read", endpoint="sample") as s:
+            samples = wrapper.read(...)
+            s.rows = len(samples)
+
+    Args:
+        name (str): Span name (the operation).
+        **labels: Extra labels (low-cardinality values only, e.g. the B-Fabric endpoint).
+
+    Yields:
+        Span: The running span.
+    """
+    current = Span(name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+    stack = getattr(_active, "stack", None)
+    if stack is None:
+        stack = _active.stack = []
+    stack.append(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        registry.count_error(current.name, current.labels)
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        stack.pop()
+        registry.observe("duration", current.name, current.labels, current.duration)
+        if current.rows is not None:
+            registry.observe("rows", current.name, current.labels, current.rows)
+        if current.bytes is not None:
+            registry.observe("bytes", current.name, current.labels, current.bytes)
+
+
+def traced(name=None, rows=None):
+    """
+    Decorator form of `span`; the span is named after the function unless `name` is given.
+
+    Args:
+        name (str, optional): Span name.
+        rows (callable, optional): Computes the row count from the function's return value.
+    """
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name) as current:
+                result = func(*args, **kwargs)
+                if rows is not None and current.rows is None:
+                    try:
+                        current.rows = rows(result)
+                    except Exception:
+                        pass
+                return result
+        return wrapper
+    return decorator
+
+
+def annotate(rows=None, bytes=None):
+    """Sets the row count and/or payload size of the innermost running span of this thread."""
+    stack = getattr(_active, "stack", None)
+    if not stack:
+        return
+    if rows is not None:
+        stack[-1].rows = rows
+    if bytes is not None:
+        stack[-1].bytes = bytes
+
+
+# ---------------------------
+# Prometheus Text Export
+# ---------------------------
+def format_labels(span_name, labels, extra=()):
+    pairs = [("span", span_name), *labels, *extra]
+    return "{" + ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs) + "}"
+
+
+def render_prometheus():
+    """
+    Returns all histograms and error counters in the Prometheus text exposition format.
+
+    Returns:
+        str: Metrics text (served at /metrics).
+    """
+    with registry.lock:
+        histograms = {key: (list(h.counts), h.sum, h.count) for key, h in registry.histograms.items()}
+        errors = dict(registry.errors)
+
+    lines = []
+    for metric, (metric_name, help_text, bounds) in METRICS.items():
+        entries = sorted((key, value) for key, value in histograms.items() if key[0] == metric)
+        if not entries:
+            continue
+        lines += [f"# HELP {metric_name} {help_text}", f"# TYPE {metric_name} histogram"]
+        for (_, span_name, labels), (counts, total, count) in entries:
+            cumulative = 0
+            for bound, bucket_count in zip(list(bounds) + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f"{metric_name}_bucket{format_labels(span_name, labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{metric_name}_sum{format_labels(span_name, labels)} {total}")
+            lines.append(f"{metric_name}_count{format_labels(span_name, labels)} {count}")
+
+    if errors:
+        lines += ["# HELP demultiplex_span_errors_total Traced operations that raised an exception.",
+                  "# TYPE demultiplex_span_errors_total counter"]
+        for (span_name, labels), count in sorted(errors.items()):
+            lines.append(f"demultiplex_span_errors_total{format_labels(span_name, labels)} {count}")
+
+    return "\n".join(lines) + "\n"
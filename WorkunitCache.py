@@ -0,0 +1,259 @@
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from dash import html
+import dash_bootstrap_components as dbc
+
+from Tracing import span
+
+# A cached listing older than this is shown as it is and refreshed in the background.
+STALE_AFTER_SECONDS = 60
+# Margin subtracted from the sync time for the "modified after" query, for clock differences
+# between this server and B-Fabric.
+CLOCK_SKEW_SECONDS = 120
+# Listings kept per process. A listing not requested for LISTING_IDLE_SECONDS (its user closed
+# the app) is dropped, and beyond MAX_LISTINGS the least recently requested one.
+MAX_LISTINGS = 500
+LISTING_IDLE_SECONDS = 3600
+# Entities per B-Fabric read (the API returns at most 100 per page).
+READ_BATCH_SIZE = 100
+
+ENVIRONMENT_URLS = {
+    "Test": "https://fgcz-bfabric-test.uzh.ch/bfabric/workunit/show.html?id=",
+    "Production": "https://fgcz-bfabric.uzh.ch/bfabric/workunit/show.html?id="
+}
+
+
+# ---------------------------
+# Cached Workunit Listing
+# ---------------------------
+class WorkunitListing:
+    """
+    Workunits of one user's job, as last read from B-Fabric.
+
+    `version` counts the syncs that changed the listing, so the workunits tab only needs to
+    re-render when it moved on. `synced_at` is the time the last sync started; the next sync
+    only reads the cached workunits that were modified since. `used` is the time of the last
+    request, for evicting idle listings.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.workunit_ids = []
+        self.workunits = {}
+        self.synced_at = None
+        self.checked = 0.0
+        self.used = time.time()
+        self.version = 0
+        self.refreshing = False
+        self.error = None
+        self.lock = threading.Lock()
+
+    def is_stale(self):
+        return time.time() - self.checked > STALE_AFTER_SECONDS
+
+    def sync(self, wrapper):
+        """
+        Brings the listing up to date with B-Fabric.
+
+        The job is read for its current workunit IDs. Workunits that are not cached yet are
+        read in full; cached ones are only read again if B-Fabric reports them as modified
+        since the last sync. Workunits no longer attached to the job are dropped.
+
+        Args:
+            wrapper: B-Fabric wrapper.
+        """
+        started = datetime.now()
+        job = read_entities(wrapper, "job", {"id": self.job_id})
+        workunit_ids = [wu["id"] for wu in (job[0].get("workunit", []) if job else [])]
+
+        with self.lock:
+            known = [wu_id for wu_id in workunit_ids if wu_id in self.workunits]
+            new = [wu_id for wu_id in workunit_ids if wu_id not in self.workunits]
+            synced_at = self.synced_at
+
+        fetched = read_in_batches(wrapper, "workunit", new, {})
+        if known and synced_at:
+            modified_after = (synced_at - timedelta(seconds=CLOCK_SKEW_SECONDS)).strftime("%Y-%m-%dT%H:%M:%S")
+            try:
+                fetched += read_in_batches(wrapper, "workunit", known, {"modifiedafter": modified_after})
+            except Exception as e:
+                # Not every B-Fabric version filters by modification time; read them all then.
+                print(f"Incremental workunit read failed ({e}); reading all workunits of job {self.job_id}.")
+                fetched += read_in_batches(wrapper, "workunit", known, {})
+
+        with self.lock:
+            changed = workunit_ids != self.workunit_ids
+            for wu in fetched:
+                if self.workunits.get(wu["id"]) != wu:
+                    self.workunits[wu["id"]] = wu
+                    changed = True
+            self.workunits = {wu_id: self.workunits[wu_id] for wu_id in workunit_ids if wu_id in self.workunits}
+            self.workunit_ids = workunit_ids
+            self.synced_at = started
+            self.checked = time.time()
+            self.error = None
+            if changed:
+                self.version += 1
+
+    def snapshot(self):
+        with self.lock:
+            return [self.workunits[wu_id] for wu_id in self.workunit_ids if wu_id in self.workunits], self.version, self.error
+
+
+def read_entities(wrapper, endpoint, obj):
+    with span("bfabric.read", endpoint=endpoint) as current:
+        result = wrapper.read(endpoint, obj)
+        current.rows = len(result)
+    return list(result)
+
+
+def read_in_batches(wrapper, endpoint, ids, query):
+    """Reads entities by ID in batches of READ_BATCH_SIZE, with extra query attributes."""
+    result = []
+    for i in range(0, len(ids), READ_BATCH_SIZE):
+        result += read_entities(wrapper, endpoint, {"id": ids[i:i + READ_BATCH_SIZE], **query})
+    return result
+
+
+# ---------------------------
+# Cache Access
+# ---------------------------
+_listings = OrderedDict()
+_listings_lock = threading.Lock()
+
+
+def listing_key(token_data):
+    return (token_data.get("environment"), token_data.get("user_data"), token_data.get("jobId"))
+
+
+def evict_listings(now):
+    """
+    Drops the listings not requested for LISTING_IDLE_SECONDS and, beyond MAX_LISTINGS, the
+    least recently requested ones. `_listings` is kept in order of the last request, so only
+    its front is looked at. Called with `_listings_lock` held.
+    """
+    while _listings:
+        key, listing = next(iter(_listings.items()))
+        if len(_listings) <= MAX_LISTINGS and now - listing.used <= LISTING_IDLE_SECONDS:
+            break
+        del _listings[key]
+
+
+def get_listing(token_data):
+    """
+    Returns the workunit listing of the token's user and job, stale-while-revalidate.
+
+    The first request of a user syncs synchronously. Afterwards the cached listing is returned
+    at once; if it is stale, a background sync is started (at most one per listing). Idle and
+    least recently used listings are evicted (see `evict_listings`).
+
+    Args:
+        token_data (dict): Token metadata ("environment", "user_data", "jobId").
+
+    Returns:
+        WorkunitListing: The cached listing.
+    """
+    from bfabric_web_apps.objects.BfabricInterface import bfabric_interface
+
+    key = listing_key(token_data)
+    now = time.time()
+    with _listings_lock:
+        listing = _listings.get(key)
+        first = listing is None
+        if first:
+            listing = _listings[key] = WorkunitListing(token_data.get("jobId"))
+        else:
+            _listings.move_to_end(key)
+        listing.used = now
+        evict_listings(now)
+
+    if first:
+        with listing.lock:
+            listing.refreshing = True
+        revalidate(listing, bfabric_interface.get_wrapper())
+        return listing
+
+    with listing.lock:
+        start = listing.is_stale() and not listing.refreshing
+        if start:
+            listing.refreshing = True
+    if start:
+        threading.Thread(target=revalidate, args=(listing, bfabric_interface.get_wrapper()), daemon=True).start()
+    return listing
+
+
+def revalidate(listing, wrapper):
+    try:
+        listing.sync(wrapper)
+    except Exception as e:
+        print(f"Reading the workunits of job {listing.job_id} failed: {e}")
+        with listing.lock:
+            listing.error = str(e)
+            listing.checked = time.time()
+    finally:
+        with listing.lock:
+            listing.refreshing = False
+
+
+def invalidate(token_data):
+    """Marks the token's listing as stale, so the next render refreshes it (e.g., after a submission)."""
+    with _listings_lock:
+        listing = _listings.get(listing_key(token_data))
+    if listing is not None:
+        with listing.lock:
+            listing.checked = 0.0
+
+
+# ---------------------------
+# Workunits Tab Layout
+# ---------------------------
+def render_workunits(workunits, environment, error=None):
+    """
+    Builds the workunits tab, in the layout of `bfabric_web_apps.populate_workunit_details`.
+
+    Args:
+        workunits (list): Workunit dicts.
+        environment (str): "Test" or "Production" (for the B-Fabric links).
+        error (str, optional): Error of the last sync; shown above the cached workunits.
+
+    Returns:
+        Dash component: Workunit cards.
+    """
+    notice = [dbc.Alert(f"The workunits could not be refreshed: {error}", color="warning")] if error else []
+    if not workunits:
+        return html.Div(notice + [html.P("No workunits found for the current job.")])
+
+    wu_cards = []
+    for wu in workunits:
+        wu_cards.append(html.A(
+            dbc.Card([
+                dbc.CardHeader(html.B(f"Workunit {wu['id']}")),
+                dbc.CardBody([
+                    html.P(f"Name: {wu.get('name', 'n/a')}"),
+                    html.P(f"Description: {wu.get('description', 'n/a')}"),
+                    html.P(f"Num Resources: {len(wu.get('resource', []))}"),
+                    html.P(f"Created: {wu.get('created', 'n/a')}"),
+                    html.P(f"Status: {wu.get('status', 'n/a')}")
+                ])
+            ], style={"width": "400px", "margin": "10px"}),
+            href=ENVIRONMENT_URLS.get(environment, ENVIRONMENT_URLS["Test"]) + str(wu["id"]),
+            target="_blank",
+            style={"text-decoration": "none"}
+        ))
+    return html.Div(notice + [dbc.Container(wu_cards, style={"display": "flex", "flex-wrap": "wrap"})])
+
+
+def get_workunit_layout(token_data):
+    """
+    Returns the workunits tab content and the listing version it shows.
+
+    Returns:
+        tuple: (Dash component, version)
+    """
+    if not token_data:
+        return html.Div(), None
+    workunits, version, error = get_listing(token_data).snapshot()
+    return render_workunits(workunits, token_data.get("environment", "Test"), error), version
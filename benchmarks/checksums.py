@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(APP_DIR)
+
+from ChecksumManifest import MAX_WORKERS, build_manifest
+
+
+# ---------------------------
+# Synthetic Output Files
+# ---------------------------
+def write_files(directory, count, size_mb):
+    """Writes `count` files of `size_mb` MB of random bytes; returns their paths."""
+    paths = []
+    block = os.urandom(1024 ** 2)
+    for i in range(count):
+        path = os.path.join(directory, f"Sample_{i}_S{i + 1}_L001_R1_001.fastq.gz")
+        with open(path, "wb") as f:
+            for _ in range(size_mb):
+                f.write(block)
+        paths.append(path)
+    return paths
+
+
+def hash_serially(paths):
+    """MD5 and SHA-256 one file after another, each read twice (as two separate tools would)."""
+    for path in paths:
+        for algorithm in (hashlib.md5, hashlib.sha256):
+            digest = algorithm()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 ** 2), b""):
+                    digest.update(chunk)
+            digest.hexdigest()
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Time the checksum manifest against hashing the files serially.")
+    parser.add_argument("--files", type=int, default=16, help="Number of output files")
+    parser.add_argument("--size-mb", type=int, default=64, help="Size of each file in MB")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Hashing processes")
+    args = parser.parse_args()
+
+    workspace = tempfile.mkdtemp(prefix="demultiplex-checksums-")
+    try:
+        paths = write_files(workspace, args.files, args.size_mb)
+        manifest_path = os.path.join(workspace, "checksums.tsv")
+        total_mb = args.files * args.size_mb
+        print(f"{args.files} files, {total_mb} MB, {args.workers} worker(s)")
+
+        for name, run in (
+            ("serial", lambda: hash_serially(paths)),
+            ("manifest", lambda: build_manifest(paths, manifest_path, args.workers)),
+            ("manifest_reused", lambda: build_manifest(paths, manifest_path, args.workers)),
+        ):
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            print(f"  {name:<16} {elapsed:8.2f} s  {total_mb / elapsed:9.0f} MB/s")
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
@@ -0,0 +1,169 @@
+import os
+import sys
+import time
+import random
+import shutil
+from collections import Counter
+from contextlib import contextmanager, ExitStack, redirect_stdout
+from unittest import mock
+
+# The app modules are imported from the app's root folder.
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(APP_DIR)
+
+import fakeredis
+
+BASES = "ACGT"
+
+
+# ---------------------------
+# Synthetic B-Fabric Backend
+# ---------------------------
+class FakeBfabricWrapper:
+    """
+    In-process stand-in for the wrapper returned by `bfabric_interface.get_wrapper()`.
+
+    Serves one synthetic run (run, rununit, instrument, lanes and samples) through the same
+    `read(endpoint, obj, max_results=100, offset=0)` call the app makes, and sleeps `latency`
+    seconds per call to model the round trip to B-Fabric. Sample indices are random but
+    unique per lane and reproducible for a given `seed`.
+
+    Args:
+        run_id (int): ID of the synthetic run.
+        lanes (int): Number of lanes.
+        samples_per_lane (int): Number of samples per lane.
+        latency (float): Seconds added to every call.
+        projects (int): Number of projects (containers) the samples are spread over.
+        seed (int): Seed of the index generator.
+    """
+
+    def __init__(self, run_id=1000, lanes=2, samples_per_lane=96, latency=0.0, projects=4, seed=0):
+        self.run_id = run_id
+        self.latency = latency
+        self.calls = Counter()
+        rng = random.Random(seed)
+
+        self.run = {
+            "id": run_id,
+            "name": f"BENCH_RUN_{run_id}",
+            "datafolder": f"/srv/runs/250101_A00000_{run_id:04d}_BENCH",
+        }
+        self.instrument = {"id": 1, "name": "NovaSeq 6000"}
+        self.samples = {}
+        self.lanes = {}
+        for lane in range(1, lanes + 1):
+            lane_id = run_id * 100 + lane
+            used = set()
+            sample_ids = []
+            for n in range(1, samples_per_lane + 1):
+                sample_id = lane_id * 100_000 + n
+                while True:
+                    i7 = "".join(rng.choice(BASES) for _ in range(8))
+                    i5 = "".join(rng.choice(BASES) for _ in range(8))
+                    if (i7, i5) not in used:
+                        used.add((i7, i5))
+                        break
+                self.samples[sample_id] = {
+                    "id": sample_id,
+                    "name": f"L{lane}_Sample_{n}",
+                    "multiplexiddmx": i7,
+                    "multiplexid2dmx": i5,
+                    "container": {"id": 3000 + n % projects},
+                }
+                sample_ids.append({"id": sample_id})
+            self.lanes[lane_id] = {"id": lane_id, "sample": sample_ids}
+
+        self.rununit = {
+            "id": run_id,
+            "name": f"BENCH_RUNUNIT_{run_id}",
+            "created": "2025-01-01 09:30:00",
+            "instrument": {"id": self.instrument["id"]},
+            "rununitlane": [{"id": lane_id} for lane_id in self.lanes],
+        }
+
+    def read(self, endpoint, obj, max_results=100, offset=0, **kwargs):
+        self.calls[endpoint] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        ids = obj.get("id")
+        ids = [int(i) for i in (ids if isinstance(ids, list) else [ids])] if ids is not None else []
+        if endpoint == "run":
+            result = [self.run]
+        elif endpoint == "rununit":
+            result = [self.rununit]
+        elif endpoint == "instrument":
+            result = [self.instrument]
+        elif endpoint == "rununitlane":
+            result = [self.lanes[i] for i in ids if i in self.lanes]
+        elif endpoint == "sample":
+            result = [self.samples[i] for i in ids if i in self.samples]
+        else:
+            raise ValueError(f"The fake B-Fabric backend does not serve '{endpoint}'.")
+
+        if max_results is not None:
+            result = result[offset:offset + max_results]
+        return result
+
+
+class FakeBfabricInterface:
+    """Stand-in for `bfabric_interface`; hands out the fake wrapper."""
+
+    def __init__(self, wrapper):
+        self.wrapper = wrapper
+
+    def get_wrapper(self):
+        return self.wrapper
+
+
+class QuietLogger:
+    """Stand-in for the B-Fabric job logger: API calls are made directly, operations are dropped."""
+
+    def logthis(self, api_call, *args, params=None, flush_logs=True, **kwargs):
+        return api_call(*args, **kwargs)
+
+    def log_operation(self, operation, message, params=None, flush_logs=True):
+        pass
+
+
+# ---------------------------
+# Benchmark Environment
+# ---------------------------
+@contextmanager
+def fake_environment(wrapper, workspace):
+    """
+    Runs the app code against the fake B-Fabric backend and an in-memory Redis.
+
+    Inside the context, B-Fabric reads go to `wrapper`, the job logger is a `QuietLogger`,
+    the app's Redis connection and job queues use fakeredis, and the working directory is
+    `workspace` (the app reads and writes its samplesheets relative to it). The app's
+    stdout (per-lane and resource path prints) is discarded.
+
+    Args:
+        wrapper (FakeBfabricWrapper): Synthetic backend.
+        workspace (str): Empty directory used as the app's working directory.
+
+    Yields:
+        fakeredis.FakeRedis: The Redis connection used by the app.
+    """
+    import index
+    import RedisPool
+    import GetDataFromBfabric
+
+    connection = fakeredis.FakeRedis()
+    shutil.copy(os.path.join(APP_DIR, "NFC_DMX.config"), workspace)
+    previous_dir = os.getcwd()
+
+    with ExitStack() as stack:
+        stack.enter_context(mock.patch("bfabric_web_apps.objects.BfabricInterface.bfabric_interface", FakeBfabricInterface(wrapper)))
+        stack.enter_context(mock.patch.object(RedisPool, "_client", connection))
+        stack.enter_context(mock.patch.dict(RedisPool._queues, clear=True))
+        stack.enter_context(mock.patch.object(GetDataFromBfabric, "get_logger", lambda token_data: QuietLogger()))
+        stack.enter_context(mock.patch.object(index, "get_logger", lambda token_data: QuietLogger()))
+        devnull = stack.enter_context(open(os.devnull, "w"))
+        stack.enter_context(redirect_stdout(devnull))
+        os.chdir(workspace)
+        try:
+            yield connection
+        finally:
+            os.chdir(previous_dir)
@@ -0,0 +1,275 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+
+from fake_bfabric import APP_DIR, FakeBfabricWrapper, fake_environment
+
+import Tracing
+import SamplesheetCache
+from SamplesheetCache import get_sheet
+from GetDataFromBfabric import run_samplesheet_load, read_load_state
+from GetDataFromUser import apply_sheet_delta, save_on_lane_change, save_cached_sheet
+from index import run_main_job_callback
+
+PAGE_SIZE = 15
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+# ---------------------------
+# Benchmark Context
+# ---------------------------
+class BenchmarkContext:
+    """State shared by the scenarios: the fake backend, the workspace and the created sheets."""
+
+    def __init__(self, wrapper, connection, workspace):
+        self.wrapper = wrapper
+        self.connection = connection
+        self.workspace = workspace
+        self.pristine_dir = os.path.join(workspace, "pristine")
+        self.token_data = {"entity_id_data": wrapper.run_id, "user_data": "bench", "environment": "bench"}
+        self.app_data = {"name": "Demultiplex Benchmark"}
+        self.csv_list = []
+        self.versions = {}
+
+    def load(self):
+        """Creates the samplesheets through the app load path and checks that it succeeded."""
+        load_id = uuid.uuid4().hex
+        run_samplesheet_load(load_id, self.token_data, self.app_data)
+        state = read_load_state(load_id)
+        if not state or state.get("error") or not state.get("done"):
+            raise RuntimeError(f"App load failed: {state}")
+        return state["csv_list"]
+
+    def snapshot(self):
+        """Keeps a copy of the freshly created sheets, so every repetition starts from them."""
+        os.makedirs(self.pristine_dir, exist_ok=True)
+        for path in self.csv_list + ["pipeline_samplesheet.csv"]:
+            shutil.copyfile(path, os.path.join(self.pristine_dir, os.path.basename(path)))
+
+    def reset_sheets(self):
+        """Restores the created sheets and empties the server-side sheet cache."""
+        for path in self.csv_list + ["pipeline_samplesheet.csv"]:
+            shutil.copyfile(os.path.join(self.pristine_dir, os.path.basename(path)), path)
+        with SamplesheetCache._sheets_lock:
+            SamplesheetCache._sheets.clear()
+        self.versions = {}
+
+
+# ---------------------------
+# Scenarios
+# ---------------------------
+def setup_page_load(ctx):
+    ctx.reset_sheets()
+    for path in ctx.csv_list + ["pipeline_samplesheet.csv"]:
+        os.remove(path)
+    ctx.connection.flushall()
+
+
+def run_page_load(ctx):
+    ctx.load()
+
+
+def switch_through_lanes(ctx):
+    """Visits every lane once, as the lane dropdown does: save the previous lane, show page 1."""
+    previous = None
+    for lane, csv_path in enumerate(ctx.csv_list):
+        previous, _, _ = save_on_lane_change(lane, previous, ctx.csv_list, ctx.versions)
+        sheet = get_sheet(csv_path)
+        sheet.query_page(0, PAGE_SIZE)
+        sheet.columns()
+        sheet.summary()
+
+
+def setup_lane_switch_warm(ctx):
+    ctx.reset_sheets()
+    for csv_path in ctx.csv_list:
+        get_sheet(csv_path).summary()
+
+
+def setup_save(ctx):
+    """Edits every 10th i7 index and deselects every 20th sample of each lane."""
+    ctx.reset_sheets()
+    for lane, csv_path in enumerate(ctx.csv_list):
+        sheet = get_sheet(csv_path)
+        changes = [
+            {"id": row, "column": "index", "old": sheet.cell(row, "index"), "new": sheet.cell(row, "index")[::-1]}
+            for row in range(0, sheet.row_count(), 10)
+        ]
+        selection = [[row, row % 20 != 0] for row in range(sheet.row_count())]
+        ctx.versions, _ = apply_sheet_delta({"lane": lane, "changes": changes, "selection": selection}, ctx.csv_list, ctx.versions)
+
+
+def run_save(ctx):
+    for lane, csv_path in enumerate(ctx.csv_list):
+        save_cached_sheet(csv_path, ctx.versions.get(str(lane)))
+
+
+def setup_submit(ctx):
+    ctx.reset_sheets()
+    ctx.connection.flushall()
+
+
+def run_submit(ctx):
+    result = run_main_job_callback(1, "?token=bench", ctx.token_data, "light", ctx.csv_list, ctx.versions, {"done": True}, False)
+    if not result[0]:
+        raise RuntimeError(f"Submission failed: {result[3]}")
+
+
+# Scenario name -> (untimed setup before each repetition, timed function)
+SCENARIOS = {
+    "page_load": (setup_page_load, run_page_load),
+    "lane_switch_cold": (BenchmarkContext.reset_sheets, switch_through_lanes),
+    "lane_switch_warm": (setup_lane_switch_warm, switch_through_lanes),
+    "save": (setup_save, run_save),
+    "submit": (setup_submit, run_submit),
+}
+
+
+# ---------------------------
+# Measuring and Reporting
+# ---------------------------
+def measure(ctx, name, repeat, warmup):
+    """
+    Runs one scenario `warmup + repeat` times and summarises the timed repetitions.
+
+    Returns:
+        dict: Wall-clock statistics in seconds and the B-Fabric calls per repetition.
+    """
+    setup, run = SCENARIOS[name]
+    timings = []
+    calls = {}
+    for i in range(warmup + repeat):
+        setup(ctx)
+        ctx.wrapper.calls.clear()
+        start = time.perf_counter()
+        run(ctx)
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            timings.append(elapsed)
+            calls = dict(ctx.wrapper.calls)
+
+    timings.sort()
+    return {
+        "repeat": repeat,
+        "min": timings[0],
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "p95": timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))],
+        "max": timings[-1],
+        "bfabric_calls": calls,
+    }
+
+
+def span_totals():
+    """Returns count and total duration per traced span (see `Tracing`), over all scenarios."""
+    with Tracing.registry.lock:
+        items = [(key, h.count, h.sum) for key, h in Tracing.registry.histograms.items() if key[0] == "duration"]
+    totals = {}
+    for (_, span_name, labels), count, total in sorted(items):
+        label = span_name + "".join(f"[{k}={v}]" for k, v in labels)
+        totals[label] = {"count": count, "total_seconds": total}
+    return totals
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    """
+    Prints the median of every scenario next to the baseline's.
+
+    Returns:
+        list: Names of the scenarios that got slower by more than `tolerance` (a fraction).
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    if baseline.get("parameters") != results["parameters"]:
+        print(f"  Note: the baseline was measured with different parameters: {baseline.get('parameters')}")
+    regressions = []
+    for name, stats in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            print(f"  {name:<18} {stats['median'] * 1000:10.2f} ms   (not in baseline)")
+            continue
+        change = stats["median"] / before["median"] - 1
+        flag = "  REGRESSION" if change > tolerance else ""
+        print(f"  {name:<18} {before['median'] * 1000:10.2f} ms -> {stats['median'] * 1000:10.2f} ms  ({change:+.1%}){flag}")
+        if change > tolerance:
+            regressions.append(name)
+    return regressions
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Benchmark page load, lane switching, save and submit against a synthetic B-Fabric run.")
+    parser.add_argument("--lanes", type=int, default=2, help="Lanes of the synthetic run")
+    parser.add_argument("--samples-per-lane", type=int, default=384, help="Samples per lane")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated latency per B-Fabric call in milliseconds")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per scenario")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed repetitions before measuring")
+    parser.add_argument("--scenarios", type=str, default=",".join(SCENARIOS),
+                        help="Comma-separated scenarios to run (default: all)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic indices")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", type=str, default=None, help="Result file of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Slowdown of the median (fraction) reported as a regression with --compare")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)} (available: {', '.join(SCENARIOS)})")
+
+    wrapper = FakeBfabricWrapper(
+        lanes=args.lanes, samples_per_lane=args.samples_per_lane, latency=args.latency_ms / 1000, seed=args.seed
+    )
+    workspace = tempfile.mkdtemp(prefix="demultiplex-bench-")
+    results = {
+        "commit": git_commit(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parameters": {
+            "lanes": args.lanes, "samples_per_lane": args.samples_per_lane, "latency_ms": args.latency_ms,
+            "repeat": args.repeat, "warmup": args.warmup, "seed": args.seed,
+        },
+        "scenarios": {},
+    }
+    try:
+        with fake_environment(wrapper, workspace) as connection:
+            ctx = BenchmarkContext(wrapper, connection, workspace)
+            ctx.csv_list = ctx.load()
+            ctx.snapshot()
+            Tracing.registry.reset()
+            for name in names:
+                results["scenarios"][name] = measure(ctx, name, args.repeat, args.warmup)
+                print(f"{name:<18} median {results['scenarios'][name]['median'] * 1000:10.2f} ms", file=sys.stderr)
+        results["spans"] = span_totals()
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"{results['commit'] or 'worktree'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
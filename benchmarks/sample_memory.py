@@ -0,0 +1,109 @@
+import os
+import gc
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(APP_DIR)
+
+from SampleRecord import SampleRecord
+from SamplesheetWriter import lane_sample_columns, render_samplesheet
+from ExecuteRunMainJob import parse_samples_csv
+
+BASES = "ACGT"
+
+
+# ---------------------------
+# Synthetic Samples
+# ---------------------------
+def bfabric_samples(count, projects=20, plate_size=384, seed=0):
+    """
+    Sample records as the B-Fabric API returns them: freshly decoded JSON, so repeated values
+    (projects, the indices of a reused index plate) are separate string objects.
+    """
+    rng = random.Random(seed)
+    plate = [("".join(rng.choice(BASES) for _ in range(8)), "".join(rng.choice(BASES) for _ in range(8)))
+             for _ in range(plate_size)]
+    records = []
+    for n in range(count):
+        i7, i5 = plate[n % plate_size]
+        records.append({
+            "id": 5_000_000 + n, "name": f"Sample_{n}", "multiplexiddmx": i7, "multiplexid2dmx": i5,
+            "container": {"id": 30_000 + n % projects},
+        })
+    return json.loads(json.dumps(records))
+
+
+def sample_dicts(records):
+    """The per-sample dicts built before the sample records (`sample_dict` in create_samplesheets)."""
+    return [{
+        "Sample_ID": record["id"], "Sample_Name": record["name"], "Sample_Plate": "", "Sample_Well": "",
+        "Index_Plate": "", "Index_Plate_Well": "", "I7_Index_ID": record["multiplexiddmx"],
+        "index": record["multiplexiddmx"], "I5_Index_ID": record["multiplexid2dmx"],
+        "index2": record["multiplexid2dmx"], "Sample_Project": record["container"]["id"], "Description": "",
+    } for record in records]
+
+
+def csv_row_dicts(path):
+    """Rows of a lane samplesheet as dicts, as `parse_samples_csv` returned them before."""
+    with open(path, newline="") as f:
+        lines = f.readlines()
+    data_index = next(i for i, line in enumerate(lines) if line.strip().startswith("[Data]"))
+    header = lines[data_index + 1].strip().split(",")
+    return [dict(zip(header, line.strip().split(","))) for line in lines[data_index + 2:] if line.strip()]
+
+
+# ---------------------------
+# Measuring
+# ---------------------------
+def measure(build, *args):
+    """
+    Returns (result, bytes held by the result, seconds) of `build(*args)`. The time is taken in
+    a separate run without tracemalloc, which slows down allocations.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    build(*args)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    result = build(*args)
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, held, elapsed
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Memory per sample of the sample dicts and the slotted sample records.")
+    parser.add_argument("--samples", type=int, default=100_000, help="Number of samples")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic indices")
+    args = parser.parse_args()
+
+    records = bfabric_samples(args.samples, seed=args.seed)
+    results = {}
+
+    print(f"{args.samples} samples")
+    _, held, elapsed = measure(sample_dicts, records)
+    results["bfabric_dicts"] = (held, elapsed)
+    samples, held, elapsed = measure(lambda: [SampleRecord.from_bfabric(record) for record in records])
+    results["bfabric_records"] = (held, elapsed)
+
+    with tempfile.TemporaryDirectory(prefix="demultiplex-sample-memory-") as workspace:
+        path = os.path.join(workspace, "Samplesheet_lane_1.csv")
+        with open(path, "w", newline="") as f:
+            f.write(render_samplesheet({"IEMFileVersion": 5}, [76, 76], {}, lane_sample_columns(samples)))
+        del samples
+        _, held, elapsed = measure(csv_row_dicts, path)
+        results["csv_dicts"] = (held, elapsed)
+        _, held, elapsed = measure(parse_samples_csv, path)
+        results["csv_records"] = (held, elapsed)
+
+    for name, (held, elapsed) in results.items():
+        print(f"  {name:<16} {held / 1e6:8.1f} MB  {held / args.samples:7.0f} B/sample  {elapsed * 1000:9.1f} ms")
@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(APP_DIR)
+
+from SheetTable import BACKENDS, get_backend, read_data_section, write_data_section
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+HEADER = "Lane,Sample_ID,Sample_Name,index,index2,Sample_Project,Description"
+
+
+# ---------------------------
+# Synthetic Lane Sheets
+# ---------------------------
+def write_lane_sheet(path, rows, seed=0):
+    """Writes an IEM-style lane samplesheet with `rows` samples and random 8+8 bp indices."""
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("[Header]\nIEMFileVersion,4\nExperiment Name,table-benchmark\n\n[Reads]\n151\n151\n\n[Data]\n")
+        f.write(HEADER + "\n")
+        for i in range(rows):
+            i7 = "".join(rng.choice("ACGT") for _ in range(8))
+            i5 = "" if i % 50 == 0 else "".join(rng.choice("ACGT") for _ in range(8))
+            f.write(f"1,{100000 + i},Sample_{i},{i7},{i5},{3000 + i % 7},\n")
+
+
+# ---------------------------
+# Operations
+# ---------------------------
+def operations(backend, sheet_path, scratch_path):
+    """
+    Returns the timed operations of one backend on one sheet, as (name, setup, run) with
+    `run(state)` timed after `setup()` produced its state.
+    """
+    table = read_data_section(sheet_path, backend)
+    reparsed = read_data_section(sheet_path, backend)
+    rows = backend.height(table)
+    edited_rows = list(range(0, rows, 100))
+    edited = backend.set_cells(table, "index", edited_rows, ["N" * 8] * len(edited_rows))
+    sort_by = [{"column_id": "Sample_Project", "direction": "asc"}, {"column_id": "index", "direction": "desc"}]
+
+    def copy_sheet():
+        shutil.copyfile(sheet_path, scratch_path)
+
+    return [
+        ("parse", lambda: None, lambda _: read_data_section(sheet_path, backend)),
+        ("compare_equal", lambda: None, lambda _: backend.equals(table, reparsed)),
+        ("compare_edited", lambda: None, lambda _: backend.equals(table, edited)),
+        ("edit_1pct", lambda: None, lambda _: backend.set_cells(table, "index", edited_rows, ["N" * 8] * len(edited_rows))),
+        ("filter_sort", lambda: None, lambda _: backend.query(table, '{index} contains "ACG" && {Sample_ID} > 100010', sort_by)),
+        ("write", copy_sheet, lambda _: write_data_section(scratch_path, edited, backend)),
+    ]
+
+
+def measure(setup, run, repeat):
+    timings = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        timings.append(time.perf_counter() - start)
+    return {"median": statistics.median(timings), "min": min(timings), "max": max(timings)}
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Compare parse, compare, filter and write times of the samplesheet table backends.")
+    parser.add_argument("--sizes", type=str, default=",".join(str(size) for size in DEFAULT_SIZES),
+                        help="Comma-separated sample counts per lane sheet")
+    parser.add_argument("--backends", type=str, default=",".join(BACKENDS), help="Comma-separated backends to run")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed repetitions per operation")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic indices")
+    parser.add_argument("--output", type=str, default=None, help="Optional JSON result file")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    backends = []
+    for name in (name.strip() for name in args.backends.split(",") if name.strip()):
+        try:
+            backends.append(get_backend(name))
+        except ImportError as e:
+            print(f"Skipping the {name} backend: {e}")
+
+    workspace = tempfile.mkdtemp(prefix="demultiplex-table-bench-")
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parameters": {"sizes": sizes, "repeat": args.repeat, "seed": args.seed},
+        "results": {},
+    }
+    try:
+        for size in sizes:
+            sheet_path = os.path.join(workspace, f"lane_{size}.csv")
+            write_lane_sheet(sheet_path, size, args.seed)
+            print(f"\n{size} samples ({os.path.getsize(sheet_path) / 1e6:.1f} MB)")
+            for backend in backends:
+                scratch_path = os.path.join(workspace, f"scratch_{backend.name}.csv")
+                for op, setup, run in operations(backend, sheet_path, scratch_path):
+                    stats = measure(setup, run, args.repeat)
+                    results["results"].setdefault(str(size), {}).setdefault(backend.name, {})[op] = stats
+                    print(f"  {backend.name:<8} {op:<16} {stats['median'] * 1000:10.2f} ms")
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
@@ -21,11 +21,11 @@ from dash import Input, Output, State
 from bfabric_web_apps import (
     create_app, 
     process_url_and_token, 
-    submit_bug_report, 
-    populate_workunit_details,
-    get_redis_queue_layout
+    submit_bug_report
 )
 from dash import html
+from QueueStatus import get_queue_layout
+from WorkunitCache import get_workunit_layout
 # Application Initialization
 # ---------------------------
 # Create the Dash app instance.
@@ -104,13 +104,16 @@ def get_workunit_details(token_data, dummy):
     """
     Get workunit details for the authenticated user.
 
+    The listing is cached per user and synced incrementally (see `WorkunitCache`); a stale
+    listing is shown at once and refreshed in the background.
+
     Parameters:
         token (dict): Authentication token data.
 
     Returns:
         tuple: Workunit details.
     """
-    return populate_workunit_details(token_data)
+    return get_workunit_layout(token_data)[0]
 
 
 @app.callback(
@@ -124,10 +127,12 @@ def get_queue_details(token_data, interval):
     """
     Get queue details for the authenticated user.
 
+    All tabs read the same queue snapshot, refreshed in the background (see `QueueStatus`).
+
     Parameters:
         token (dict): Authentication token data.
 
     Returns:
         tuple: Queue details.
     """
-    return get_redis_queue_layout()
\ No newline at end of file
+    return get_queue_layout()
\ No newline at end of file
@@ -5,15 +5,28 @@
 
 # Before running the application, ensure that bfabric_web_apps and bfabric_web_app_template are compatible!.
 import os
-from dash import Input, Output, State
+from dash import Input, Output, State, no_update
 import bfabric_web_apps
-from bfabric_web_apps import run_main_job, get_logger, read_file_as_bytes
-from bfabric_web_apps.utils.redis_queue import q
+from bfabric_web_apps import read_file_as_bytes
+from BufferedLogger import get_logger, summarise
 import GetDataFromUser
-from GetDataFromUser import update_csv_based_on_ui
-from ExecuteRunMainJob import create_resource_paths_and_dataset
-import GetDataFromBfabric
+from GetDataFromUser import save_cached_sheet
+from ExecuteRunMainJob import (
+    create_resource_paths_and_dataset,
+    compute_job_key,
+    enqueue_unique,
+    build_job_paths,
+    build_job_pipeline_samplesheet,
+    build_bash_commands,
+    run_demultiplex_job,
+    retry_job,
+    collect_run_metadata
+)
 from generic.callbacks import app
+from RedisPool import get_redis, get_queue
+from WorkunitCache import invalidate as invalidate_workunits
+from DiskAdmission import admit_job
+from Tracing import span, traced
 
 # Set configuration parameters for bfabric_web_apps.
 
@@ -24,53 +37,72 @@ from generic.callbacks import app
 @ app.callback(
     [
         Output("alert-fade-success", "is_open"), 
+        Output("alert-fade-success", "children"),
         Output("alert-fade-fail", "is_open"), 
         Output("alert-fade-fail", "children"),
-        Output("refresh-workunits", "children")
+        Output("refresh-workunits", "children"),
+        Output("job-key-store", "data"),
+        Output("job-key-display", "children")
     ],
     [Input("Submit", "n_clicks")],
     [
         State('url', 'search'),
         State("token_data", "data"),
         State("queue", "value"),
-        State('samplesheet-table', "data"),
-        State('samplesheet-table', "selected_rows"),
-        State("lane-dropdown", "value"),
         State("csv_list_store", "data"),
+        State("sheet-version-store", "data"),
+        State("load-task-store", "data"),
         State("charge_run", "on"),
     ],
     prevent_initial_call=True
 )
-def run_main_job_callback(n_clicks, url_params, token_data, queue, table_data, selected_rows, lane_val, csv_list, charge_run):
+@traced()
+def run_main_job_callback(n_clicks, url_params, token_data, queue, csv_list, sheet_versions, load_task, charge_run):
     """
     Callback to run the main job pipeline asynchronously when the "Submit" button is clicked.
     
     The callback executes the following steps:
-      1. **Update CSV File:**  
-         If a lane is selected (indicated by `lane_val`), the corresponding CSV file in `csv_list`
-         is updated with any user edits from `table_data` and the rows selected in `selected_rows`.
+      1. **Update CSV Files:**  
+         The user's edits and row selections were sent as cell deltas while editing and are held
+         server-side in the `SamplesheetCache`. Only each lane's sheet version is sent with the
+         submission; it is checked against the cache, and every lane whose cached sheet was
+         modified is written to its CSV file in `csv_list` (see `save_cached_sheet`).
+
+      2. **Compute the Job Key:**  
+         A deterministic job key is computed from the run ID, the samplesheet contents and the
+         NFC_DMX configuration (see `compute_job_key`). All per-job directories on the compute
+         server (launch/work directory and output directory) are derived from this key with
+         `build_job_paths`, so concurrent jobs never share Nextflow work files or outputs.
+         Before that, the job's output and work sizes are estimated from the run metadata and
+         compared with the free space of the volumes, minus what queued and running jobs have
+         reserved (see `DiskAdmission.admit_job`). The job is admitted, its output is rerouted to
+         another output root, it is held until active jobs release their work space, or the
+         submission is rejected with the shortfall.
       
-      2. **Prepare Files Dictionary:**  
+      3. **Prepare Files Dictionary:**  
          Constructs a dictionary named `files_as_byte_strings` that maps file paths (as keys) to the
          file contents read as byte strings (as values). The structure is as follows:
             {
-                "./filename": <file_as_bytes>,
+                "<job_dir>/filename": <file_as_bytes>,
             }
-         - For each lane sample sheet, the key is formatted as "./<filename>" using the basename of the file.
-         - In addition, the pipeline sample sheet and the NFC_DMX configuration file are also included.
+         - For each lane sample sheet, the key is formatted as "<job_dir>/<filename>" using the basename of the file.
+         - In addition, the pipeline sample sheet (rewritten to point at the job directory) and the
+           NFC_DMX configuration file are also included.
       
-      3. **Construct Bash Commands:**  
+      4. **Construct Bash Commands:**  
          Creates a list of bash command strings that are used to run the nf-core demultiplex pipeline 
-         via Nextflow.
+         via Nextflow inside the job directory (see `build_bash_commands`).
       
-      4. **Create Resource Paths and Dataset dictionary:**  
+      5. **Create Resource Paths and Dataset dictionary:**  
          Uses `create_resource_paths_and_dataset` to map file paths or directories to container IDs based on the
-         provided token data and the designated output directory. Here we also create a dataset dictionary
+         provided token data and the job's output directory. Here we also create a dataset dictionary
          that maps container IDs to their respective datasets to be created. 
       
-      5. **Enqueue the Job:**  
-         The main job is enqueued for asynchronous processing via a Redis queue. The job is submitted 
-         using the provided queue (either "light" or "heavy") along with all prepared parameters:
+      6. **Enqueue the Job:**  
+         If a job with this key is already queued or running, the existing job is reported back and
+         nothing new is enqueued. Otherwise `run_demultiplex_job` is enqueued under the job key for
+         asynchronous processing via a Redis queue. The job is submitted using the provided queue
+         (either "light" or "heavy") along with all prepared parameters:
             - The dictionary of files as byte strings.
             - The list of bash commands.
             - The resource paths mapping.
@@ -82,69 +114,77 @@ def run_main_job_callback(n_clicks, url_params, token_data, queue, table_data, s
         url_params (str): URL parameters (includes token information for authentication).
         token_data (dict): Authentication token data required for resource path generation.
         queue (str): Name of the Redis queue to use ("light" or "heavy").
-        table_data (list): List of dictionaries representing the current state of the samplesheet table,
-                           including any user edits.
-        selected_rows (list): List of indices indicating which rows in the samplesheet table are selected.
-        lane_val (int or str): Identifier for the selected lane (used to pick the correct CSV file from csv_list).
         csv_list (list): List mapping lane identifiers to their corresponding CSV file paths.
+        sheet_versions (dict): Version of each lane's cached sheet as last confirmed to the browser.
+        load_task (dict): The app load task; jobs can only be submitted once it is done without an error.
         charge_run (bool): Flag indicating whether the job should be charged to the user.
         
     Returns:
             - (bool) Success alert state: True if the job was submitted successfully.
+            - (str) Success message: Mentions the job key and whether an existing job was reused.
             - (bool) Failure alert state: True if the job submission failed.
             - (str) Failure message: An error message if the submission failed; otherwise, an empty string.
             - (str) Refresh workunits message: A status message indicating the outcome of the job submission.
+            - (str) Job key of the submitted (or already active) job, stored for later use.
+            - (str) Job key text shown in the sidebar.
     """
     L = get_logger(token_data)
     try:
         # Log that the user has initiated the main job pipeline.
         L.log_operation("Info | ORIGIN: demultiplex web app", "Job started: User initiated main job pipeline.")
-        # 1. Update the selected lane CSV with the user edits.
-        if lane_val:
-            csv_path = csv_list[lane_val]
-            update_csv_based_on_ui(table_data, selected_rows, csv_path)
+        if not load_task or not load_task.get("done"):
+            raise ValueError("The samplesheets are still being loaded from B-Fabric. Please wait until all lanes are shown.")
+        if load_task.get("error"):
+            raise ValueError(f"The run was not loaded completely ({load_task['error']}). Please reload the app before submitting.")
+        # 1. Write the user edits of all modified lanes to their CSV files.
+        for lane_index, csv_path in enumerate(csv_list):
+            save_cached_sheet(csv_path, (sheet_versions or {}).get(str(lane_index)))
+
+        # 2. Compute the job key and the per-job directories on the compute server.
+        job_key = compute_job_key(
+            token_data["entity_id_data"],
+            list(csv_list) + ["./pipeline_samplesheet.csv"],
+            "./NFC_DMX.config"
+        )
+
+        # Check that the compute server's volumes can hold the job's output and work files.
+        run_metadata = collect_run_metadata(token_data["entity_id_data"], csv_list)
+        with span("disk.admission"):
+            admission = admit_job(get_redis(), job_key, run_metadata)
+        L.log_operation("Info | ORIGIN: demultiplex web app", f"Disk admission of job {job_key}: {admission['action']}. {admission['message']}")
+        if admission["action"] == "reject":
+            raise ValueError(admission["message"])
+        paths = build_job_paths(job_key, admission["output_root"])
 
-        # 2. Prepare the final dictionary of files as byte strings.
+        # 3. Prepare the final dictionary of files as byte strings.
         files_as_byte_strings = {}
 
         # Loop through all lane sample sheets and add them to the dictionary.
         for sheet_path in csv_list:
-            # Key format: "./<filename>" (e.g., "./Samplesheet_lane_1.csv")
-            key = f"./{os.path.basename(sheet_path)}"
+            # Key format: "<job_dir>/<filename>" (e.g., "<job_dir>/Samplesheet_lane_1.csv")
+            key = f"{paths['job_dir']}/{os.path.basename(sheet_path)}"
             files_as_byte_strings[key] = read_file_as_bytes(sheet_path)
             L.log_operation("Info | ORIGIN: demultiplex web app", f"Created files as byte strings: {key} loaded from {sheet_path}.")
 
-        # 3. Add the pipeline sample sheet and NFC_DMX configuration file.
-        files_as_byte_strings["./pipeline_samplesheet.csv"] = read_file_as_bytes("./pipeline_samplesheet.csv")
+        # Add the pipeline sample sheet and NFC_DMX configuration file.
+        files_as_byte_strings[paths["pipeline_samplesheet"]] = build_job_pipeline_samplesheet("./pipeline_samplesheet.csv", paths["job_dir"])
         L.log_operation("Info | ORIGIN: demultiplex web app", "Pipeline samplesheet loaded from ./pipeline_samplesheet.csv.")
-        files_as_byte_strings["./NFC_DMX.config"] = read_file_as_bytes("./NFC_DMX.config")
+        files_as_byte_strings[paths["config"]] = read_file_as_bytes("./NFC_DMX.config")
         L.log_operation("Info | ORIGIN: demultiplex web app", "NFC_DMX configuration loaded from ./NFC_DMX.config.")
 
-        # Define the output directory for the pipeline.
-        base_dir = "/STORAGE/OUTPUT_TEST"
-
-        # Construct the bash command to run the nf-core demultiplex pipeline.
-        bash_commands = [
-
-            "rm -rf /APPLICATION/200611_A00789R_0071_BHHVCCDRXX/work"
-            ,
-            f"""/home/nfc/.local/bin/nextflow run nf-core/demultiplex \
-            -profile docker \
-            --input /APPLICATION/200611_A00789R_0071_BHHVCCDRXX/pipeline_samplesheet.csv \
-            --outdir {base_dir} \
-            --demultiplexer bcl2fastq \
-            --skip_tools samshee,checkqc \
-            -c /APPLICATION/200611_A00789R_0071_BHHVCCDRXX/NFC_DMX.config \
-            -r 1.5.4 > {base_dir}/nextflow.log"""
-        ]
-
-        # 4. Create resource paths mapping file or folder to container IDs.
-        resource_paths, dataset_dict = create_resource_paths_and_dataset(token_data, base_dir)
-        L.log_operation("Info | ORIGIN: demultiplex web app", f"Resource paths created: {resource_paths}")
-        print("resource_paths", resource_paths)
+        # 4. Construct the bash command to run the nf-core demultiplex pipeline in the job directory.
+        bash_commands = build_bash_commands(paths)
+
+        # 5. Create resource paths mapping file or folder to container IDs.
+        resource_paths, dataset_dict = create_resource_paths_and_dataset(token_data, paths["output_dir"])
+        L.log_operation("Info | ORIGIN: demultiplex web app", f"Resource paths created: {summarise(resource_paths)}")
+        print("resource_paths", summarise(resource_paths))
 
         # Set attachment paths (e.g., for reports)
-        attachment_paths = {"/STORAGE/OUTPUT_TEST/multiqc/multiqc_report.html": "multiqc_report.html"}
+        attachment_paths = {
+            f"{paths['output_dir']}/multiqc/multiqc_report.html": "multiqc_report.html",
+            paths["checksum_manifest"]: "checksums.tsv",
+        }
         L.log_operation("Info | ORIGIN: demultiplex web app", f"Attachment paths created: {attachment_paths}")
 
         projects = list(set(resource_paths.values()))
@@ -154,27 +194,100 @@ def run_main_job_callback(n_clicks, url_params, token_data, queue, table_data, s
         else: 
             projects_to_charge = []
 
-        # 5. Enqueue the main job into the Redis queue for asynchronous execution.
-        q(queue).enqueue(run_main_job, kwargs={
-            "files_as_byte_strings": files_as_byte_strings,
-            "bash_commands": bash_commands,
-            "resource_paths": resource_paths,
-            "attachment_paths": attachment_paths,
-            "token": url_params,
-            "charge": projects_to_charge,
-            "dataset_dict": dataset_dict
-        })
+        # 6. Enqueue the main job into the Redis queue, unless the same job is already queued or running.
+        with span("redis.enqueue", queue=queue) as enqueue_span:
+            enqueue_span.bytes = sum(len(content) for content in files_as_byte_strings.values())
+            job, created = enqueue_unique(get_queue(queue), job_key, run_demultiplex_job, {
+                "job_key": job_key,
+                "files_as_byte_strings": files_as_byte_strings,
+                "bash_commands": bash_commands,
+                "resource_paths": resource_paths,
+                "attachment_paths": attachment_paths,
+                "token": url_params,
+                "charge": projects_to_charge,
+                "dataset_dict": dataset_dict,
+                "run_metadata": run_metadata,
+                "output_root": admission["output_root"],
+            }, meta={"disk_reservation": admission["reservation"]}, depends_on=admission["depends_on"])
+
+        if not created:
+            L.log_operation("Info | ORIGIN: demultiplex web app", f"Job {job_key} is already {job.get_status()}; no new job submitted.")
+            message = f"This run is already {job.get_status()} as job {job_key}. No new job was submitted."
+            return True, message, False, "", "Job already active", job_key, f"Job key: {job_key}"
+
+        # The job will add workunits; refresh the cached workunit listing on its next render.
+        invalidate_workunits(token_data)
 
         # Log that the job was submitted successfully.
-        L.log_operation("Info | ORIGIN: demultiplex web app", f"Job submitted successfully to {queue} Redis queue.")
+        L.log_operation("Info | ORIGIN: demultiplex web app", f"Job {job_key} submitted successfully to {queue} Redis queue.")
         # Return success alert open, failure alert closed, no error message, and a success message.
-        return True, False, "", "Job submitted successfully"
+        message = f"Success: Pipeline started successfully! Job key: {job_key}"
+        if admission["action"] in ("reroute", "hold"):
+            message += f" {admission['message']}"
+        return True, message, False, "", "Job submitted successfully", job_key, f"Job key: {job_key}"
 
     except Exception as e:
         # Log that the job submission failed.
         L.log_operation("Info | ORIGIN: demultiplex web app", f"Job submission failed: {str(e)}")
         # If an error occurs, return failure alert open with the error message.
-        return False, True, f"Job submission failed: {str(e)}", "Job submission failed"
+        return False, no_update, True, f"Job submission failed: {str(e)}", "Job submission failed", no_update, no_update
+
+
+# ---------------------------
+# Retry Failed Job Callback
+# ---------------------------
+@app.callback(
+    [
+        Output("alert-retry", "is_open"),
+        Output("alert-retry", "children"),
+        Output("alert-retry", "color"),
+    ],
+    [Input("retry-button", "n_clicks")],
+    [
+        State('url', 'search'),
+        State("token_data", "data"),
+        State("job-key-store", "data"),
+        State("csv_list_store", "data"),
+    ],
+    prevent_initial_call=True
+)
+def retry_failed_job_callback(n_clicks, url_params, token_data, job_key, csv_list):
+    """
+    Callback to retry the last failed job of this run with Nextflow's `-resume`.
+
+    The job key is taken from the last submission in this session. If there was none (e.g.
+    after a page reload), it is recomputed from the current samplesheets, which yields the
+    key of the last submission as long as the sheets have not been edited since.
+    The stored job spec is re-enqueued by `retry_job`, so only the Nextflow processes that
+    did not complete are run again.
+
+    Parameters:
+        n_clicks (int): Number of times the retry button has been clicked.
+        url_params (str): URL parameters (includes token information for authentication).
+        token_data (dict): Authentication token data.
+        job_key (str or None): Job key of the last submission in this session.
+        csv_list (list): List of the lane CSV file paths.
+
+    Returns:
+        - (bool) Retry alert state.
+        - (str) Retry message.
+        - (str) Alert color ("success" or "danger").
+    """
+    L = get_logger(token_data)
+    try:
+        if not job_key:
+            job_key = compute_job_key(
+                token_data["entity_id_data"],
+                list(csv_list) + ["./pipeline_samplesheet.csv"],
+                "./NFC_DMX.config"
+            )
+        retry_job(get_redis(), job_key, url_params, get_queue)
+        L.log_operation("Info | ORIGIN: demultiplex web app", f"Job {job_key} re-enqueued with -resume.")
+        return True, f"Job {job_key} was re-submitted and will resume where it failed.", "success"
+
+    except Exception as e:
+        L.log_operation("Info | ORIGIN: demultiplex web app", f"Job retry failed: {str(e)}")
+        return True, f"Retry failed: {str(e)}", "danger"
 
 
 # ---------------------------
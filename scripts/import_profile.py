@@ -0,0 +1,74 @@
+import os
+import sys
+import argparse
+import subprocess
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# Modules imported by the web server (index), the RQ job (ExecuteRunMainJob) and the
+# prefetch job / CLI scripts.
+DEFAULT_MODULES = ("index", "ExecuteRunMainJob", "GetDataFromBfabric", "SamplesheetPrefetch", "PerformanceHistory")
+
+# Measures one import in a fresh interpreter; prints the peak RSS (kB on Linux) last.
+PROBE = "import resource, {module}; print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"
+
+
+# ---------------------------
+# Helper functions
+# ---------------------------
+def profile_import(module):
+    """
+    Imports `module` in a fresh interpreter with `-X importtime`.
+
+    Returns:
+        tuple: (list of (cumulative µs, self µs, module name) in import order, peak RSS in kB)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module)],
+        cwd=APP_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((int(cumulative_us), int(self_us), name.rstrip()))
+    return entries, int(result.stdout.strip().splitlines()[-1])
+
+
+def by_package(entries):
+    """Sums the self time of all imported modules per top-level package (µs)."""
+    totals = {}
+    for _, self_us, name in entries:
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def format_profile(module, entries, max_rss_kb, top):
+    total_us = sum(self_us for _, self_us, _ in entries)
+    lines = [f"== {module}: {total_us / 1e6:.2f} s import time, {len(entries)} modules, peak RSS {max_rss_kb / 1024:.0f} MB"]
+    lines.append("   Self time per top-level package:")
+    for package, self_us in by_package(entries)[:top]:
+        lines.append(f"     {self_us / 1e3:9.1f} ms  {package}")
+    lines.append("   Slowest imports (cumulative, including their own imports):")
+    for cumulative_us, _, name in sorted(entries, reverse=True)[:top]:
+        lines.append(f"     {cumulative_us / 1e3:9.1f} ms  {name.strip()}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Profile the startup imports of the app's entry points (python -X importtime).")
+    parser.add_argument("modules", nargs="*", default=list(DEFAULT_MODULES),
+                        help=f"Modules to import (default: {' '.join(DEFAULT_MODULES)})")
+    parser.add_argument("--top", type=int, default=12, help="Number of packages and imports to list per module")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        entries, max_rss_kb = profile_import(module)
+        print(format_profile(module, entries, max_rss_kb, args.top))
+        print()
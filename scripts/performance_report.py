@@ -0,0 +1,16 @@
+import os
+import sys
+# PerformanceHistory is imported from the app's root folder.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import argparse
+from PerformanceHistory import DEFAULT_DB_PATH, format_report
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Print runtime and memory sizing statistics of past demultiplexing jobs.")
+    parser.add_argument("--db", type=str, default=DEFAULT_DB_PATH,
+                        help="Path of the performance database written by the workers")
+    args = parser.parse_args()
+
+    print(format_report(args.db))
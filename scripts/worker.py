@@ -1,18 +1,403 @@
+import os
 import sys
 sys.path.append("../bfabric-web-apps")
+# Job functions (e.g. ExecuteRunMainJob.run_demultiplex_job) are imported from the app's root folder.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
+import time
+import random
+import signal
 import argparse
-from bfabric_web_apps import run_worker, REDIS_HOST, REDIS_PORT
+import multiprocessing
+
+import redis
+from rq import Queue, Worker
+from SamplesheetPrefetch import enqueue_prefetch
+from DiskAdmission import report_volumes, VOLUME_REPORT_INTERVAL
+from RedisPool import redis_address
+
+
+# ---------------------------
+# Helper functions: Command-line parsing
+# ---------------------------
+def parse_queue_mapping(value, cast=int):
+    """
+    Parses a comma-separated "queue=value" list from the command line.
+
+    Args:
+        value (str): String such as "light=3,heavy=1". An empty string yields an empty mapping.
+        cast (callable): Conversion applied to each value.
+
+    Returns:
+        dict: Mapping of queue names to converted values (e.g., {"light": 3, "heavy": 1}).
+    """
+    mapping = {}
+    if not value:
+        return mapping
+    for item in value.split(","):
+        name, _, raw = item.partition("=")
+        if not name or not raw:
+            raise argparse.ArgumentTypeError(f"Expected <queue>=<value>, got '{item}'")
+        mapping[name.strip()] = cast(raw)
+    return mapping
+
+
+# ---------------------------
+# Helper function: Host capacity check
+# ---------------------------
+def host_has_capacity(max_load_per_cpu, min_free_memory_gb):
+    """
+    Checks whether the host can take on another heavy job.
+
+    The 1-minute load average is normalised by the number of CPUs and compared with
+    `max_load_per_cpu`; the available memory is read from /proc/meminfo ("MemAvailable")
+    and compared with `min_free_memory_gb`. If /proc/meminfo is not available
+    (e.g. on macOS), only the load check is applied.
+
+    Args:
+        max_load_per_cpu (float): Maximum normalised load (1.0 = every core busy).
+        min_free_memory_gb (float): Minimum available memory in GB.
+
+    Returns:
+        bool: True if both limits are satisfied.
+    """
+    load_per_cpu = os.getloadavg()[0] / (os.cpu_count() or 1)
+    if load_per_cpu > max_load_per_cpu:
+        return False
+
+    try:
+        with open("/proc/meminfo") as f:
+            meminfo = dict(line.split(":", 1) for line in f)
+        available_gb = int(meminfo["MemAvailable"].split()[0]) / (1024 * 1024)
+    except (OSError, KeyError, ValueError):
+        return True
+
+    return available_gb >= min_free_memory_gb
+
+
+# ---------------------------
+# Worker: Throttled, weighted dequeue
+# ---------------------------
+class ThrottledWorker(Worker):
+    """
+    RQ worker that decides before every dequeue which of its queues it may listen on.
+
+    - Queues with a concurrency limit are guarded by a semaphore shared by all worker
+      processes started from the same launcher, so at most `limit` jobs of that queue
+      run on this host at a time.
+    - Queues listed in `resource_checked_queues` (by default "heavy") are only listened on
+      when the host has enough free CPU and memory (see `host_has_capacity`).
+    - With the "priority" strategy queues are listened on in the given order; with the
+      "weighted" strategy the order is drawn at random for every dequeue, so a queue with
+      weight 3 comes first three times as often as a queue with weight 1.
+    """
+
+    def __init__(self, queues, slots=None, weights=None, strategy="priority",
+                 resource_checked_queues=(), max_load_per_cpu=0.75, min_free_memory_gb=24,
+                 poll_interval=5, **kwargs):
+        super().__init__(queues, **kwargs)
+        self.slots = slots or {}
+        self.weights = weights or {}
+        self.strategy = strategy
+        self.resource_checked_queues = set(resource_checked_queues)
+        self.max_load_per_cpu = max_load_per_cpu
+        self.min_free_memory_gb = min_free_memory_gb
+        self.poll_interval = poll_interval
+        self._held_slot = None
+
+    def ordered_queues(self):
+        """
+        Returns the worker's queues in the order in which they should be listened on.
+        """
+        if self.strategy != "weighted":
+            return list(self.queues)
+        # Weighted random permutation: sort by u ** (1 / weight) in descending order.
+        return sorted(
+            self.queues,
+            key=lambda queue: random.random() ** (1.0 / max(self.weights.get(queue.name, 1), 1e-6)),
+            reverse=True,
+        )
+
+    def acquire_eligible_queues(self):
+        """
+        Returns the queues this worker may dequeue from right now, together with the
+        concurrency slots that were acquired for them.
+
+        Returns:
+            tuple: (list of eligible queues, dict mapping queue names to acquired semaphores)
+        """
+        eligible, acquired = [], {}
+        host_checked = None
+        for queue in self.ordered_queues():
+            if queue.name in self.resource_checked_queues:
+                if host_checked is None:
+                    host_checked = host_has_capacity(self.max_load_per_cpu, self.min_free_memory_gb)
+                if not host_checked:
+                    continue
+            slot = self.slots.get(queue.name)
+            if slot is not None:
+                if not slot.acquire(block=False):
+                    continue
+                acquired[queue.name] = slot
+            eligible.append(queue)
+        return eligible, acquired
+
+    def dequeue_job_and_maintain_ttl(self, timeout, max_idle_time=None):
+        """
+        Dequeues the next job from the currently eligible queues.
+
+        Eligibility is re-evaluated at least every `poll_interval` seconds, so a queue that
+        was skipped because its limit was reached (or the host was busy) is picked up again
+        as soon as capacity frees up. The slot of the queue the job came from stays held
+        until `execute_job` returns; all other slots are released immediately.
+        """
+        while not self._stop_requested:
+            eligible, acquired = self.acquire_eligible_queues()
+            result = None
+            try:
+                if eligible:
+                    self._ordered_queues = eligible
+                    poll = None if timeout is None else max(1, min(timeout, self.poll_interval))
+                    result = super().dequeue_job_and_maintain_ttl(poll, max_idle_time=poll)
+                elif timeout is not None:
+                    self.heartbeat()
+                    time.sleep(self.poll_interval)
+            finally:
+                chosen = result[1].name if result is not None else None
+                for name, slot in acquired.items():
+                    if name == chosen:
+                        self._held_slot = slot
+                    else:
+                        slot.release()
+
+            if result is not None or timeout is None:
+                return result
+        return None
+
+    def execute_job(self, job, queue):
+        try:
+            super().execute_job(job, queue)
+        finally:
+            if self._held_slot is not None:
+                self._held_slot.release()
+                self._held_slot = None
+
+
+# ---------------------------
+# Worker process entry point
+# ---------------------------
+def run_throttled_worker(queue_names, options, slots):
+    """
+    Runs a single ThrottledWorker until it is asked to stop.
+
+    The process detaches into its own process group so that a Ctrl-C in the launcher's
+    terminal is not delivered twice (once by the terminal, once by the launcher), which
+    RQ would treat as a cold shutdown.
+
+    Args:
+        queue_names (list): Queue names this worker listens on.
+        options (argparse.Namespace): Parsed launcher options.
+        slots (dict): Shared semaphores for queues with a concurrency limit.
+    """
+    os.setpgrp()
+    conn = redis.Redis(
+        host=options.redis_host,
+        port=options.redis_port,
+        socket_keepalive=True,
+        health_check_interval=60
+    )
+    worker = ThrottledWorker(
+        [Queue(name, connection=conn) for name in queue_names],
+        connection=conn,
+        slots=slots,
+        weights=options.weights,
+        strategy=options.strategy,
+        resource_checked_queues=options.heavy_queues.split(",") if options.heavy_queues else (),
+        max_load_per_cpu=options.max_load_per_cpu,
+        min_free_memory_gb=options.min_free_memory_gb,
+        poll_interval=options.poll_interval,
+    )
+    worker.work(logging_level="INFO", max_jobs=options.max_jobs)
+
+
+# ---------------------------
+# Launcher: Supervise N worker processes
+# ---------------------------
+class WorkerPool:
+    """
+    Starts and supervises `size` worker processes on this host.
+
+    Signals handled by the launcher:
+      - SIGTERM / SIGINT: graceful drain. Every worker finishes its current job and exits;
+        the launcher exits once all workers are gone. A second signal is passed on to the
+        workers, which RQ treats as a cold shutdown (running jobs are killed).
+      - SIGHUP: rolling restart. Workers are drained and replaced one at a time, so the host
+        keeps processing jobs while new code or settings are picked up.
+
+    Worker processes that exit on their own (e.g. after `--max-jobs`) are replaced.
+
+    With `--prefetch-interval`, the launcher also enqueues the samplesheet prefetch job
+    (see `SamplesheetPrefetch.prefetch_recent_runs`) at that interval.
+
+    Every VOLUME_REPORT_INTERVAL seconds, the launcher reports the free space of the job and
+    output volumes to Redis for the web server's admission check (see `DiskAdmission`).
+    """
+
+    def __init__(self, size, queue_names, options):
+        self.size = size
+        self.next_prefetch = 0
+        self.next_volume_report = 0
+        self.redis = None
+        self.queue_names = queue_names
+        self.options = options
+        self.slots = {
+            name: multiprocessing.BoundedSemaphore(limit)
+            for name, limit in options.limits.items()
+        }
+        self.processes = []
+        self.draining = False
+        self.restart_requested = False
+
+    def spawn(self):
+        process = multiprocessing.Process(
+            target=run_throttled_worker,
+            args=(self.queue_names, self.options, self.slots),
+        )
+        process.start()
+        return process
+
+    def stop(self, process):
+        if process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+
+    def request_drain(self, signum, frame):
+        self.draining = True
+        for process in self.processes:
+            self.stop(process)
+
+    def request_restart(self, signum, frame):
+        self.restart_requested = True
+
+    def rolling_restart(self):
+        """Drains and replaces the worker processes one at a time."""
+        self.restart_requested = False
+        for i, process in enumerate(list(self.processes)):
+            if self.draining:
+                return
+            self.stop(process)
+            process.join()
+            self.processes[i] = self.spawn()
+            print(f"Worker {process.pid} restarted as {self.processes[i].pid}")
+
+    def connection(self):
+        """Returns the launcher's Redis client, created on first use and kept for its lifetime."""
+        if self.redis is None:
+            self.redis = redis.Redis(
+                host=self.options.redis_host,
+                port=self.options.redis_port,
+                socket_keepalive=True,
+                health_check_interval=60
+            )
+        return self.redis
+
+    def maybe_enqueue_prefetch(self):
+        """Enqueues the samplesheet prefetch job when the prefetch interval has passed."""
+        if not self.options.prefetch_interval or self.draining or time.time() < self.next_prefetch:
+            return
+        self.next_prefetch = time.time() + self.options.prefetch_interval
+        try:
+            job = enqueue_prefetch(
+                Queue(self.options.prefetch_queue, connection=self.connection()),
+                app_name=self.options.prefetch_app_name,
+                max_runs=self.options.prefetch_max_runs,
+                max_age_hours=self.options.prefetch_max_age_hours,
+            )
+            if job:
+                print(f"Enqueued samplesheet prefetch on queue {self.options.prefetch_queue}")
+        except Exception as e:
+            print(f"Enqueueing the samplesheet prefetch failed: {e}")
+
+    def maybe_report_volumes(self):
+        """Reports the free space of the job and output volumes when the report interval has passed."""
+        if self.draining or time.time() < self.next_volume_report:
+            return
+        self.next_volume_report = time.time() + VOLUME_REPORT_INTERVAL
+        try:
+            report_volumes(self.connection())
+        except Exception as e:
+            print(f"Reporting the free disk space failed: {e}")
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.request_drain)
+        signal.signal(signal.SIGINT, self.request_drain)
+        signal.signal(signal.SIGHUP, self.request_restart)
+
+        self.processes = [self.spawn() for _ in range(self.size)]
+        print(f"Started {self.size} worker(s) on queues {','.join(self.queue_names)}")
+
+        while self.processes:
+            if self.restart_requested and not self.draining:
+                self.rolling_restart()
+            self.maybe_enqueue_prefetch()
+            self.maybe_report_volumes()
+
+            for process in list(self.processes):
+                if process.is_alive():
+                    continue
+                if self.draining:
+                    self.processes.remove(process)
+                else:
+                    self.processes[self.processes.index(process)] = self.spawn()
+                    print(f"Worker {process.pid} exited with code {process.exitcode}; replaced.")
+            time.sleep(1)
+
+        print("All workers stopped.")
+
 
 if __name__ == "__main__":
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Run worker with specific queues.")
     parser.add_argument("--queues", type=str, default="light,heavy",
                         help="Comma-separated list of queue names (e.g., --queues=queue1,queue2)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes to run on this host")
+    parser.add_argument("--limits", type=parse_queue_mapping, default={},
+                        help="Per-queue concurrency limits on this host (e.g., --limits=heavy=2)")
+    parser.add_argument("--strategy", choices=["priority", "weighted"], default="priority",
+                        help="'priority' listens on queues in the given order; 'weighted' draws the order by --weights")
+    parser.add_argument("--weights", type=lambda v: parse_queue_mapping(v, float), default={},
+                        help="Queue weights for the weighted strategy (e.g., --weights=light=3,heavy=1)")
+    parser.add_argument("--heavy-queues", type=str, default="heavy",
+                        help="Comma-separated queues that are only taken when the host has free CPU and memory")
+    parser.add_argument("--max-load-per-cpu", type=float, default=0.75,
+                        help="Maximum 1-minute load average per CPU for taking a heavy job")
+    parser.add_argument("--min-free-memory-gb", type=float, default=24,
+                        help="Minimum available memory (GB) for taking a heavy job")
+    parser.add_argument("--poll-interval", type=int, default=5,
+                        help="Seconds between re-checks of queue limits and host capacity")
+    parser.add_argument("--max-jobs", type=int, default=None,
+                        help="Recycle each worker process after this many jobs")
+    parser.add_argument("--prefetch-interval", type=int, default=0,
+                        help="Seconds between samplesheet prefetch runs for newly completed runs (0 disables prefetching)")
+    parser.add_argument("--prefetch-queue", type=str, default="prefetch",
+                        help="Queue the prefetch job is enqueued on (add it to --queues on one host)")
+    parser.add_argument("--prefetch-app-name", type=str, default="",
+                        help="B-Fabric application name of the app, written into the prefetched samplesheets")
+    parser.add_argument("--prefetch-max-runs", type=int, default=20,
+                        help="Maximum number of prefetched runs kept in the cache")
+    parser.add_argument("--prefetch-max-age-hours", type=float, default=72,
+                        help="How long prefetched samplesheets are kept")
+    redis_host, redis_port = redis_address()
+    parser.add_argument("--redis-host", type=str, default=redis_host,
+                        help="Redis host of the app (default: REDIS_HOST of the environment or .env, as for the web app)")
+    parser.add_argument("--redis-port", type=int, default=redis_port,
+                        help="Redis port of the app (default: REDIS_PORT of the environment or .env, as for the web app)")
     args = parser.parse_args()
-    
+    if args.prefetch_interval and not args.prefetch_app_name:
+        parser.error("--prefetch-app-name is required with --prefetch-interval")
+
     # Convert the comma-separated string into a list
     queue_names = args.queues.split(",")
-    
-    # Run the worker with the specified queue names
-    run_worker(REDIS_HOST, REDIS_PORT, queue_names)
\ No newline at end of file
+
+    # Run the workers with the specified queue names
+    WorkerPool(args.workers, queue_names, args).run()